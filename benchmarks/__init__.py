@@ -0,0 +1 @@
+"""Benchmarks package for ziphyr, not shipped."""
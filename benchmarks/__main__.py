@@ -0,0 +1,103 @@
+"""
+Ziphyr benchmark suite.
+
+    $ python -m benchmarks run --sizes 1K,1M,64M --output results.json
+    $ python -m benchmarks compare baseline.json results.json
+"""
+
+import argparse
+import json
+import sys
+
+from benchmarks.suite import COMPRESSIONS, compare, parse_size, run
+
+
+def _list(parse):
+    return lambda text: [parse(item) for item in text.split(',') if item]
+
+
+def _compressions(text):
+    names = _list(str)(text)
+    for name in names:
+        if name not in COMPRESSIONS:
+            raise argparse.ArgumentTypeError("unknown compression %s" % name)
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest='command')
+
+    bench = commands.add_parser('run', help="run the benchmark matrix")
+    bench.add_argument('--sizes', type=_list(parse_size),
+                       default=[1 << 10, 1 << 20, 16 << 20],
+                       help="source sizes, e.g. 1K,1M,4G")
+    bench.add_argument('--chunksizes', type=_list(parse_size),
+                       default=[1 << 10, 1 << 16],
+                       help="source chunk sizes, e.g. 1K,64K")
+    bench.add_argument('--compressions', type=_compressions,
+                       default=list(COMPRESSIONS),
+                       help="among %s" % ','.join(COMPRESSIONS))
+    bench.add_argument('--no-password', action='store_true',
+                       help="skip the zipcrypted runs")
+    bench.add_argument('--no-memory', action='store_true',
+                       help="skip the tracemalloc peak memory runs")
+    bench.add_argument('--micro-size', type=parse_size, default=1 << 16,
+                       help="microbenchmarks buffer size, 0 to skip")
+    bench.add_argument('--reader-size', type=parse_size, default=0,
+                       help="file size to compare the readers on, e.g. 1G")
+    bench.add_argument('--memory-budget', type=parse_size, default=None,
+                       help="generator memory budget, e.g. 4M")
+    bench.add_argument('--output', help="JSON report path, stdout if none")
+
+    check = commands.add_parser('compare', help="flag regressions")
+    check.add_argument('baseline')
+    check.add_argument('current')
+    check.add_argument('--threshold', type=float, default=0.1,
+                       help="relative change tolerated, 0.1 by default")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report = run(
+            args.sizes, args.chunksizes, args.compressions,
+            passwords=(False,) if args.no_password else (False, True),
+            memory=not args.no_memory, micro_size=args.micro_size,
+            reader_size=args.reader_size, budget=args.memory_budget,
+            progress=lambda params: sys.stderr.write("%s\n" % params),
+        )
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        else:
+            json.dump(report, sys.stdout, indent=2)
+        return 0
+
+    if args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+
+        rows = compare(baseline, current, args.threshold)
+        regressions = 0
+        for key, metric, before, after, change, regressed in rows:
+            regressions += regressed
+            print("%s %-60s %-15s %12.2f %12.2f %+7.1f%%" % (
+                'REGRESSION' if regressed else '          ',
+                key, metric, before, after, change * 100,
+            ))
+        print("%d regression(s) over %d comparisons" % (
+            regressions, len(rows)
+        ))
+        return 1 if regressions else 0
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
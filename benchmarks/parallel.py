@@ -0,0 +1,66 @@
+"""
+Scaling of Ziphyr.parallel_generator from 1 to N worker processes.
+
+    $ python benchmarks/parallel.py --entries 64 --size 4194304
+"""
+
+import argparse
+import os
+import time
+from zipfile import ZIP_DEFLATED, ZIP_LZMA
+
+from ziphyr import Ziphyr
+
+
+COMPRESSIONS = {'deflated': ZIP_DEFLATED, 'lzma': ZIP_LZMA}
+
+
+def synthetic(size, seed):
+    """Half-compressible sample, a random block repeated with noise."""
+    block = os.urandom(256) + bytes([seed % 256]) * 256
+    return (block * (size // len(block) + 1))[:size]
+
+
+def run(entries, size, compression, password, workers):
+    samples = [synthetic(size, i) for i in range(entries)]
+    metadata = [
+        (("sample%d.bin" % i, size), [sample])
+        for i, sample in enumerate(samples)
+    ]
+
+    start = time.perf_counter()
+    if workers:
+        chunks = Ziphyr(password).parallel_generator(
+            metadata, compression, workers=workers
+        )
+    else:
+        chunks = Ziphyr(password).multi_generator(metadata, compression)
+    total = sum(map(len, chunks))
+    elapsed = time.perf_counter() - start
+
+    return entries * size / elapsed / 1e6, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=32)
+    parser.add_argument('--size', type=int, default=1 << 20)
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        default='deflated')
+    parser.add_argument('--password', default='infected')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    compression = COMPRESSIONS[args.compression]
+    password = args.password.encode() or None
+
+    serial, _ = run(args.entries, args.size, compression, password, 0)
+    print("%-8s %10s %8s" % ("workers", "MB/s", "speedup"))
+    print("%-8s %10.2f %8.2f" % ("serial", serial, 1.0))
+    for workers in range(1, args.max_workers + 1):
+        mbps, _ = run(args.entries, args.size, compression, password, workers)
+        print("%-8d %10.2f %8.2f" % (workers, mbps, mbps / serial))
+
+
+if __name__ == '__main__':
+    main()
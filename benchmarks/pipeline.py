@@ -0,0 +1,76 @@
+"""
+Ziphyr.generator serial against pipelined, with slow sources and
+consumers: latency on either side overlapping with the compression.
+
+    $ python benchmarks/pipeline.py --size 16777216 --source-delay 0.002
+"""
+
+import argparse
+import os
+import time
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+
+from ziphyr import Ziphyr
+
+
+COMPRESSIONS = {
+    'stored': ZIP_STORED, 'deflated': ZIP_DEFLATED, 'bzip2': ZIP_BZIP2,
+    'lzma': ZIP_LZMA,
+}
+
+
+def slow_source(size, chunksize, delay):
+    """Half-compressible chunks, each one delay seconds late."""
+    block = os.urandom(chunksize // 2) + b'\x00' * (chunksize - chunksize // 2)
+    for _ in range(size // chunksize):
+        time.sleep(delay)
+        yield block
+
+
+def run(size, chunksize, compression, password, source_delay,
+        consumer_delay, pipeline):
+    z = Ziphyr(password)
+    z.from_metadata("sample.bin", size)
+    chunks = z.generator(
+        slow_source(size, chunksize, source_delay), compression,
+        chunksize=chunksize, pipeline=pipeline,
+    )
+
+    start = time.perf_counter()
+    for _ in chunks:
+        time.sleep(consumer_delay)
+    return size / (time.perf_counter() - start) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=16 << 20)
+    parser.add_argument('--chunksize', type=int, default=1 << 16)
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        default='deflated')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--source-delay', type=float, default=0.001,
+                        help="seconds waited per source chunk")
+    parser.add_argument('--consumer-delay', type=float, default=0.001,
+                        help="seconds waited per output chunk")
+    parser.add_argument('--depths', default='0,1,4,16',
+                        help="pipeline queue depths, 0 for serial")
+    args = parser.parse_args()
+
+    compression = COMPRESSIONS[args.compression]
+    password = args.password.encode() or None
+    depths = [int(depth) for depth in args.depths.split(',')]
+
+    print("%-8s %10s %8s" % ("depth", "MB/s", "speedup"))
+    serial = None
+    for depth in depths:
+        mbps = run(
+            args.size, args.chunksize, compression, password,
+            args.source_delay, args.consumer_delay, depth,
+        )
+        serial = serial or mbps
+        print("%-8s %10.2f %8.2f" % (depth or "serial", mbps, mbps / serial))
+
+
+if __name__ == '__main__':
+    main()
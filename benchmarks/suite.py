@@ -0,0 +1,278 @@
+"""Benchmark suite covering the Ziphyr generator matrix."""
+
+import itertools
+import os
+import platform
+import tempfile
+import time
+import timeit
+import tracemalloc
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+
+import ziphyr
+from ziphyr import Ziphyr
+from ziphyr import utils, zstd
+from ziphyr.stream import ZiphyrStream
+
+
+COMPRESSIONS = {
+    'stored': ZIP_STORED,
+    'deflated': ZIP_DEFLATED,
+    'bzip2': ZIP_BZIP2,
+    'lzma': ZIP_LZMA,
+}
+if zstd.zstandard is not None:
+    COMPRESSIONS['zstd'] = zstd.ZIP_ZSTANDARD
+
+UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+PASSWORD = b'infected'
+
+READERS = {
+    'file_iterable_1k': utils.file_iterable,
+    'file_iterable_64k': lambda path: utils.file_iterable(path, 1 << 16),
+    'readinto': utils.readinto_iterable,
+    'mmap': utils.mmap_iterable,
+    'adaptive': utils.adaptive_iterable,
+    'best': utils.best_reader,
+}
+
+
+def parse_size(text):
+    """Parses sizes such as 1K, 64M or 2G."""
+    text = text.strip().upper()
+    if text and text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def synthetic_source(size, chunksize):
+    """
+    Synthetic chunks of a half-compressible sample, like packed code
+    with padding, without holding size bytes in memory.
+    """
+    block = os.urandom(chunksize // 2 + 1) + b'\x00' * (chunksize // 2 + 1)
+    block = block[:chunksize]
+    full, last = divmod(size, chunksize)
+    for _ in range(full):
+        yield block
+    if last:
+        yield block[:last]
+
+
+def _percentile(values, ratio):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def bench_generator(
+    size, chunksize, password, compression, memory=True, budget=None,
+):
+    """
+    Throughput, per-chunk latency and peak memory of Ziphyr.generator,
+    within an optional memory budget.
+    The peak memory comes from a second run under tracemalloc.
+    """
+    z = Ziphyr(password)
+    z.from_metadata("sample.bin", size)
+
+    latencies = []
+    output = 0
+    chunks = z.generator(
+        synthetic_source(size, chunksize), compression, memory=budget
+    )
+    start = last = time.perf_counter()
+    for chunk in chunks:
+        now = time.perf_counter()
+        latencies.append(now - last)
+        output += len(chunk)
+        last = now
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'mbps': size / elapsed / 1e6 if elapsed else 0.0,
+        'seconds': elapsed,
+        'chunks': len(latencies),
+        'latency_p50_ms': _percentile(latencies, 0.50) * 1e3,
+        'latency_p99_ms': _percentile(latencies, 0.99) * 1e3,
+        'latency_max_ms': max(latencies) * 1e3,
+        'ratio': output / size if size else 0.0,
+    }
+
+    if memory:
+        z.from_metadata("sample.bin", size)
+        tracemalloc.start()
+        try:
+            for _ in z.generator(
+                synthetic_source(size, chunksize), compression, memory=budget
+            ):
+                pass
+            result['peak_kib'] = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def bench_readers(size, compression='stored', repeat=3):
+    """
+    Throughput of Ziphyr.generator over a temporary file of size bytes,
+    through each of the utils readers, best of repeat runs.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, 'sample.bin')
+        with open(filepath, 'wb') as f:
+            for chunk in synthetic_source(size, 1 << 20):
+                f.write(chunk)
+
+        for name, reader in READERS.items():
+            z = Ziphyr()
+            z.from_filepath(filepath)
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in z.generator(
+                    reader(filepath), COMPRESSIONS[compression]
+                ):
+                    pass
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results.append(('reader', {
+                'reader': name, 'size': size, 'compression': compression,
+            }, {
+                'mbps': size / best / 1e6,
+            }))
+
+    return results
+
+
+def bench_micro(size):
+    """Microbenchmarks of ZiphyrStream cyphering, keys and buffer."""
+    data = os.urandom(size)
+    results = []
+
+    stream = ZiphyrStream(PASSWORD)
+    seconds = min(timeit.repeat(
+        lambda: stream.cypher_chunk(data), number=1, repeat=3
+    ))
+    results.append(('micro.cypher_chunk', {'size': size}, {
+        'mbps': size / seconds / 1e6,
+    }))
+
+    number = 100000
+    seconds = min(timeit.repeat(
+        lambda: stream.update_keys(0x42), number=number, repeat=3
+    ))
+    results.append(('micro.update_keys', {}, {
+        'ops_per_s': number / seconds,
+    }))
+
+    small = data[:64]
+    writes = max(1, size // len(small))
+
+    def write_get():
+        for _ in range(writes):
+            stream.write(small)
+        stream.get()
+
+    seconds = min(timeit.repeat(write_get, number=1, repeat=3))
+    results.append(('micro.get', {'writes': writes, 'write_size': 64}, {
+        'mbps': writes * len(small) / seconds / 1e6,
+    }))
+
+    return results
+
+
+def run(
+    sizes, chunksizes, compressions, passwords=(False, True),
+    memory=True, micro_size=1 << 16, reader_size=0, progress=None,
+    budget=None,
+):
+    """
+    Runs the whole matrix, the microbenchmarks then the readers, as a
+    report.
+    """
+    results = []
+    for size, chunksize, password, compression in itertools.product(
+        sizes, chunksizes, passwords, compressions
+    ):
+        params = {
+            'size': size,
+            'chunksize': chunksize,
+            'password': password,
+            'compression': compression,
+        }
+        if budget:
+            params['budget'] = budget
+        if progress:
+            progress(params)
+        metrics = bench_generator(
+            size, chunksize, PASSWORD if password else None,
+            COMPRESSIONS[compression], memory, budget,
+        )
+        results.append({
+            'name': 'generator', 'params': params, 'metrics': metrics,
+        })
+
+    extra = []
+    if micro_size:
+        extra += bench_micro(micro_size)
+    if reader_size:
+        extra += bench_readers(reader_size)
+    for name, params, metrics in extra:
+        results.append({
+            'name': name, 'params': params, 'metrics': metrics,
+        })
+
+    return {
+        'meta': {
+            'ziphyr': ziphyr.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+
+
+def result_key(result):
+    """Identifies a result across reports, by its name and parameters."""
+    params = ','.join(
+        '%s=%s' % item for item in sorted(result['params'].items())
+    )
+    return '%s[%s]' % (result['name'], params)
+
+
+# metrics where more is better, the others being regressions when larger
+HIGHER_IS_BETTER = ('mbps', 'ops_per_s')
+COMPARED = ('mbps', 'ops_per_s', 'latency_p99_ms', 'peak_kib')
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compares two reports, returns (key, metric, baseline, current,
+    change, regressed) rows for the results found in both.
+    """
+    previous = {result_key(r): r['metrics'] for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        key = result_key(result)
+        if key not in previous:
+            continue
+        for metric in COMPARED:
+            before = previous[key].get(metric)
+            after = result['metrics'].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if metric in HIGHER_IS_BETTER:
+                regressed = change < -threshold
+            else:
+                regressed = change > threshold
+            rows.append((key, metric, before, after, change, regressed))
+    return rows
@@ -0,0 +1,91 @@
+"""
+Ziphyr.tree_generator over many small files, serial against prefetched:
+per-file stat and open latency, as on network storage, overlapping.
+A directory is archived as is, or a tree of small files generated with
+a simulated latency per opened file.
+
+    $ python benchmarks/tree.py --files 2000 --open-delay 0.002
+    $ python benchmarks/tree.py --root /mnt/cases/1234 --open-delay 0
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from zipfile import ZIP_DEFLATED, ZIP_STORED
+
+import ziphyr.tree
+from ziphyr import Ziphyr
+
+
+COMPRESSIONS = {'stored': ZIP_STORED, 'deflated': ZIP_DEFLATED}
+
+
+def make_tree(root, files, size):
+    """Files of size bytes, a hundred per directory."""
+    for i in range(files):
+        directory = os.path.join(root, '%04d' % (i // 100))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '%06d.txt' % i), 'wb') as f:
+            f.write(os.urandom(size // 2) + b'\x00' * (size - size // 2))
+
+
+def slowed(open_entry, delay):
+    """_open_entry waiting delay seconds first, as a remote open does."""
+    def slow_open_entry(entry, chunksize):
+        time.sleep(delay)
+        return open_entry(entry, chunksize)
+    return slow_open_entry
+
+
+def run(root, files, compression, workers, prefetch):
+    start = time.perf_counter()
+    for _ in Ziphyr().tree_generator(
+        root, compression, workers=workers, prefetch=prefetch,
+    ):
+        pass
+    return files / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--root', help="directory to archive")
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=4096)
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        default='deflated')
+    parser.add_argument('--open-delay', type=float, default=0.002,
+                        help="seconds waited per opened file")
+    parser.add_argument('--settings', default='1:1,4:16,8:32',
+                        help="workers:prefetch pairs, 1:1 being serial")
+    args = parser.parse_args()
+
+    compression = COMPRESSIONS[args.compression]
+    settings = [
+        tuple(int(n) for n in setting.split(':'))
+        for setting in args.settings.split(',')
+    ]
+    if args.open_delay:
+        ziphyr.tree._open_entry = slowed(
+            ziphyr.tree._open_entry, args.open_delay
+        )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = args.root
+        if not root:
+            root = tmpdir
+            make_tree(root, args.files, args.size)
+
+        print("%-8s %-8s %10s %8s" % ("workers", "prefetch", "files/s",
+                                      "speedup"))
+        files = sum(len(names) for _, _, names in os.walk(root))
+        serial = None
+        for workers, prefetch in settings:
+            rate = run(root, files, compression, workers, prefetch)
+            serial = serial or rate
+            print("%-8s %-8s %10.0f %8.2f" % (workers, prefetch, rate,
+                                              rate / serial))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+from wsgiref.simple_server import make_server
+
+from ziphyr import Ziphyr
+from ziphyr.utils import file_iterable
+
+filepath = '/tmp/sample.exe'
+
+
+def application(environ, start_response):
+    z = Ziphyr(b'infected')
+    z.from_filepath(filepath)
+
+    # ZIP_STORED archives size is known before streaming them
+    start_response('200 OK', [
+        ('Content-Type', 'application/zip'),
+        ('Content-Disposition', 'attachment; filename="sample.zip"'),
+        ('Content-Length', str(z.archive_size())),
+    ])
+
+    return z.generator(file_iterable(filepath))
+
+
+if __name__ == '__main__':
+    make_server('', 8000, application).serve_forever()
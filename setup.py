@@ -31,6 +31,7 @@ setup(
         'Programming Language :: Python :: 3.8',
     ],
     install_requires=[],
+    extras_require={'zstd': ['zstandard']},
     include_package_data=True,
     keywords='zip stream crypto ziphyr',
     packages=['ziphyr'],
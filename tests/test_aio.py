@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.aio` module."""
+
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import ziphyr.aio as module
+from ziphyr.utils import readinto_iterable
+from ziphyr.writer import ZiphyrWriter, entry_info
+
+
+class AsyncSource():
+    """Async iterable over chunks, counting the chunks pulled."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pulled = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+        self.pulled += 1
+        return chunk
+
+
+async def consume(iterator):
+    output = b''
+    async for chunk in iterator:
+        output += chunk
+    return output
+
+
+class TestAsyncZiphyrIterator(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def entries(self):
+        return [
+            (entry_info(("a.txt", 12)), AsyncSource([b'hello ', b'world!'])),
+            (entry_info(("b.txt", 0)), AsyncSource([])),
+        ]
+
+    def test_archive(self):
+        """Test the async archive is read back by zipfile."""
+        for compression in (ZIP_STORED, ZIP_DEFLATED):
+            for password in (None, b'infected'):
+                with self.subTest(compression=compression, password=password):
+                    writer = ZiphyrWriter(password)
+                    with ThreadPoolExecutor(2) as executor:
+                        iterator = module.AsyncZiphyrIterator(
+                            writer, self.entries(), compression, executor
+                        )
+                        output = self.loop.run_until_complete(
+                            consume(iterator)
+                        )
+
+                    self.assertEqual(writer.offset, len(output))
+                    with ZipFile(io.BytesIO(output)) as f:
+                        f.setpassword(password)
+                        self.assertEqual(f.read("a.txt"), b'hello world!')
+                        self.assertEqual(f.read("b.txt"), b'')
+
+    def test_recycled_buffers(self):
+        """Test stored chunks over recycled buffers, queued unharmed."""
+        data = os.urandom(40000)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, 'sample.bin')
+            with open(filepath, 'wb') as f:
+                f.write(data)
+
+            source = AsyncSource(readinto_iterable(filepath, 1000))
+            iterator = module.AsyncZiphyrIterator(
+                ZiphyrWriter(), [(entry_info(("e", len(data))), source)],
+            )
+
+            async def lagging():
+                output = b''
+                async for chunk in iterator:
+                    for _ in range(5):
+                        await asyncio.sleep(0)
+                    output += chunk
+                return output
+
+            output = self.loop.run_until_complete(lagging())
+
+        with ZipFile(io.BytesIO(output)) as f:
+            self.assertEqual(f.read("e"), data)
+
+    def test_backpressure(self):
+        """Test the production stays bounded ahead of a stalled consumer."""
+        source = AsyncSource([b'%d' % i for i in range(100)])
+        iterator = module.AsyncZiphyrIterator(
+            ZiphyrWriter(), [(entry_info(("c", 190)), source)], buffering=2
+        )
+
+        async def stall():
+            await iterator.__anext__()
+            for _ in range(20):
+                await asyncio.sleep(0)
+            pulled = source.pulled
+            await iterator.aclose()
+            return pulled
+
+        self.assertLessEqual(self.loop.run_until_complete(stall()), 4)
+
+    def test_source_error(self):
+        """Test a failing source raises to the consumer."""
+        class Broken(AsyncSource):
+            async def __anext__(self):
+                raise OSError("disk on fire")
+
+        iterator = module.AsyncZiphyrIterator(
+            ZiphyrWriter(), [(entry_info(("d", 1)), Broken([]))]
+        )
+
+        with self.assertRaises(OSError):
+            self.loop.run_until_complete(consume(iterator))
+
+    def test_process_executor(self):
+        """Test a process pool executor refused."""
+        with ProcessPoolExecutor(1) as executor:
+            with self.assertRaises(TypeError):
+                module.AsyncZiphyrIterator(
+                    ZiphyrWriter(), self.entries(), executor=executor
+                )
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.auto` module."""
+
+import io
+import os
+import tempfile
+import unittest
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import ziphyr.auto as module
+from ziphyr import Ziphyr
+from ziphyr.utils import readinto_iterable
+
+
+class TestAuto(unittest.TestCase):
+    def test_entropy(self):
+        """Test the byte entropy of a few known distributions."""
+        self.assertEqual(module.entropy(b''), 0.0)
+        self.assertEqual(module.entropy(b'a' * 100), 0.0)
+        self.assertAlmostEqual(module.entropy(b'ab' * 100), 1.0)
+        self.assertAlmostEqual(module.entropy(bytes(range(256)) * 4), 8.0)
+
+    def test_peek(self):
+        """Test the sample taken without losing any chunk."""
+        chunks = [b'abc', b'defg', b'hi', b'jkl']
+        sample, source = module.peek(iter(chunks), 5)
+
+        self.assertEqual(sample, b'abcde')
+        self.assertEqual(list(source), chunks)
+
+        sample, source = module.peek([], 5)
+        self.assertEqual(sample, b'')
+        self.assertEqual(list(source), [])
+
+    def test_peek_recycled_buffers(self):
+        """Test a sample spanning recycled buffers, archived unharmed."""
+        data = b'Diamond dogs. ' * 40000
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = tmpdir + '/test.file'
+            with open(test_fp, 'wb') as f:
+                f.write(data)
+
+            sample, source = module.peek(
+                readinto_iterable(test_fp, 1 << 12), 1 << 14
+            )
+            self.assertEqual(sample, data[:1 << 14])
+            output = bytearray()
+            for chunk in source:
+                output += chunk
+            self.assertEqual(output, data)
+
+            z = Ziphyr()
+            z.from_metadata('dogs', len(data))
+            archive = io.BytesIO(b''.join(z.generator(
+                readinto_iterable(test_fp, 1 << 16),
+                module.AutoPolicy(sample_size=1 << 18),
+            )))
+
+        with ZipFile(archive, 'r') as f:
+            self.assertEqual(f.read('dogs'), data)
+
+    def test_choose(self):
+        """Test the choice against both thresholds."""
+        policy = module.AutoPolicy()
+        text = b'Some animals are more equal than others. ' * 100
+
+        choice = policy.choose(text)
+        self.assertEqual(choice.compression, ZIP_DEFLATED)
+        self.assertLess(choice.ratio, policy.ratio_threshold)
+        self.assertEqual(choice.sample_size, len(text))
+
+        choice = policy.choose(os.urandom(4096))
+        self.assertEqual(choice.compression, ZIP_STORED)
+        self.assertIsNone(choice.ratio)
+        self.assertGreater(choice.entropy, policy.entropy_threshold)
+
+        # under the entropy threshold, yet not worth a compression
+        strict = module.AutoPolicy(entropy_threshold=8.1, ratio_threshold=0.01)
+        choice = strict.choose(text)
+        self.assertEqual(choice.compression, ZIP_STORED)
+        self.assertIsNotNone(choice.ratio)
+
+        self.assertEqual(policy.choose(b'').compression, ZIP_STORED)
+
+    def test_auto_policy(self):
+        """Test the compression arguments standing for a policy."""
+        policy = module.AutoPolicy(sample_size=10)
+
+        self.assertIs(module.auto_policy(policy), policy)
+        self.assertIsInstance(module.auto_policy('auto'), module.AutoPolicy)
+        self.assertIsNone(module.auto_policy(ZIP_DEFLATED))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.batch` module and the command line."""
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import ziphyr.batch as module
+from ziphyr.__main__ import main
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        self.inputs = os.path.join(self.root, 'inputs')
+        os.makedirs(os.path.join(self.inputs, 'sub'))
+        self.files = {
+            os.path.join(self.inputs, 'a.txt'): b'Life on Mars? ' * 50,
+            os.path.join(self.inputs, 'b.txt'): b'',
+            os.path.join(self.inputs, 'sub', 'c.txt'): b'Oh man! ' * 500,
+        }
+        for path, data in self.files.items():
+            with open(path, 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read(self, target, password=None):
+        with ZipFile(target, 'r') as f:
+            f.setpassword(password)
+            name, = f.namelist()
+            return name, f.read(name)
+
+    def test_batch_jobs(self):
+        """Test the inputs turned into source/target pairs."""
+        a, b, c = sorted(self.files)
+        output = os.path.join(self.root, 'out')
+
+        self.assertEqual(module.batch_jobs([a]), [(a, a + '.zip')])
+        self.assertEqual(
+            module.batch_jobs([self.inputs]),
+            [(a, a + '.zip'), (b, b + '.zip')],
+        )
+        self.assertEqual(
+            [job.target for job in module.batch_jobs(
+                [self.inputs], output, recursive=True
+            )],
+            [os.path.join(output, 'inputs', 'a.txt.zip'),
+             os.path.join(output, 'inputs', 'b.txt.zip'),
+             os.path.join(output, 'inputs', 'sub', 'c.txt.zip')],
+        )
+
+        with self.assertRaises(ValueError):
+            module.batch_jobs([a, a])
+
+    def test_archive_file(self):
+        """Test one archive written then renamed over its target."""
+        source = sorted(self.files)[0]
+        target = os.path.join(self.root, 'out', 'a.zip')
+
+        result = module.archive_file(source, target, b'laughing',
+                                     ZIP_DEFLATED)
+
+        self.assertIsNone(result.error)
+        self.assertEqual(result.size, len(self.files[source]))
+        self.assertEqual(result.compress_size, os.path.getsize(target))
+        self.assertEqual(os.listdir(os.path.dirname(target)), ['a.zip'])
+        self.assertEqual(
+            self.read(target, b'laughing'), ('a.txt', self.files[source])
+        )
+
+    def test_archive_failure(self):
+        """Test a failure leaves neither target nor temporary file."""
+        target = os.path.join(self.root, 'missing.zip')
+        result = module.archive_file(
+            os.path.join(self.root, 'missing'), target
+        )
+
+        self.assertIn('FileNotFoundError', result.error)
+        self.assertFalse(os.path.exists(target))
+        self.assertEqual(sorted(os.listdir(self.root)), ['inputs'])
+
+    def test_run_batch(self):
+        """Test the jobs archived in process then in a pool."""
+        for workers in (1, 2):
+            output = os.path.join(self.root, 'out%d' % workers)
+            jobs = module.batch_jobs([self.inputs], output, recursive=True)
+            seen = []
+            results = list(module.run_batch(
+                jobs, b'laughing', workers=workers, progress=seen.append,
+            ))
+
+            self.assertEqual(seen, results)
+            self.assertEqual(len(results), 3)
+            for result in results:
+                self.assertIsNone(result.error)
+                self.assertEqual(
+                    self.read(result.target, b'laughing')[1],
+                    self.files[result.source],
+                )
+
+        report = module.summary(results, 2.0)
+        self.assertIn("3 archived, 0 failed in 2.00s", report)
+        self.assertIn("per file:", report)
+
+    def test_main(self):
+        """Test the command line, failures included."""
+        output = os.path.join(self.root, 'out')
+        stdout, stderr = io.StringIO(), io.StringIO()
+        argv = [
+            '--password-env', 'ZIPHYR_TEST_PASSWORD', '-c', 'deflated',
+            '-o', output, '-w', '1', '-q', self.inputs,
+            os.path.join(self.root, 'missing'),
+        ]
+
+        with patch.dict(os.environ, {'ZIPHYR_TEST_PASSWORD': 'laughing'}), \
+                redirect_stdout(stdout), redirect_stderr(stderr):
+            status = main(argv)
+
+        self.assertEqual(status, 1)
+        self.assertIn("2 archived, 1 failed", stdout.getvalue())
+        self.assertIn("FAILED", stderr.getvalue())
+        name, data = self.read(
+            os.path.join(output, 'inputs', 'a.txt.zip'), b'laughing'
+        )
+        self.assertEqual(data, self.files[os.path.join(self.inputs, 'a.txt')])
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.budget` module."""
+
+import bz2
+import os
+import tracemalloc
+import unittest
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED, crc32
+
+import ziphyr.budget as module
+from ziphyr.ziphyr import Ziphyr
+
+
+MIB = 1 << 20
+
+
+def synthetic(size, block):
+    """size bytes of the same block repeated, nothing held but it."""
+    for _ in range(size // len(block)):
+        yield block
+
+
+def peak_memory(size, block, compression, budget, password=None):
+    """Peak traced memory of an archive of size bytes, and its length."""
+    z = Ziphyr(password)
+    z.from_metadata("sample.bin", size)
+    length = 0
+    tracemalloc.start()
+    try:
+        for chunk in z.generator(
+            synthetic(size, block), compression, memory=budget
+        ):
+            length += len(chunk)
+        return tracemalloc.get_traced_memory()[1], length
+    finally:
+        tracemalloc.stop()
+
+
+class TestBudget(unittest.TestCase):
+    def setUp(self):
+        self.block = os.urandom(MIB // 2) + b'\x00' * (MIB // 2)
+
+    def test_split_chunks(self):
+        """Test the large chunks split into views, small ones untouched."""
+        chunks = list(module.split_chunks([b'a' * 10, b'b' * 3], 4))
+
+        self.assertEqual(
+            [bytes(chunk) for chunk in chunks],
+            [b'aaaa', b'aaaa', b'aa', b'bbb'],
+        )
+        self.assertIsInstance(chunks[0], memoryview)
+        self.assertIsInstance(chunks[-1], bytes)
+
+    def test_plan(self):
+        """Test the compressor settings and chunks fitted to the budget."""
+        large = module.MemoryBudget(256 * MIB).plan(ZIP_LZMA)
+        small = module.MemoryBudget(16 * MIB).plan(ZIP_LZMA)
+
+        self.assertGreater(large.state, small.state)
+        self.assertLessEqual(small.state, 8 * MIB)
+        self.assertEqual(large.chunksize, module.BUDGET_CHUNK_MAX)
+        self.assertLess(
+            module.MemoryBudget(MIB).plan(ZIP_DEFLATED).chunksize,
+            module.BUDGET_CHUNK_MAX,
+        )
+        self.assertEqual(module.MemoryBudget(MIB).plan(ZIP_STORED).state, 0)
+
+        for compression in (ZIP_STORED, ZIP_BZIP2, ZIP_LZMA):
+            with self.assertRaises(ValueError):
+                module.MemoryBudget(16 << 10).plan(compression)
+
+    def test_stage(self):
+        """Test the stage output, crc and size."""
+        data = self.block * 3
+        chunks = module.MemoryBudget(8 * MIB)([data], ZIP_BZIP2)
+        output = []
+        while True:
+            try:
+                output.append(next(chunks))
+            except StopIteration as stop:
+                self.assertEqual(stop.value, (crc32(data), len(data)))
+                break
+
+        self.assertEqual(bz2.decompress(b''.join(output)), data)
+
+    def test_flat_peak(self):
+        """
+        Test the peak memory within the budget from 1 MiB on, and flat
+        once past the first chunks.
+        """
+        for compression, budget, sizes, password in (
+            (ZIP_STORED, 2 * MIB, (1, 8, 64), None),
+            (ZIP_DEFLATED, 4 * MIB, (1, 4, 32), None),
+            (ZIP_DEFLATED, 4 * MIB, (1, 2, 8), b'laughing'),
+            (ZIP_BZIP2, 8 * MIB, (1, 2, 6), None),
+            (ZIP_LZMA, 32 * MIB, (1, 2, 6), None),
+        ):
+            with self.subTest(compression=compression, password=password):
+                block = self.block if password is None else bytes(MIB)
+                peaks = [
+                    peak_memory(
+                        size * MIB, block, compression, budget, password
+                    )[0]
+                    for size in sizes
+                ]
+
+                self.assertLessEqual(max(peaks), budget)
+                self.assertLessEqual(peaks[2], peaks[1] * 1.05)
+
+    def test_unbounded(self):
+        """Test a budgetless lzma archive going beyond what fits."""
+        peak, _ = peak_memory(MIB, self.block, ZIP_LZMA, None)
+        self.assertGreater(peak, 32 * MIB)
+
+        peak, length = peak_memory(MIB, self.block, ZIP_LZMA, 32 * MIB)
+        self.assertLess(peak, 32 * MIB)
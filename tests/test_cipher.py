@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.cipher` module."""
+
+import sys
+import timeit
+import unittest
+from os import urandom
+
+import ziphyr.cipher as module
+from ziphyr.stream import ZiphyrStream
+
+
+def legacy_cypher_chunk(stream, chunk):
+    """The per-byte cyphering formerly done by ZiphyrStream.cypher_chunk."""
+    return bytes(map(stream.cypher, chunk))
+
+
+class TestZipCryptoEngine(unittest.TestCase):
+    def test_tables(self):
+        """Test the module-level tables against their generators."""
+        self.assertEqual(module.CRCTABLE[1], module._gen_crc(1))
+        self.assertEqual(len(module.CRCTABLE), 256)
+        self.assertEqual(len(module.KEYSTREAM), 0x10000)
+
+        for k in (0, 2, 0xFFFF, 0x12345678):
+            _k = k | 2
+            self.assertEqual(
+                module.KEYSTREAM[k & 0xFFFF], ((_k * (_k ^ 1)) >> 8) & 0xFF
+            )
+
+    def test_password_keys(self):
+        """Test the keys derived from a password."""
+        engine = module.ZipCryptoEngine(b'Setec Astronomy')
+
+        self.assertEqual(engine.keys, (634591792, 1488870758, 2152654391))
+        self.assertEqual(module.ZipCryptoEngine().keys, module.PKZIP_KEYS)
+
+    def test_encrypt_matches_legacy(self):
+        """Test the engine produces exactly the legacy per-byte output."""
+        data = urandom(4096)
+        engine = module.ZipCryptoEngine(b'infected')
+        stream = ZiphyrStream(b'infected')
+
+        for chunk in (data[:1], data[1:1000], data[1000:]):
+            self.assertEqual(
+                engine.encrypt(chunk), legacy_cypher_chunk(stream, chunk)
+            )
+            self.assertEqual(engine.keys, (stream.x, stream.y, stream.z))
+
+    def test_encrypt_into(self):
+        """Test in-place cyphering of bytearray and memoryview buffers."""
+        data = b'too many secrets'
+        expected = module.ZipCryptoEngine(b'Setec Astronomy').encrypt(data)
+
+        buf = bytearray(data)
+        engine = module.ZipCryptoEngine(b'Setec Astronomy')
+        self.assertIs(engine.encrypt_into(buf), buf)
+        self.assertEqual(buf, expected)
+
+        buf = bytearray(b'__' + data)
+        engine = module.ZipCryptoEngine(b'Setec Astronomy')
+        engine.encrypt_into(memoryview(buf)[2:])
+        self.assertEqual(buf, b'__' + expected)
+
+    def test_decrypt(self):
+        """Test deciphering undoes the cyphering, keys included."""
+        data = urandom(4096)
+        ciphered = module.ZipCryptoEngine(b'infected').encrypt(data)
+        encrypter = module.ZipCryptoEngine(b'infected')
+        encrypter.encrypt(data)
+
+        engine = module.ZipCryptoEngine(b'infected')
+        self.assertEqual(
+            engine.decrypt(ciphered[:100]) + engine.decrypt(ciphered[100:]),
+            data,
+        )
+        self.assertEqual(engine.keys, encrypter.keys)
+
+        buf = bytearray(ciphered)
+        engine = module.ZipCryptoEngine(b'infected')
+        self.assertIs(engine.decrypt_into(buf), buf)
+        self.assertEqual(buf, data)
+
+    def test_copy(self):
+        """Test copies are independent key states."""
+        engine = module.ZipCryptoEngine(b'password')
+        clone = engine.copy()
+
+        self.assertEqual(engine.keys, clone.keys)
+
+        engine.encrypt(b'abc')
+        self.assertNotEqual(engine.keys, clone.keys)
+
+    def test_throughput(self):
+        """Test the engine outperforms the legacy per-byte cyphering."""
+        data = urandom(1 << 16)
+        stream = ZiphyrStream(b'infected')
+        engine = module.ZipCryptoEngine(b'infected')
+
+        legacy = min(timeit.repeat(
+            lambda: legacy_cypher_chunk(stream, data), number=1, repeat=3
+        ))
+        fast = min(timeit.repeat(
+            lambda: engine.encrypt_into(bytearray(data)), number=1, repeat=3
+        ))
+
+        sys.stderr.write(
+            "\nzipcrypto throughput: legacy %.2f MB/s, engine %.2f MB/s\n"
+            % (len(data) / legacy / 1e6, len(data) / fast / 1e6)
+        )
+        self.assertLess(fast, legacy)
+
+
+class TestCipherContextFactory(unittest.TestCase):
+    def test_hits_and_misses(self):
+        """Test engines are cloned from the cached key state."""
+        factory = module.CipherContextFactory()
+
+        first = factory.engine(b'infected')
+        second = factory.engine(b'infected')
+
+        self.assertIsNot(first, second)
+        self.assertEqual(first.keys, module.ZipCryptoEngine(b'infected').keys)
+        self.assertEqual(first.keys, second.keys)
+        self.assertEqual(factory.cache_info(), (1, 1, 32, 1))
+
+        first.encrypt(b'abc')
+        self.assertNotEqual(first.keys, factory.engine(b'infected').keys)
+
+    def test_lru_bound(self):
+        """Test the least recently used password is evicted."""
+        factory = module.CipherContextFactory(maxsize=2)
+
+        factory.engine(b'a')
+        factory.engine(b'b')
+        factory.engine(b'a')
+        factory.engine(b'c')
+
+        self.assertEqual(factory.cache_info().currsize, 2)
+
+        factory.engine(b'a')
+        factory.engine(b'b')
+        self.assertEqual(factory.cache_info(), (2, 4, 2, 2))
+
+        factory.cache_clear()
+        self.assertEqual(factory.cache_info(), (0, 0, 2, 0))
+
+    def test_disabled(self):
+        """Test a zero maxsize factory never caches."""
+        factory = module.CipherContextFactory(maxsize=0)
+
+        factory.engine(b'a')
+        factory.engine(b'a')
+
+        self.assertEqual(factory.cache_info(), (0, 2, 0, 0))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.deflate` module."""
+
+import unittest
+import zlib
+from os import urandom
+from zipfile import ZIP_LZMA
+
+import ziphyr.deflate as module
+from ziphyr.writer import drain
+
+
+def inflate(data):
+    decompressor = zlib.decompressobj(-15)
+    clear = decompressor.decompress(data)
+    return clear, decompressor.eof
+
+
+class TestDeflate(unittest.TestCase):
+    def test_crc32_combine(self):
+        """Test crc32 combination against the crc32 of the concatenation."""
+        a, b = urandom(1000), urandom(1 << 17)
+
+        for first, second in ((a, b), (b, a), (b'', a), (a, b'')):
+            self.assertEqual(
+                module.crc32_combine(
+                    zlib.crc32(first), zlib.crc32(second), len(second)
+                ),
+                zlib.crc32(first + second),
+            )
+
+    def test_deflate_block(self):
+        """Test sync-flushed blocks chain into one deflate stream."""
+        first, second = b'a' * 1000, b'ab' * 1000
+        head, crc, length = module.deflate_block(first, b'', False, 6)
+        tail, _, _ = module.deflate_block(second, first, True, 6)
+
+        self.assertEqual((crc, length), (zlib.crc32(first), len(first)))
+        self.assertTrue(head.endswith(b'\x00\x00\xff\xff'))
+        self.assertEqual(inflate(head + tail), (first + second, True))
+
+    def test_parallel_deflate(self):
+        """Test the parallel stage produces a valid deflate stream."""
+        data = (urandom(300) + b'z' * 700) * 300
+        source = [data[i:i + 7777] for i in range(0, len(data), 7777)]
+        stage = module.ParallelDeflate(workers=3, blocksize=10000)
+
+        chunks = []
+        result = drain(stage(source), chunks.append)
+
+        self.assertEqual(result, (zlib.crc32(data), len(data)))
+        self.assertEqual(inflate(b''.join(chunks)), (data, True))
+        self.assertLess(len(b''.join(chunks)), len(data))
+
+    def test_empty_source(self):
+        """Test an empty source still ends the deflate stream."""
+        chunks = []
+        result = drain(module.ParallelDeflate()([]), chunks.append)
+
+        self.assertEqual(result, (0, 0))
+        self.assertEqual(inflate(b''.join(chunks)), (b'', True))
+
+    def test_deflate_only(self):
+        """Test the parallel stage refuses other compressions."""
+        with self.assertRaises(ValueError):
+            next(module.ParallelDeflate()([b'a'], ZIP_LZMA))
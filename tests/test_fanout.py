@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.fanout` module."""
+
+import io
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import ziphyr.fanout as module
+from ziphyr.utils import readinto_iterable
+
+
+PASSWORDS = [b'ground', b'control', None, b'major tom']
+
+
+class TestFanout(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(20000) + b'Space oddity. ' * 20000
+        self.reads = 0
+
+    def source(self):
+        """Source of small chunks, counting its reads."""
+        self.reads += 1
+        for i in range(0, len(self.data), 4096):
+            yield self.data[i:i + 4096]
+
+    def fanout(self, maxsize=module.FANOUT_BUFFER):
+        return module.ArchiveFanout(PASSWORDS, [
+            (("oddity", len(self.data)), self.source()),
+            (("empty", 0), []),
+        ], ZIP_DEFLATED, maxsize=maxsize, chunksize=1 << 12)
+
+    def check(self, archives):
+        """Every archive readable with its password, same payloads."""
+        sizes = set()
+        for password, archive in zip(PASSWORDS, archives):
+            with ZipFile(io.BytesIO(archive), 'r') as f:
+                f.setpassword(password)
+                self.assertIsNone(f.testzip())
+                self.assertEqual(f.read("oddity"), self.data)
+                sizes.add(f.getinfo("oddity").compress_size
+                          - (12 if password else 0))
+        self.assertEqual(len(sizes), 1)
+        self.assertEqual(self.reads, 1)
+
+    def test_write(self):
+        """Test the archives written into files in a single pass."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            targets = [os.path.join(tmpdir, '%d.zip' % i) for i in range(3)]
+            buffer = io.BytesIO()
+            sizes = self.fanout().write(targets + [buffer])
+
+            archives = []
+            for target in targets:
+                with open(target, 'rb') as f:
+                    archives.append(f.read())
+            archives.append(buffer.getvalue())
+
+        self.assertEqual(sizes, [len(archive) for archive in archives])
+        self.check(archives)
+
+    def test_streams(self):
+        """Test the streams consumed concurrently, bounded."""
+        streams = self.fanout(maxsize=2).streams()
+
+        with ThreadPoolExecutor(len(streams)) as executor:
+            archives = list(executor.map(b''.join, streams))
+
+        self.check(archives)
+        fanout = self.fanout()
+        fanout.streams()
+        with self.assertRaises(RuntimeError):
+            fanout.streams()
+
+    def test_sequential(self):
+        """Test unbounded streams consumed one after the other."""
+        self.check([b''.join(s) for s in self.fanout(maxsize=None).streams()])
+
+    def test_recycled_buffers(self):
+        """Test a source recycling its buffers, queued unharmed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = os.path.join(tmpdir, 'oddity')
+            with open(test_fp, 'wb') as f:
+                f.write(self.data)
+
+            self.reads = 1
+            streams = module.ArchiveFanout(PASSWORDS, [(
+                ("oddity", len(self.data)),
+                readinto_iterable(test_fp, 1 << 12),
+            )], ZIP_STORED, maxsize=None).streams()
+            # the last stream lagging the whole entry behind the first
+            self.check([b''.join(s) for s in streams])
+
+    def test_closed(self):
+        """Test a closed stream no longer holding the others."""
+        first, *others = self.fanout(maxsize=1).streams()
+
+        with ThreadPoolExecutor(len(others)) as executor:
+            futures = [executor.submit(b''.join, s) for s in others]
+            next(first)
+            first.close()
+            archives = [future.result(5) for future in futures]
+
+        with ZipFile(io.BytesIO(archives[-1]), 'r') as f:
+            f.setpassword(PASSWORDS[-1])
+            self.assertEqual(f.read("oddity"), self.data)
+
+    def test_unstarted(self):
+        """Test a stream never started not holding the others."""
+        streams = self.fanout(maxsize=2).streams()
+        del streams[1]
+
+        with ThreadPoolExecutor(len(streams)) as executor:
+            futures = [executor.submit(b''.join, s) for s in streams]
+            archives = [future.result(5) for future in futures]
+
+        with ZipFile(io.BytesIO(archives[-1]), 'r') as f:
+            f.setpassword(PASSWORDS[-1])
+            self.assertEqual(f.read("oddity"), self.data)
+
+    def test_late_start(self):
+        """Test a stream started after the others, still complete."""
+        first, late = module.ArchiveFanout(
+            PASSWORDS[:2], [(("oddity", len(self.data)), self.source())],
+            ZIP_DEFLATED, maxsize=1,
+        ).streams()
+        b''.join(first)
+
+        with ZipFile(io.BytesIO(b''.join(late)), 'r') as f:
+            f.setpassword(PASSWORDS[1])
+            self.assertEqual(f.read("oddity"), self.data)
+
+    def test_failure(self):
+        """Test a source failure raised in every stream."""
+        def broken():
+            yield b'spiders'
+            raise OSError("from mars")
+
+        streams = module.ArchiveFanout(
+            PASSWORDS[:2], [(("mars", 100), broken())]
+        ).streams()
+        errors = []
+
+        def consume(stream):
+            try:
+                b''.join(stream)
+            except OSError as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=consume, args=(s,)) for s in streams
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(errors), 2)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.layout` module."""
+
+import io
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from zipfile import ZipFile, crc32
+
+import ziphyr.layout as module
+from ziphyr.ziphyr import Ziphyr
+
+
+class TestLayout(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = {}
+        for name, data in (
+            ('major.txt', b'Ground control to Major Tom. ' * 3000),
+            ('empty.txt', b''),
+            ('tom.bin', os.urandom(70000)),
+        ):
+            path = os.path.join(self.tmpdir.name, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.files[path] = data
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def entries(self):
+        return [
+            ((os.path.basename(path), len(data), 25165824,
+              (2020, 1, 1, 0, 0, 0)), path)
+            for path, data in self.files.items()
+        ]
+
+    def test_archive_layout(self):
+        """Test the layout is the very archive of multi_generator."""
+        cache = module.CRCCache()
+        layout = module.archive_layout(self.entries(), cache)
+        output = b''.join(layout.chunks(4096))
+
+        self.assertEqual(
+            output, b''.join(Ziphyr().multi_generator(self.entries()))
+        )
+        self.assertEqual(layout.size, len(output))
+        self.assertEqual(
+            layout.size, Ziphyr().archive_size(e[0] for e in self.entries())
+        )
+        regions = [p for p in layout if isinstance(p, module.FileRegion)]
+        self.assertEqual(len(regions), 2)
+
+        with ZipFile(io.BytesIO(output), 'r') as f:
+            self.assertIsNone(f.testzip())
+            for path, data in self.files.items():
+                self.assertEqual(f.read(os.path.basename(path)), data)
+
+    def test_crc_cache(self):
+        """Test the crc of the files are read once, then cached."""
+        cache = module.CRCCache()
+        path, data = next(iter(self.files.items()))
+
+        self.assertEqual(cache.crc(path), crc32(data))
+        self.assertEqual(cache.crc(path), crc32(data))
+        self.assertEqual(cache.cache_info(), (1, 1, 1024, 1))
+
+        module.archive_layout(self.entries(), cache)
+        self.assertEqual(cache.cache_info(), (2, 3, 1024, 3))
+
+        # a given crc is trusted, the file is not read
+        entries = [e + (0xDEADBEEF,) for e in self.entries()]
+        output = b''.join(module.archive_layout(entries, cache).chunks())
+        self.assertIn(b'\xef\xbe\xad\xde', output)
+        self.assertEqual(cache.cache_info(), (2, 3, 1024, 3))
+
+        cache.cache_clear()
+        self.assertEqual(cache.cache_info(), (0, 0, 1024, 0))
+
+    def test_size_mismatch(self):
+        """Test a wrong announced size is refused."""
+        (metadata, path), = self.entries()[:1]
+        with self.assertRaises(ValueError):
+            module.archive_layout([((metadata[0], 1), path)])
+
+    def test_sendfile_fd(self):
+        """Test the archive sent kernel-side to a file descriptor."""
+        layout = module.archive_layout(self.entries())
+        target = os.path.join(self.tmpdir.name, 'test.zip')
+
+        with open(target, 'wb') as f:
+            self.assertEqual(layout.sendfile(f), layout.size)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b''.join(layout.chunks()))
+
+    def test_sendfile_socket(self):
+        """Test the archive sent kernel-side to a socket."""
+        layout = module.archive_layout(self.entries())
+        left, right = socket.socketpair()
+        received = []
+
+        def receive():
+            while True:
+                data = right.recv(1 << 16)
+                if not data:
+                    return
+                received.append(data)
+
+        thread = threading.Thread(target=receive)
+        thread.start()
+        with left:
+            self.assertEqual(layout.sendfile(left), layout.size)
+        thread.join()
+        right.close()
+
+        self.assertEqual(b''.join(received), b''.join(layout.chunks()))
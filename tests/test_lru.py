@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.lru` module."""
+
+import unittest
+
+import ziphyr.lru as module
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_items(self):
+        """Test the least recently used items evicted, and the counters."""
+        cache = module.LRUCache(2)
+        self.assertEqual(cache.put('a', 1), [])
+        self.assertEqual(cache.put('b', 2), [])
+        self.assertEqual(cache.get('a'), 1)  # b least recent now
+        self.assertIsNone(cache.get('c'))
+
+        self.assertEqual(cache.put('c', 3), [('b', 2)])
+        self.assertEqual(cache.keys(), ['a', 'c'])
+        self.assertEqual(cache.cache_info(), (1, 1, 2, 2))
+
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertIsNone(cache.pop('a'))
+        self.assertEqual(cache.cache_clear(), [('c', 3)])
+        self.assertEqual(cache.cache_info(), (0, 0, 2, 0))
+
+    def test_sizes(self):
+        """Test maxsize bounding the sizes given, with reloads."""
+        cache = module.LRUCache(100)
+        cache.put('a', 'A', 60)
+        self.assertEqual(cache.put('b', 'B', 50), [('a', 'A')])
+        self.assertEqual(cache.put('b', 'B', 30), [])
+        self.assertEqual(cache.cache_info().currsize, 30)
+
+        evicted = cache.reload([('x', 'X', 70), ('y', 'Y', 40)])
+        self.assertEqual(evicted, [('x', 'X')])
+        self.assertEqual(cache.keys(), ['y'])
+
+        cache.count(True)
+        cache.count(False)
+        self.assertEqual(cache.cache_info(), (1, 1, 100, 40))
+
+    def test_disabled(self):
+        """Test a zero maxsize caching nothing."""
+        cache = module.LRUCache(0)
+        self.assertEqual(cache.put('a', 1), [('a', 1)])
+        self.assertIsNone(cache.get('a'))
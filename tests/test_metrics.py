@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.metrics` module."""
+
+import unittest
+from zipfile import ZIP_DEFLATED
+
+import ziphyr.metrics as module
+from ziphyr.cipher import ZipCryptoEngine
+from ziphyr.writer import compressed_chunks, drain
+
+
+class Recorder(module.Instrument):
+    def __init__(self):
+        self.stages = []
+        self.archives = []
+
+    def stage(self, name, seconds, nbytes):
+        self.stages.append((name, seconds, nbytes))
+
+    def archive(self, stats):
+        self.archives.append(stats)
+
+    def bytes(self, name):
+        return sum(n for stage, _, n in self.stages if stage == name)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_instrument(self):
+        """Test the base instrument ignores everything."""
+        instrument = module.Instrument()
+        self.assertIsNone(instrument.stage('source', 0.1, 1))
+        self.assertIsNone(instrument.archive(None))
+
+    def test_timed(self):
+        """Test a wrapped function reports its calls."""
+        recorder = Recorder()
+        probe = module.ArchiveProbe(recorder)
+        upper = probe.timed('cypher', bytes.upper)
+
+        self.assertEqual(upper(b'abc'), b'ABC')
+        self.assertEqual(recorder.stages[0][0], 'cypher')
+        self.assertEqual(recorder.stages[0][2], 3)
+
+    def test_source_output(self):
+        """Test the source and yield stages then the archive totals."""
+        recorder = Recorder()
+        probe = module.ArchiveProbe(recorder)
+        source = probe.source([b'a' * 10, b'b' * 30])
+        output = list(probe.output(iter([b''.join(source)[:20]])))
+
+        self.assertEqual(output, [b'a' * 10 + b'b' * 10])
+        self.assertEqual(recorder.bytes('source'), 40)
+        self.assertEqual(recorder.bytes('yield'), 20)
+
+        stats, = recorder.archives
+        self.assertEqual(stats.bytes_in, 40)
+        self.assertEqual(stats.bytes_out, 20)
+        self.assertEqual(stats.ratio, 2.0)
+        self.assertLessEqual(stats.first_byte, stats.duration)
+
+    def test_stage(self):
+        """Test a compression stage is timed without its source."""
+        recorder = Recorder()
+        probe = module.ArchiveProbe(recorder)
+        data = b'All animals are equal. ' * 100
+        chunks = probe.stage(compressed_chunks)(
+            probe.source([data]), ZIP_DEFLATED
+        )
+
+        compressed = []
+        while True:
+            try:
+                compressed.append(next(chunks))
+            except StopIteration as stop:
+                clear_crc, file_size = stop.value
+                break
+
+        self.assertEqual(file_size, len(data))
+        self.assertEqual(recorder.bytes('compress'), len(b''.join(compressed)))
+        self.assertEqual(recorder.bytes('source'), len(data))
+
+    def test_compressed_chunks(self):
+        """Test the shared stage with its crc32 and compress calls timed."""
+        recorder = Recorder()
+        probe = module.ArchiveProbe(recorder)
+        data = [b'Four legs good. ' * 50, b'Two legs bad. ' * 50]
+        output, expected = [], []
+        self.assertEqual(
+            drain(probe.compressed_chunks(data, ZIP_DEFLATED), output.append),
+            drain(compressed_chunks(data, ZIP_DEFLATED), expected.append),
+        )
+        self.assertEqual(output, expected)
+        self.assertEqual(recorder.bytes('crc32'), len(b''.join(data)))
+        self.assertEqual(recorder.bytes('compress'), len(b''.join(data)))
+
+    def test_engine(self):
+        """Test a timed cipher engine encrypts as the engine itself."""
+        recorder = Recorder()
+        probe = module.ArchiveProbe(recorder)
+        engine = probe.engine(ZipCryptoEngine(b'laughing'))
+        reference = ZipCryptoEngine(b'laughing')
+
+        self.assertEqual(engine.encrypt(b'data'), reference.encrypt(b'data'))
+        self.assertEqual(engine.keys, reference.keys)
+        self.assertEqual(recorder.bytes('cypher'), 4)
+        self.assertIsNone(probe.engine(None))
+
+    def test_prometheus(self):
+        """Test the aggregator's Prometheus text exposition."""
+        aggregator = module.PrometheusAggregator()
+        aggregator.stage('cypher', 0.5, 100)
+        aggregator.stage('cypher', 0.25, 50)
+        aggregator.archive(module.ArchiveStats(200, 100, 2.0, 0.1, 1.0))
+        text = aggregator.exposition()
+
+        self.assertIn('# TYPE ziphyr_stage_seconds_total counter', text)
+        self.assertIn('ziphyr_stage_seconds_total{stage="cypher"} 0.75', text)
+        self.assertIn('ziphyr_stage_bytes_total{stage="cypher"} 150', text)
+        self.assertIn('ziphyr_stage_calls_total{stage="source"} 0', text)
+        self.assertIn('ziphyr_archives_total 1', text)
+        self.assertIn('ziphyr_archive_compression_ratio 2.0', text)
+        self.assertIn('ziphyr_archive_first_byte_seconds_sum 0.1', text)
+        self.assertIn('ziphyr_archive_duration_seconds_count 1', text)
+        self.assertTrue(text.endswith('\n'))
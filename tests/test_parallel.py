@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.parallel` module."""
+
+import io
+import os
+import tempfile
+import unittest
+from zipfile import ZIP_DEFLATED, ZIP_LZMA, ZipFile
+
+import ziphyr.parallel as module
+from ziphyr.utils import readinto_iterable
+from ziphyr.writer import ZiphyrWriter, entry_info
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = self.tmpdir.name + '/sample.bin'
+        with open(self.filepath, 'wb') as f:
+            f.write(b'MZ\x90\x00' * 5000)
+
+        self.contents = [
+            ("first", b'first ' * 100),
+            ("second", b''),
+            ("third", bytes(range(256)) * 40),
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def entries(self):
+        for filename, data in self.contents:
+            yield (filename, len(data)), [data[:10], data[10:]]
+        yield self.filepath, self.filepath
+
+    def check_archive(self, output, password=None):
+        with ZipFile(io.BytesIO(output)) as f:
+            f.setpassword(password)
+            names = [info.filename for info in f.infolist()]
+            self.assertEqual(
+                names,
+                [name for name, _ in self.contents]
+                + [self.filepath.lstrip('/')],
+            )
+            for filename, data in self.contents:
+                self.assertEqual(f.read(filename), data)
+            self.assertEqual(f.read(names[-1]), b'MZ\x90\x00' * 5000)
+
+    def test_compress_entry(self):
+        """Test a worker produces the same entry as the serial writer."""
+        metadata, source = next(self.entries())
+        info = entry_info(metadata)
+        data, record = module.compress_entry(info, source, ZIP_DEFLATED)
+
+        writer = ZiphyrWriter()
+        self.assertEqual(
+            b''.join(writer.entry(info, source, ZIP_DEFLATED)), data
+        )
+        self.assertEqual(writer.records[0], record)
+
+    def test_parallel_entries(self):
+        """Test the entries are emitted in order into a valid archive."""
+        for password in (None, b'infected'):
+            with self.subTest(password=password):
+                writer = ZiphyrWriter(password)
+                output = b''.join(module.parallel_entries(
+                    writer, self.entries(), ZIP_LZMA,
+                    workers=2, lookahead=2,
+                ))
+                output += b''.join(writer.close())
+
+                self.assertEqual(writer.offset, len(output))
+                self.check_archive(output, password)
+
+    def test_memory_ceiling(self):
+        """Test entries past the memory ceiling are streamed in-process."""
+        writer = ZiphyrWriter(b'infected')
+        output = b''.join(module.parallel_entries(
+            writer, self.entries(), ZIP_DEFLATED,
+            workers=1, max_memory=1000,
+        ))
+        output += b''.join(writer.close())
+
+        self.check_archive(output, b'infected')
+
+    def test_recycled_buffers(self):
+        """Test a source recycling its buffers, gathered unharmed."""
+        data = os.urandom(20000)
+        with open(self.filepath, 'wb') as f:
+            f.write(data)
+
+        writer = ZiphyrWriter()
+        output = b''.join(module.parallel_entries(writer, [(
+            ("recycled", len(data)), readinto_iterable(self.filepath, 1000),
+        )], ZIP_DEFLATED, workers=1))
+        output += b''.join(writer.close())
+
+        with ZipFile(io.BytesIO(output)) as f:
+            self.assertEqual(f.read("recycled"), data)
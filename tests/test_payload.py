@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.payload` module."""
+
+import hashlib
+import os
+import tempfile
+import unittest
+import zlib
+from zipfile import ZIP_DEFLATED, ZIP_LZMA, crc32
+
+import ziphyr.payload as module
+
+
+def drained(chunks):
+    """Joined chunks of a stage and its returned value."""
+    output = []
+    while True:
+        try:
+            output.append(next(chunks))
+        except StopIteration as stop:
+            return b''.join(output), stop.value
+
+
+def stored(data):
+    """Stage-like generator of already compressed data."""
+    yield data
+    return crc32(data), len(data)
+
+
+def unread():
+    """Source failing when read."""
+    raise AssertionError("source read on a cache hit")
+    yield
+
+
+class TestPayload(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmpdir.name, 'payloads')
+        self.data = b'Ashes to ashes, funk to funky. ' * 3000
+        self.digest = hashlib.sha256(self.data).hexdigest()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_file_digest(self):
+        """Test the digest of a file's content."""
+        path = os.path.join(self.tmpdir.name, 'major.tom')
+        with open(path, 'wb') as f:
+            f.write(self.data)
+        self.assertEqual(module.file_digest(path), self.digest)
+
+    def test_key(self):
+        """Test the key changing with the compression settings."""
+        keys = {
+            module.PayloadCache.key(self.digest, ZIP_DEFLATED),
+            module.PayloadCache.key(self.digest, ZIP_LZMA),
+            module.PayloadCache.key(self.digest, ZIP_DEFLATED, 9),
+            module.PayloadCache.key('other', ZIP_DEFLATED),
+        }
+        self.assertEqual(len(keys), 4)
+
+    def test_stage(self):
+        """Test a miss compressing into the cache, then a hit served."""
+        cache = module.PayloadCache(self.directory)
+
+        output, value = drained(
+            cache.stage(self.digest)([self.data], ZIP_DEFLATED)
+        )
+        self.assertEqual(value, (crc32(self.data), len(self.data)))
+        self.assertEqual(zlib.decompress(output, -15), self.data)
+
+        # a new instance finds the payload on disk
+        cache = module.PayloadCache(self.directory)
+        hit, value = drained(cache.stage(self.digest)(unread(), ZIP_DEFLATED))
+        self.assertEqual(hit, output)
+        self.assertEqual(value, (crc32(self.data), len(self.data)))
+        self.assertEqual(
+            cache.cache_info(),
+            (1, 0, module.PAYLOAD_MAXSIZE, len(output) + 28),
+        )
+
+        cache.cache_clear()
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(cache.cache_info(), (0, 0, module.PAYLOAD_MAXSIZE, 0))
+
+    def test_eviction(self):
+        """Test the least recently used payloads going beyond maxsize."""
+        cache = module.PayloadCache(self.directory, maxsize=2500)
+        keys = ['k%d' % i for i in range(3)]
+        for key in keys[:2]:
+            drained(cache.store(key, stored(os.urandom(1000))))
+
+        self.assertIsNotNone(cache.get(keys[0]))  # k1 least recent now
+        drained(cache.store(keys[2], stored(os.urandom(1000))))
+
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+        self.assertLessEqual(cache.cache_info().currsize, 2500)
+
+    def test_shared_directory(self):
+        """Test maxsize bounding the payloads of every process."""
+        first = module.PayloadCache(self.directory, maxsize=2500)
+        second = module.PayloadCache(self.directory, maxsize=2500)
+
+        drained(first.store('k0', stored(os.urandom(1000))))
+        drained(second.store('k1', stored(os.urandom(1000))))
+        drained(first.store('k2', stored(os.urandom(1000))))
+
+        sizes = [
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory)
+        ]
+        self.assertLessEqual(sum(sizes), 2500)
+        self.assertEqual(len(sizes), 2)
+        self.assertIsNotNone(first.get('k2'))
+
+    def test_incomplete(self):
+        """Test aborted and corrupted payloads never served."""
+        cache = module.PayloadCache(self.directory)
+        chunks = cache.stage(self.digest)(
+            [self.data] * 100, ZIP_DEFLATED
+        )
+        next(chunks)
+        chunks.close()
+        self.assertEqual(os.listdir(self.directory), [])
+
+        key = cache.key(self.digest, ZIP_DEFLATED)
+        drained(cache.store(key, stored(b'compressed')))
+        path = os.path.join(self.directory, key + '.payload')
+        with open(path, 'ab') as f:
+            f.write(b'garbage')
+
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.pipeline` module."""
+
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import ziphyr.pipeline as module
+from ziphyr import Ziphyr
+from ziphyr.utils import readinto_iterable
+from ziphyr.writer import compressed_chunks
+
+
+def drained(chunks):
+    """Items of a generator and its returned value."""
+    items = []
+    while True:
+        try:
+            items.append(next(chunks))
+        except StopIteration as stop:
+            return items, stop.value
+
+
+class TestPipeline(unittest.TestCase):
+    def test_background(self):
+        """Test the items produced in another thread, and the value."""
+        threads = set()
+
+        def produce():
+            for i in range(10):
+                threads.add(threading.current_thread().name)
+                yield i
+            return 'done'
+
+        items, value = drained(module.background(produce(), 2, 'producer'))
+
+        self.assertEqual(items, list(range(10)))
+        self.assertEqual(value, 'done')
+        self.assertEqual(threads, {'producer'})
+
+    def test_bounded(self):
+        """Test the producer kept at most depth items ahead."""
+        produced = []
+
+        def produce():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        chunks = module.background(produce(), 3)
+        next(chunks)
+        time.sleep(0.05)
+        # depth queued, plus the one taken and the one being put
+        self.assertLessEqual(len(produced), 5)
+        chunks.close()
+
+    def test_failure(self):
+        """Test an exception of the producer raised to the consumer."""
+        def produce():
+            yield b'ziggy'
+            raise OSError("source lost")
+
+        chunks = module.background(produce())
+        self.assertEqual(next(chunks), b'ziggy')
+        with self.assertRaises(OSError):
+            next(chunks)
+
+    def test_close(self):
+        """Test closing the consumer stops and closes the producer."""
+        closed = threading.Event()
+
+        def produce():
+            try:
+                while True:
+                    yield b'spiders'
+            finally:
+                closed.set()
+
+        chunks = module.background(produce(), 2)
+        next(chunks)
+        chunks.close()
+        self.assertTrue(closed.wait(1))
+
+    def test_pipelined_stage(self):
+        """Test the pipelined stage matching the serial compression."""
+        source = [b'Suffragette city. ' * 1000] * 20
+
+        self.assertEqual(
+            drained(module.PipelinedStage(depth=2)(source, ZIP_DEFLATED)),
+            drained(compressed_chunks(source, ZIP_DEFLATED)),
+        )
+
+    def test_recycled_buffers(self):
+        """Test a source recycling its buffers, read ahead unharmed."""
+        data = os.urandom(1 << 18) + b'Moonage daydream. ' * 20000
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = tmpdir + '/test.file'
+            with open(test_fp, 'wb') as f:
+                f.write(data)
+
+            z = Ziphyr(b'ziggy')
+            z.from_metadata('daydream', len(data))
+            archive = io.BytesIO(b''.join(z.generator(
+                readinto_iterable(test_fp, 1 << 14), ZIP_DEFLATED,
+                pipeline=4,
+            )))
+
+        with ZipFile(archive, 'r') as f:
+            f.setpassword(b'ziggy')
+            self.assertEqual(f.read('daydream'), data)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.ranges` module."""
+
+import io
+import unittest
+from os import urandom
+from zipfile import ZipFile
+
+import ziphyr.ranges as module
+from ziphyr.cipher import ZipCryptoEngine
+from ziphyr.writer import entry_info
+
+
+class TestRanges(unittest.TestCase):
+    def setUp(self):
+        self.data = urandom(10000)
+        self.info = entry_info(("sample.exe", len(self.data)))
+
+    def index(self, password=None):
+        engine = ZipCryptoEngine(password) if password else None
+        source = [self.data[i:i + 3000] for i in range(0, 10000, 3000)]
+        return module.build_index(self.info, source, engine, interval=1024)
+
+    def generate(self, index, start=0, end=None):
+        return b''.join(module.generate_range(
+            index, io.BytesIO(self.data), start, end, chunksize=700
+        ))
+
+    def test_full_archive(self):
+        """Test the whole indexed archive is read back by zipfile."""
+        for password in (None, b'infected'):
+            with self.subTest(password=password):
+                index = self.index(password)
+                output = self.generate(index)
+
+                self.assertEqual(len(output), index.size)
+                self.assertEqual(len(index.checkpoints), 10 * bool(password))
+                with ZipFile(io.BytesIO(output)) as f:
+                    f.setpassword(password)
+                    self.assertEqual(f.read("sample.exe"), self.data)
+
+    def test_ranges(self):
+        """Test every range is the slice of the whole archive."""
+        for password in (None, b'infected'):
+            index = self.index(password)
+            output = self.generate(index)
+            for start, end in (
+                (0, 10), (10, 100), (0, 46), (40, 5000), (1023, 1025),
+                (3000, 3000), (5000, 9000), (9000, index.size),
+                (index.size - 30, None), (0, index.size + 10),
+            ):
+                with self.subTest(password=password, start=start, end=end):
+                    self.assertEqual(
+                        self.generate(index, start, end), output[start:end]
+                    )
+
+    def test_invalid_ranges(self):
+        """Test the errors on invalid ranges and short sources."""
+        index = self.index(b'infected')
+
+        with self.assertRaises(ValueError):
+            self.generate(index, 10, 5)
+        with self.assertRaises(ValueError):
+            self.generate(index, -1)
+
+        self.data = self.data[:5000]
+        with self.assertRaises(ValueError):
+            self.generate(index, 6000, 7000)
+
+    def test_dump_load(self):
+        """Test the sidecar index round-trip."""
+        index = self.index(b'infected')
+        sidecar = io.BytesIO()
+        index.dump(sidecar)
+        sidecar.seek(0)
+
+        loaded = module.ArchiveIndex.load(sidecar)
+
+        self.assertEqual(loaded.__dict__, index.__dict__)
+        self.assertEqual(self.generate(loaded, 50, 8000),
+                         self.generate(index, 50, 8000))
+
+        with self.assertRaises(ValueError):
+            module.ArchiveIndex.load(io.BytesIO(b'\x00' * 100))
+
+        # headers past 64K with the longest filename
+        self.info = entry_info(("s" * 0xFFFF, len(self.data)))
+        index = self.index(b'infected')
+        self.assertGreater(len(index.prefix), 0xFFFF)
+        sidecar = io.BytesIO()
+        index.dump(sidecar)
+        sidecar.seek(0)
+        self.assertEqual(
+            module.ArchiveIndex.load(sidecar).__dict__, index.__dict__
+        )
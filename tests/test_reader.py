@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.reader` module."""
+
+import io
+import os
+import unittest
+from zipfile import (
+    BadZipFile, ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED, ZipFile,
+)
+
+import ziphyr.reader as module
+from ziphyr.ziphyr import Ziphyr
+
+
+def trickle(data, size=7):
+    """Non-seekable source of tiny chunks."""
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestReader(unittest.TestCase):
+    def setUp(self):
+        # stored data holding a fake data descriptor signature
+        self.data = os.urandom(5000) + b'PK\x07\x08' + b'Changes. ' * 2000
+        self.entries = [
+            (("changes", len(self.data)), [self.data]),
+            (("empty", 0), []),
+            (("hunky dory", 5), [b'dory!']),
+        ]
+
+    def archive(self, compression, password=None):
+        z = Ziphyr(password)
+        return b''.join(z.multi_generator(self.entries, compression))
+
+    def read(self, source, password=None, **kwargs):
+        return [
+            (entry.filename, b''.join(chunks))
+            for entry, chunks in module.ZiphyrReader(
+                source, password, **kwargs
+            )
+        ]
+
+    def test_round_trip(self):
+        """Test reading back streamed archives, chunk by tiny chunk."""
+        expected = [
+            ("changes", self.data), ("empty", b''), ("hunky dory", b'dory!'),
+        ]
+        for compression in (ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA):
+            for password in (None, b'laughing'):
+                with self.subTest(compression=compression, password=password):
+                    archive = self.archive(compression, password)
+                    self.assertEqual(
+                        self.read(trickle(archive), password, chunksize=512),
+                        expected,
+                    )
+                    self.assertEqual(
+                        self.read(io.BytesIO(archive), password), expected
+                    )
+
+    def test_zipfile_archive(self):
+        """Test reading archives with sizes in their local headers."""
+        buffer = io.BytesIO()
+        with ZipFile(buffer, 'w', ZIP_DEFLATED) as f:
+            f.writestr("changes", self.data)
+            f.writestr("stored", b'dory!', ZIP_STORED)
+
+        self.assertEqual(
+            self.read(trickle(buffer.getvalue(), 100)),
+            [("changes", self.data), ("stored", b'dory!')],
+        )
+
+    def test_entry(self):
+        """Test the entries completed by their data descriptor."""
+        reader = module.ZiphyrReader([self.archive(ZIP_DEFLATED, b'laughing')],
+                                     b'laughing')
+        entries = []
+        for entry, chunks in reader:
+            self.assertIsNone(entry.file_size)
+            entries.append(module.drain(chunks, lambda chunk: None))
+
+        self.assertEqual(
+            [e.file_size for e in entries], [len(self.data), 0, 5]
+        )
+        self.assertTrue(all(e.flag_bits & 0x09 == 0x09 for e in entries))
+
+    def test_skip(self):
+        """Test entries left unread are skipped."""
+        reader = module.ZiphyrReader([self.archive(ZIP_STORED)])
+        names = [entry.filename for entry, chunks in reader]
+        self.assertEqual(names, ["changes", "empty", "hunky dory"])
+
+    def test_bounded_output(self):
+        """Test highly compressed data comes out in bounded chunks."""
+        data = b'\x00' * (1 << 22)
+        z = Ziphyr()
+        archive = b''.join(
+            z.multi_generator([(("zeros", len(data)), [data])], ZIP_DEFLATED)
+        )
+        for entry, chunks in module.ZiphyrReader([archive], chunksize=4096):
+            sizes = [len(chunk) for chunk in chunks]
+
+        self.assertEqual(sum(sizes), len(data))
+        self.assertLessEqual(max(sizes), 4096)
+
+    def test_password(self):
+        """Test missing and wrong passwords."""
+        archive = self.archive(ZIP_STORED, b'laughing')
+
+        with self.assertRaises(RuntimeError):
+            self.read([archive])
+        with self.assertRaises(RuntimeError):
+            self.read([archive], b'crying')
+
+    def test_corruption(self):
+        """Test corrupted and truncated archives are detected."""
+        archive = bytearray(self.archive(ZIP_STORED))
+        archive[1000] ^= 0xFF
+        with self.assertRaises(BadZipFile):
+            self.read([bytes(archive)])
+
+        archive = self.archive(ZIP_DEFLATED)
+        with self.assertRaises(BadZipFile):
+            self.read([archive[:len(archive) // 2]])
+        with self.assertRaises(BadZipFile):
+            self.read([b'not a zip'])
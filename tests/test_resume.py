@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.resume` module."""
+
+import io
+import unittest
+from os import urandom
+from zipfile import ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED, ZipFile
+
+import ziphyr.resume as module
+from ziphyr.cipher import ZipCryptoEngine
+from ziphyr.writer import entry_info
+
+
+class TestResumableStream(unittest.TestCase):
+    def setUp(self):
+        self.data = (urandom(100) + b'\x00' * 400) * 40
+        self.info = entry_info(("dump.raw", len(self.data)))
+
+    def source(self, start=0):
+        size = len(self.data)
+        return [self.data[i:i + 700] for i in range(start, size, 700)]
+
+    def stream(self, compression, password):
+        engine = ZipCryptoEngine(password) if password else None
+        return module.ResumableStream(
+            self.info, self.source(), compression, engine, every=3000
+        )
+
+    def test_resume(self):
+        """Test a resumed stream goes on with the very same bytes."""
+        for compression in (ZIP_STORED, ZIP_DEFLATED):
+            for password in (None, b'infected'):
+                with self.subTest(compression=compression, password=password):
+                    stream = self.stream(compression, password)
+                    states = []
+                    output = b''
+                    for chunk in stream:
+                        output += chunk
+                        states.append(stream.state)
+
+                    with ZipFile(io.BytesIO(output)) as f:
+                        f.setpassword(password)
+                        self.assertEqual(f.read("dump.raw"), self.data)
+
+                    self.assertGreater(len(set(states)), 5)
+                    for state in set(states):
+                        state = module.StreamState.loads(state.dumps())
+                        resumed = module.resume(
+                            state, self.source(state.file_size)
+                        )
+                        self.assertEqual(
+                            output[:state.emitted] + b''.join(resumed),
+                            output,
+                        )
+
+    def test_rechunked(self):
+        """Test a stream resumed with another chunking, same bytes."""
+        for compression in (ZIP_STORED, ZIP_DEFLATED):
+            for password in (None, b'infected'):
+                with self.subTest(compression=compression, password=password):
+                    stream = self.stream(compression, password)
+                    states = set()
+                    output = b''
+                    for chunk in stream:
+                        output += chunk
+                        states.add(stream.state)
+
+                    for state in states:
+                        rest = self.data[state.file_size:]
+                        for size in (1, 999, 4096, len(rest) or 1):
+                            resumed = module.resume(state, [
+                                rest[i:i + size]
+                                for i in range(0, len(rest), size)
+                            ])
+                            self.assertEqual(
+                                output[:state.emitted] + b''.join(resumed),
+                                output,
+                            )
+
+    def test_state(self):
+        """Test the checkpoints are taken at the expected boundaries."""
+        stream = self.stream(ZIP_STORED, b'infected')
+
+        header = next(stream)
+        self.assertEqual(stream.state.emitted, len(header))
+        self.assertEqual(stream.state.file_size, 0)
+        self.assertEqual(stream.state.compress_size, 12)
+
+        # the fifth chunk split at the interval
+        for _ in range(5):
+            next(stream)
+        self.assertEqual(stream.state.file_size, 3000)
+        self.assertEqual(stream.state.compress_size, 3012)
+        self.assertEqual(stream.state.every, 3000)
+        self.assertEqual(stream.state.info, self.info)
+
+    def test_serialization(self):
+        """Test the state round-trip through its compact serialization."""
+        state = self.stream(ZIP_DEFLATED, None).snapshot()
+
+        self.assertEqual(module.StreamState.loads(state.dumps()), state)
+        self.assertLess(len(state.dumps()), 200)
+
+    def test_unresumable(self):
+        """Test only stored and deflated streams, with an interval, resume."""
+        with self.assertRaises(ValueError):
+            self.stream(ZIP_LZMA, None)
+        with self.assertRaises(ValueError):
+            module.ResumableStream(self.info, self.source(), every=0)
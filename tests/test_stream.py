@@ -44,6 +44,37 @@ class TestZiphyrStream(unittest.TestCase):
         self.assertEqual(stream.y, 4199982011)
         self.assertEqual(stream.z, 3483152694)
 
+    def test_cypher_into(self):
+        """Test a caller's buffer only cyphered in place on demand."""
+        stream = module.ZiphyrStream(b'Setec Astronomy')
+        other = module.ZiphyrStream(b'Setec Astronomy')
+
+        buf = bytearray(b'too many secrets')
+        c = stream.cypher_chunk(buf)
+        self.assertEqual(buf, b'too many secrets')
+        self.assertIsInstance(c, bytes)
+
+        self.assertIs(other.cypher_into(buf), buf)
+        self.assertEqual(buf, c)
+
+    def test_chunk_queue(self):
+        """Test the writes are queued then joined once."""
+        stream = module.ZiphyrStream()
+        self.assertEqual(stream.get(), b'')
+
+        buf = bytearray(b'head')
+        stream.write(buf)
+        stream.write(b'')
+        stream.write(memoryview(b'-body'))
+        buf[:] = b'XXXX'
+
+        self.assertEqual(stream.get(), b'head-body')
+        self.assertEqual(stream.get(), b'')
+
+        chunk = b'alone'
+        stream.write(chunk)
+        self.assertIs(stream.get(), chunk)
+
     def test_closed_error(self):
         """Test the write error when closed."""
         stream = module.ZiphyrStream()
@@ -53,3 +84,30 @@ class TestZiphyrStream(unittest.TestCase):
 
         with self.assertRaises(ValueError):
             stream.write(b'2')
+
+
+class TestCoalesce(unittest.TestCase):
+    def test_coalesce(self):
+        """Test the regrouping into chunks of a target size."""
+        chunks = [b'ab', b'', b'cd', b'efghij', b'', b'k']
+
+        self.assertEqual(
+            list(module.coalesce(chunks, 4)), [b'abcd', b'efghij', b'k']
+        )
+        self.assertEqual(
+            list(module.coalesce(chunks, 100)), [b'abcdefghijk']
+        )
+        self.assertEqual(list(module.coalesce([b'', b''], 4)), [])
+
+    def test_passthrough(self):
+        """Test large chunks are not copied, empty ones always dropped."""
+        big = b'x' * 10
+        self.assertIs(next(module.coalesce([big], 4)), big)
+        self.assertEqual(
+            list(module.coalesce([b'a', b'', b'b'], None)), [b'a', b'b']
+        )
+
+        view = memoryview(bytearray(b'x' * 10))
+        chunk = next(module.coalesce([view], 4))
+        self.assertIs(type(chunk), bytes)
+        self.assertEqual(chunk, b'x' * 10)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.template` module."""
+
+import io
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import ziphyr.template as module
+from ziphyr.cipher import CipherContextFactory
+
+
+class TestTemplate(unittest.TestCase):
+    def test_template(self):
+        """Test the template settings, immutable."""
+        template = module.ZiphyrTemplate(b'laughing', ZIP_DEFLATED)
+
+        self.assertEqual(template.password, b'laughing')
+        self.assertEqual(template.compression, ZIP_DEFLATED)
+        self.assertIsNotNone(template.factory)
+        with self.assertRaises(AttributeError):
+            template.password = b'crying'
+        self.assertEqual(
+            template._replace(compression=ZIP_STORED).compression, ZIP_STORED
+        )
+
+    def test_context(self):
+        """Test contexts from metadata and from a filepath."""
+        template = module.ZiphyrTemplate(b'laughing')
+        data = b'Rebel rebel. ' * 1000
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = os.path.join(tmpdir, 'rebel.txt')
+            with open(test_fp, 'wb') as f:
+                f.write(data)
+
+            for context in (
+                template(("rebel.txt", len(data)), [data]),
+                template(test_fp),
+            ):
+                output = b''.join(context)
+                self.assertEqual(len(output), context.archive_size())
+                with ZipFile(io.BytesIO(output), 'r') as f:
+                    f.setpassword(b'laughing')
+                    self.assertEqual(f.read(context.filename), data)
+
+                with self.assertRaises(RuntimeError):
+                    iter(context)
+
+        context = template._replace(compression='auto')(
+            ("rebel.txt", len(data)), [data]
+        )
+        b''.join(context)
+        self.assertEqual(context.choices[0][1].compression, ZIP_DEFLATED)
+
+    def test_concurrency(self):
+        """Test many simultaneous archives of one template in threads."""
+        factory = CipherContextFactory()
+        template = module.ZiphyrTemplate(
+            b'laughing', ZIP_DEFLATED, factory=factory, chunksize=1 << 10,
+        )
+        payloads = [
+            os.urandom(1000) + (b'%03d ' % i) * (200 + 37 * i)
+            for i in range(64)
+        ]
+
+        def archive(i):
+            data = payloads[i]
+            # tiny chunks, for the threads to interleave
+            chunks = (data[j:j + 500] for j in range(0, len(data), 500))
+            context = template(("sample%03d" % i, len(data)), chunks)
+            return i, b''.join(context)
+
+        with ThreadPoolExecutor(16) as executor:
+            results = list(executor.map(archive, range(len(payloads))))
+
+        for i, output in results:
+            with ZipFile(io.BytesIO(output), 'r') as f:
+                f.setpassword(b'laughing')
+                self.assertEqual(f.namelist(), ["sample%03d" % i])
+                self.assertIsNone(f.testzip())
+                self.assertEqual(f.read("sample%03d" % i), payloads[i])
+
+        self.assertEqual(template.password, b'laughing')
+        self.assertEqual(factory.cache_info().currsize, 1)
+        self.assertEqual(
+            factory.cache_info().hits + factory.cache_info().misses, 64
+        )
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.tree` module."""
+
+import io
+import os
+import stat
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import ziphyr.tree as module
+from ziphyr import Ziphyr
+
+
+FILES = {
+    'b.txt': b'bravo' * 100,
+    'a/z.log': b'zulu',
+    'a/c/d.txt': b'delta' * 2000,
+    'a/c/e.tmp': b'echo',
+    'cache/x.txt': b'xray',
+    'f.bin': b'',
+}
+
+
+def make_tree(root, files=FILES):
+    """Writes the files under root."""
+    for name, data in files.items():
+        path = os.path.join(root, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def read_entries(entries):
+    """(arcname, data) of (metadata, source) pairs, in order."""
+    return [
+        (metadata[0], b''.join(source)) for metadata, source in entries
+    ]
+
+
+class TestTree(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.root = self._tmpdir.name
+        make_tree(self.root)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_walk_tree(self):
+        """Test the deterministic order, and the filters."""
+        walked = [e.arcname for e in module.walk_tree(self.root)]
+        self.assertEqual(walked, [
+            'a/c/d.txt', 'a/c/e.tmp', 'a/z.log', 'b.txt', 'cache/x.txt',
+            'f.bin',
+        ])
+
+        walked = module.walk_tree(self.root, exclude=['*.tmp', 'cache'])
+        self.assertEqual(
+            [e.arcname for e in walked],
+            ['a/c/d.txt', 'a/z.log', 'b.txt', 'f.bin'],
+        )
+        walked = module.walk_tree(self.root, include=['a/*.txt', '*.bin'])
+        self.assertEqual(
+            [e.arcname for e in walked], ['a/c/d.txt', 'f.bin'],
+        )
+
+        with self.assertRaises(ValueError):
+            module.walk_tree(self.root, symlinks='dereference')
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), "no symlinks")
+    def test_symlinks(self):
+        """Test the symlinks skipped, followed once, or stored."""
+        os.symlink('b.txt', os.path.join(self.root, 'link.txt'))
+        os.symlink('..', os.path.join(self.root, 'a', 'up'))
+        os.symlink('c', os.path.join(self.root, 'a', 'c2'))
+
+        skipped = [e.arcname for e in module.walk_tree(self.root)]
+        followed = [
+            e.arcname for e in module.walk_tree(self.root, symlinks='follow')
+        ]
+        stored = module.walk_tree(self.root, symlinks='store')
+
+        self.assertNotIn('link.txt', skipped)
+        self.assertIn('link.txt', followed)
+        # the loop back to the root is cut, a directory is walked once
+        self.assertFalse([name for name in followed if 'up/' in name])
+        self.assertFalse([name for name in followed if 'c2/' in name])
+        self.assertEqual(
+            [(e.arcname, e.is_symlink) for e in stored if e.is_symlink],
+            [('a/c2', True), ('a/up', True), ('link.txt', True)],
+        )
+
+        entries = dict(read_entries(
+            module.tree_entries(self.root, symlinks='store')
+        ))
+        metadata = dict(
+            (m[0], m) for m, _ in
+            module.tree_entries(self.root, symlinks='store')
+        )
+        self.assertEqual(entries['link.txt'], b'b.txt')
+        self.assertTrue(stat.S_ISLNK(metadata['link.txt'][2] >> 16))
+        self.assertEqual(metadata['link.txt'][1], 5)
+
+    def test_tree_entries(self):
+        """Test the prefetched entries, in order, with their metadata."""
+        entries = list(module.tree_entries(self.root, prefetch=2))
+        self.assertEqual(
+            [data for _, data in read_entries(
+                module.tree_entries(self.root, workers=2, prefetch=2)
+            )],
+            [FILES[m[0]] for m, _ in entries],
+        )
+        for (name, size, ext_attr, date_time), _ in entries:
+            self.assertEqual(size, len(FILES[name]))
+            self.assertTrue(stat.S_ISREG(ext_attr >> 16))
+            self.assertEqual(len(date_time), 6)
+
+    def test_prefetch(self):
+        """Test the files opened and read ahead in the worker threads."""
+        threads = set()
+        _open_entry = module._open_entry
+
+        def open_entry(entry, chunksize):
+            threads.add(threading.current_thread().name)
+            return _open_entry(entry, chunksize)
+
+        with mock.patch.object(module, '_open_entry', open_entry):
+            entries = module.tree_entries(self.root, workers=2, prefetch=4)
+            self.assertEqual(len(read_entries(entries)), len(FILES))
+
+            # closed half-way, the files prefetched are let go
+            entries = module.tree_entries(self.root, prefetch=4)
+            metadata, source = next(entries)
+            entries.close()
+        self.assertEqual(b''.join(source), FILES[metadata[0]])
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread().name, threads)
+
+    def test_onerror(self):
+        """Test a failing file raised, or skipped through onerror."""
+        _open_entry = module._open_entry
+
+        def open_entry(entry, chunksize):
+            if entry.arcname == 'b.txt':
+                raise PermissionError(13, 'Permission denied', entry.path)
+            return _open_entry(entry, chunksize)
+
+        with mock.patch.object(module, '_open_entry', open_entry):
+            with self.assertRaises(PermissionError):
+                read_entries(module.tree_entries(self.root))
+
+            errors = []
+            names = [name for name, _ in read_entries(module.tree_entries(
+                self.root, onerror=lambda path, e: errors.append(path),
+            ))]
+        self.assertNotIn('b.txt', names)
+        self.assertEqual(len(names), len(FILES) - 1)
+        self.assertEqual(errors, [os.path.join(self.root, 'b.txt')])
+
+    def test_tree_generator(self):
+        """Test a zipcrypted archive of the tree, unzipped with zipfile."""
+        z = Ziphyr(b'casefile')
+        archive = io.BytesIO(b''.join(z.tree_generator(
+            self.root, ZIP_DEFLATED, exclude=['*.tmp'],
+        )))
+
+        with ZipFile(archive, 'r') as f:
+            f.setpassword(b'casefile')
+            self.assertIsNone(f.testzip())
+            self.assertEqual(f.namelist(), [
+                'a/c/d.txt', 'a/z.log', 'b.txt', 'cache/x.txt', 'f.bin',
+            ])
+            for name in f.namelist():
+                self.assertEqual(f.read(name), FILES[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.utils` module."""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import ziphyr.utils as module
+
+
+class TestUtils(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data = os.urandom(100000)
+        self.filepath = os.path.join(self.tmpdir.name, 'test.file')
+        with open(self.filepath, 'wb') as f:
+            f.write(self.data)
+        self.empty = os.path.join(self.tmpdir.name, 'empty.file')
+        open(self.empty, 'wb').close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_file_iterable(self):
+        """Test the plain reader."""
+        chunks = list(module.file_iterable(self.filepath, 4096))
+        self.assertEqual(b''.join(chunks), self.data)
+        self.assertEqual(len(chunks[0]), 4096)
+
+    def test_readinto_iterable(self):
+        """Test the reader recycling its buffers."""
+        output = bytearray()
+        chunks = module.readinto_iterable(self.filepath, 4096, buffers=2)
+        for chunk in chunks:
+            self.assertIsInstance(chunk, memoryview)
+            output += chunk
+        self.assertEqual(output, self.data)
+
+        first, second, third = module.readinto_iterable(self.filepath, 40000)
+        self.assertIs(third.obj, first.obj)
+        self.assertIsNot(second.obj, first.obj)
+        self.assertEqual(bytes(third), self.data[80000:])
+
+        self.assertEqual(list(module.readinto_iterable(self.empty)), [])
+
+    def test_owned_chunk(self):
+        """Test writable buffers copied, immutable chunks kept."""
+        chunk = b'rebel rebel'
+        self.assertIs(module.owned_chunk(chunk), chunk)
+        view = memoryview(chunk)
+        self.assertIs(module.owned_chunk(view), view)
+
+        buffer = bytearray(chunk)
+        owned = module.owned_chunk(memoryview(buffer)[:5])
+        buffer[:5] = b'xxxxx'
+        self.assertEqual(owned, b'rebel')
+        self.assertIsInstance(module.owned_chunk(buffer), bytes)
+
+    def test_mmap_iterable(self):
+        """Test the reader slicing the file's memory mapping."""
+        chunks = list(module.mmap_iterable(self.filepath, 4096))
+        self.assertTrue(all(c.readonly for c in chunks))
+        self.assertEqual(len(chunks), 25)
+        self.assertEqual(b''.join(chunks), self.data)
+
+        self.assertEqual(list(module.mmap_iterable(self.empty)), [])
+
+    def test_adaptive_iterable(self):
+        """Test the reader sizing its chunks after the consumer."""
+        fast = list(module.adaptive_iterable(self.filepath, 1024, 65536))
+        self.assertEqual(b''.join(fast), self.data)
+        self.assertEqual([len(c) for c in fast[:4]], [1562, 3124, 6248,
+                                                      12496])
+
+        slow = []
+        with patch('time.perf_counter', side_effect=[0, 1] * 100):
+            for chunk in module.adaptive_iterable(self.filepath, 1024, 65536):
+                slow.append(chunk)
+        self.assertEqual(b''.join(slow), self.data)
+        self.assertEqual([len(c) for c in slow[:3]], [1562, 1024, 1024])
+
+    def test_best_reader(self):
+        """Test the reader picked after the file."""
+        reader = module.best_reader(self.filepath)
+        self.assertEqual(reader.__name__, 'adaptive_iterable')
+
+        with patch.object(module, 'MMAP_THRESHOLD', 1024):
+            reader = module.best_reader(self.filepath)
+        self.assertEqual(reader.__name__, 'mmap_iterable')
+        self.assertEqual(b''.join(reader), self.data)
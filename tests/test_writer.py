@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.writer` module."""
+
+import io
+import tempfile
+import unittest
+from unittest.mock import patch
+from zipfile import (
+    ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED, ZipFile, crc32,
+)
+
+import ziphyr.writer as module
+
+
+def write_archive(writer, entries, compression=ZIP_STORED):
+    output = b''
+    for info, source in entries:
+        output += b''.join(writer.entry(info, source, compression))
+    return output + b''.join(writer.close())
+
+
+class TestHelpers(unittest.TestCase):
+    def test_dos_datetime(self):
+        """Test the dos date and time packing, clamped to 1980."""
+        self.assertEqual(
+            module.dos_datetime((2020, 6, 15, 13, 37, 42)),
+            (13 << 11 | 37 << 5 | 21, 40 << 9 | 6 << 5 | 15),
+        )
+        self.assertEqual(
+            module.dos_datetime((1970, 1, 1, 0, 0, 0)),
+            module.dos_datetime((1980, 1, 1, 0, 0, 0)),
+        )
+
+    def test_entry_info(self):
+        """Test the normalization of the entries metadata."""
+        info = module.entry_info(("Animal Farm", 1984))
+        self.assertEqual(info.filename, "Animal Farm")
+        self.assertEqual(info.file_size, 1984)
+        self.assertEqual(info.external_attr, module.DEFAULT_EXT_ATTR)
+        self.assertEqual(len(info.date_time), 6)
+
+        info = module.entry_info(("1984", 1949, 0o644 << 16, (1949,) * 6))
+        self.assertEqual(info.external_attr, 0o644 << 16)
+        self.assertEqual(info.date_time, (1949,) * 6)
+        self.assertIs(module.entry_info(info), info)
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b'42')
+            f.flush()
+            info = module.entry_info(f.name)
+
+        self.assertEqual(info.filename, f.name.lstrip('/'))
+        self.assertEqual(info.file_size, 2)
+
+
+class TestZiphyrWriter(unittest.TestCase):
+    def setUp(self):
+        self.entries = [
+            (module.entry_info(("a.txt", 17)), [b'abcdefghijklm', b'nopq']),
+            (module.entry_info(("empty", 0)), []),
+            (module.entry_info(("b.bin", 4000)), [b'\x00\xff' * 1000] * 2),
+        ]
+
+    def check_archive(self, output, password=None):
+        with ZipFile(io.BytesIO(output)) as f:
+            f.setpassword(password)
+            self.assertIsNone(f.testzip())
+            for info, source in self.entries:
+                self.assertEqual(f.read(info.filename), b''.join(source))
+            return f.infolist()
+
+    def test_multi_entries(self):
+        """Test a plain multi-entry archive is read back by zipfile."""
+        writer = module.ZiphyrWriter()
+        output = write_archive(writer, self.entries)
+
+        infolist = self.check_archive(output)
+        self.assertEqual(writer.offset, len(output))
+        self.assertEqual(writer.records, [])
+        self.assertEqual(infolist[1].header_offset, 30 + 5 + 17 + 16)
+        self.assertEqual(infolist[0].CRC, crc32(b''.join(self.entries[0][1])))
+
+    def test_encrypted_entries(self):
+        """Test every entry of a passworded archive is zipcrypted."""
+        for compression in (ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA):
+            with self.subTest(compression=compression):
+                writer = module.ZiphyrWriter(b'infected')
+                output = write_archive(writer, self.entries, compression)
+
+                infolist = self.check_archive(output, b'infected')
+                for info in infolist:
+                    self.assertTrue(info.flag_bits & module.FLAG_ENCRYPTED)
+                    self.assertEqual(info.compress_type, compression)
+
+    def test_compression(self):
+        """Test the entries are actually compressed."""
+        for compression in (ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA):
+            with self.subTest(compression=compression):
+                writer = module.ZiphyrWriter()
+                output = write_archive(writer, self.entries, compression)
+
+                infolist = self.check_archive(output)
+                self.assertLess(infolist[2].compress_size, 4000)
+
+    def test_compact_records(self):
+        """Test only compact records are kept until the central directory."""
+        writer = module.ZiphyrWriter(b'infected')
+        for info, source in self.entries:
+            list(writer.entry(info, source))
+
+        self.assertEqual(len(writer.records), 3)
+        record = writer.records[0]
+        self.assertIsInstance(record, module.EntryRecord)
+        self.assertEqual(record.filename, b'a.txt')
+        self.assertEqual(record.file_size, 17)
+        self.assertEqual(record.compress_size, 17 + 12)
+
+    def test_utf8_filename(self):
+        """Test non-ascii filenames are flagged utf-8."""
+        self.entries = [(module.entry_info(("héhé", 1)), [b'!'])]
+        output = write_archive(module.ZiphyrWriter(), self.entries)
+
+        infolist = self.check_archive(output)
+        self.assertTrue(infolist[0].flag_bits & module.FLAG_UTF8)
+
+    @patch('ziphyr.writer.ZIP64_LIMIT', 1000)
+    def test_zip64(self):
+        """Test the ZIP64 extensions past the limit."""
+        writer = module.ZiphyrWriter(b'infected')
+        output = write_archive(writer, self.entries)
+
+        with patch('zipfile.ZIP64_LIMIT', 1000):
+            infolist = self.check_archive(output, b'infected')
+        self.assertEqual(infolist[2].file_size, 4000)
+        self.assertIn(b'PK\x06\x06', output)
+
+    @patch('ziphyr.writer.ZIP64_LIMIT', 1000)
+    def test_zip64_unprovisioned(self):
+        """Test the error when an entry outgrows its announced size."""
+        writer = module.ZiphyrWriter()
+        info = module.entry_info(("lie", 1))
+
+        with self.assertRaises(RuntimeError):
+            list(writer.entry(info, [b'0' * 2000]))
+
+    def test_end_records(self):
+        """Test ZIP64 end records from 0xFFFF entries on, as zipfile."""
+        self.assertNotIn(b'PK\x06\x06', module.end_records(0xFFFE, 0, 0))
+        self.assertIn(b'PK\x06\x06', module.end_records(0xFFFF, 0, 0))
+
+    @patch('ziphyr.writer.ZIP_FILECOUNT_LIMIT', 2)
+    def test_stored_archive_size(self):
+        """Test the size prediction, ZIP64 end records included."""
+        for password in (None, b'infected'):
+            with self.subTest(password=password):
+                writer = module.ZiphyrWriter(password)
+                output = write_archive(writer, self.entries)
+
+                self.assertIn(b'PK\x06\x06', output)
+                self.assertEqual(
+                    module.stored_archive_size(
+                        [info for info, _ in self.entries], bool(password)
+                    ),
+                    len(output),
+                )
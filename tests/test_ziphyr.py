@@ -2,13 +2,23 @@
 
 """Tests for `ziphyr.ziphyr` module."""
 
+import asyncio
+import io
+import os
 import tempfile
 import unittest
 from filecmp import cmp
 from unittest.mock import patch
-from zipfile import ZipFile
+from zipfile import (
+    ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED, ZipFile,
+)
 
 import ziphyr.ziphyr as module
+from ziphyr.auto import AutoPolicy
+from ziphyr.cipher import CipherContextFactory
+from ziphyr.metrics import PrometheusAggregator
+from ziphyr.payload import PayloadCache
+from ziphyr.resume import StreamState
 from ziphyr.retro import RetroZipFile, RetroZipInfo
 from ziphyr.utils import file_iterable
 
@@ -74,6 +84,18 @@ class TestZiphyr(unittest.TestCase):
         self.assertEqual(z.zinfo.file_size, _filesize)
         self.assertEqual(z.zinfo.external_attr, 25165824)
 
+    def test_cache_info(self):
+        """Test the cipher contexts are shared between generators."""
+        factory = CipherContextFactory()
+        z = module.Ziphyr(b'password', factory)
+        z.from_metadata("h2g2", 0)
+
+        for _ in range(3):
+            list(z.generator(list()))
+
+        self.assertEqual(z.cache_info(), (2, 1, 32, 1))
+        self.assertIs(z.writer.factory, factory)
+
     def test_primeless(self):
         """Test error when Ziphyr isn't primed."""
         z = module.Ziphyr()
@@ -148,3 +170,490 @@ class TestZiphyr(unittest.TestCase):
                 test_rp = f.extract(test_fp[1:], tmpdir)
 
             self.assertTrue(cmp(test_fp, test_rp))
+
+    def test_generator_native(self):
+        """
+        Test the native writer's archives against zipfile, for every
+        compression, then the zipfile fallback.
+        """
+        data = b'Four legs good, two legs bad. ' * 5000
+
+        for compression in (ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA):
+            for password in (None, b'laughing'):
+                with self.subTest(compression=compression, password=password):
+                    z = module.Ziphyr(password)
+                    z.from_metadata("Animal Farm", len(data))
+                    output = b''.join(z.generator(
+                        [data[:70000], data[70000:]], compression
+                    ))
+
+                    self.assertIsNone(z.stream)
+                    with ZipFile(io.BytesIO(output), 'r') as f:
+                        f.setpassword(password)
+                        self.assertIsNone(f.testzip())
+                        self.assertEqual(f.read("Animal Farm"), data)
+                        self.assertEqual(
+                            f.getinfo("Animal Farm").compress_type,
+                            compression,
+                        )
+
+        z = module.Ziphyr(b'laughing', native=False)
+        z.from_metadata("Animal Farm", len(data))
+        output = b''.join(z.generator([data]))
+
+        self.assertIsNotNone(z.stream)
+        with ZipFile(io.BytesIO(output), 'r') as f:
+            f.setpassword(b'laughing')
+            self.assertEqual(f.read("Animal Farm"), data)
+
+        with self.assertRaises(ValueError):
+            b''.join(z.generator([data], ZIP_DEFLATED))
+
+    def test_generator_auto(self):
+        """Test compression chosen per entry from its first bytes."""
+        text = b'All animals are equal. ' * 5000
+        noise = os.urandom(100000)
+
+        for data, expected in ((text, ZIP_DEFLATED), (noise, ZIP_STORED)):
+            z = module.Ziphyr(b'laughing')
+            z.from_metadata("Animal Farm", len(data))
+            output = b''.join(z.generator(
+                [data[:1000], data[1000:]], 'auto', workers=2
+            ))
+
+            (filename, choice), = z.choices
+            self.assertEqual(filename, "Animal Farm")
+            self.assertEqual(choice.compression, expected)
+            with ZipFile(io.BytesIO(output), 'r') as f:
+                f.setpassword(b'laughing')
+                self.assertEqual(f.read("Animal Farm"), data)
+                self.assertEqual(
+                    f.getinfo("Animal Farm").compress_type, expected
+                )
+
+        z = module.Ziphyr()
+        output = b''.join(z.multi_generator([
+            (("text", len(text)), [text]),
+            (("noise", len(noise)), [noise]),
+            (("empty", 0), []),
+        ], AutoPolicy(ZIP_LZMA, sample_size=4096)))
+
+        self.assertEqual(
+            [(name, choice.compression) for name, choice in z.choices],
+            [("text", ZIP_LZMA), ("noise", ZIP_STORED),
+             ("empty", ZIP_STORED)],
+        )
+        self.assertLess(z.choices[0][1].ratio, 0.1)
+        with ZipFile(io.BytesIO(output), 'r') as f:
+            self.assertIsNone(f.testzip())
+            self.assertEqual(f.read("noise"), noise)
+
+    def test_generator_cache(self):
+        """Test compressed payloads cached then only zipcrypted."""
+        data = b'Under pressure. ' * 5000
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = tmpdir + '/test.file'
+            with open(test_fp, 'wb') as f:
+                f.write(data)
+            cache = PayloadCache(tmpdir + '/cache')
+
+            outputs = []
+            for password in (b'laughing', b'laughing', None, None):
+                z = module.Ziphyr(password)
+                z.from_filepath(test_fp, arcname='test.file')
+                outputs.append(b''.join(
+                    z.generator(compression=ZIP_DEFLATED, cache=cache)
+                ))
+                with ZipFile(io.BytesIO(outputs[-1]), 'r') as f:
+                    f.setpassword(password)
+                    self.assertIsNone(f.testzip())
+                    self.assertEqual(f.read('test.file'), data)
+
+            self.assertEqual(cache.cache_info()[:2], (3, 1))
+            self.assertNotEqual(outputs[0], outputs[1])
+            self.assertEqual(outputs[2], outputs[3])
+
+            z = module.Ziphyr()
+            z.from_metadata("pressure", len(data))
+            with self.assertRaises(ValueError):
+                next(z.generator([data], ZIP_DEFLATED, cache=cache))
+
+    def test_generator_memory(self):
+        """Test archives written within a memory budget."""
+        data = os.urandom(300000) + b'Station to station. ' * 50000
+
+        for compression in (ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA):
+            z = module.Ziphyr(b'laughing')
+            z.from_metadata("station", len(data))
+            output = b''.join(
+                z.generator([data], compression, memory=32 << 20)
+            )
+            with ZipFile(io.BytesIO(output), 'r') as f:
+                f.setpassword(b'laughing')
+                self.assertEqual(f.read("station"), data)
+
+        z.from_metadata("station", len(data))
+        with self.assertRaises(ValueError):
+            next(z.generator([data], ZIP_DEFLATED, workers=2, memory=1 << 20))
+
+    def test_generator_pipeline(self):
+        """Test archives written through the background pipeline."""
+        data = os.urandom(100000) + b'Moonage daydream. ' * 50000
+        chunks = [data[i:i + 4096] for i in range(0, len(data), 4096)]
+
+        for compression, workers in (
+            (ZIP_STORED, None), (ZIP_DEFLATED, None), (ZIP_DEFLATED, 2),
+        ):
+            aggregator = PrometheusAggregator()
+            z = module.Ziphyr(b'laughing')
+            z.from_metadata("daydream", len(data))
+            output = b''.join(z.generator(
+                iter(chunks), compression, workers, instrument=aggregator,
+                pipeline=2,
+            ))
+
+            self.assertEqual(aggregator.bytes_in, len(data))
+            with ZipFile(io.BytesIO(output), 'r') as f:
+                f.setpassword(b'laughing')
+                self.assertEqual(f.read("daydream"), data)
+
+    def test_generator_reader(self):
+        """Test the generator reading the primed filepath itself."""
+        data = b'Major Tom to ground control. ' * 1000
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = tmpdir + '/test.file'
+            with open(test_fp, 'wb') as f:
+                f.write(data)
+
+            z = module.Ziphyr(b'laughing')
+            z.from_filepath(test_fp)
+            with patch('ziphyr.utils.MMAP_THRESHOLD', 1024):
+                chunks = list(z.generator(compression=ZIP_DEFLATED))
+
+        self.assertTrue(all(type(c) is bytes for c in chunks))
+        with ZipFile(io.BytesIO(b''.join(chunks)), 'r') as f:
+            f.setpassword(b'laughing')
+            self.assertEqual(f.read(test_fp[1:]), data)
+
+        z.from_metadata("oddity", 42)
+        with self.assertRaises(ValueError):
+            next(z.generator())
+
+    def test_layout(self):
+        """Test the zero-copy layout of the primed filepath."""
+        data = b'Major Tom to ground control. ' * 1000
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = tmpdir + '/test.file'
+            with open(test_fp, 'wb') as f:
+                f.write(data)
+
+            z = module.Ziphyr()
+            z.from_filepath(test_fp)
+            layout = z.layout()
+            output = b''.join(layout.chunks())
+
+            self.assertEqual(layout.size, z.archive_size())
+            with ZipFile(io.BytesIO(output), 'r') as f:
+                self.assertEqual(f.read(test_fp[1:]), data)
+
+            with self.assertRaises(ValueError):
+                module.Ziphyr(b'laughing').layout([test_fp])
+
+        z.from_metadata("oddity", 42)
+        with self.assertRaises(RuntimeError):
+            z.layout()
+
+    def test_reader(self):
+        """Test reading back a streamed archive without spooling it."""
+        data = b'Ground control to Major Tom. ' * 1000
+
+        z = module.Ziphyr(b'laughing')
+        z.from_metadata("oddity", len(data))
+        upload = io.BytesIO(b''.join(z.generator([data], ZIP_DEFLATED)))
+
+        entries = [
+            (entry.filename, b''.join(chunks))
+            for entry, chunks in z.reader(upload)
+        ]
+        self.assertEqual(entries, [("oddity", data)])
+
+    def test_fanout(self):
+        """Test the primed file compressed once for many passwords."""
+        data = b'Starman waiting in the sky. ' * 5000
+        passwords = [b'ziggy', b'stardust', b'aladdin']
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = tmpdir + '/test.file'
+            with open(test_fp, 'wb') as f:
+                f.write(data)
+
+            z = module.Ziphyr()
+            z.from_filepath(test_fp, arcname='starman')
+            targets = [io.BytesIO() for _ in passwords]
+            z.fanout(passwords, compression=ZIP_DEFLATED).write(targets)
+
+        for password, target in zip(passwords, targets):
+            with ZipFile(target, 'r') as f:
+                f.setpassword(password)
+                self.assertEqual(f.read('starman'), data)
+
+        with self.assertRaises(RuntimeError):
+            module.Ziphyr().fanout(passwords)
+
+    def test_multi_generator(self):
+        """
+        Test zipping many entries with Ziphyr then unzipping with zipfile.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = tmpdir+'/test.file'
+            test_zp = tmpdir+'/test.zip'
+            password = b'laughing'
+
+            with open(test_fp, 'w') as f:
+                f.write(
+                    "Mother died today. "
+                    "Or maybe, yesterday; I can't be sure."
+                )
+
+            entries = [
+                (test_fp, file_iterable(test_fp)),
+                (("stranger.txt", 9), [b'Meursault']),
+            ]
+
+            z = module.Ziphyr(password)
+
+            with open(test_zp, 'ab') as f:
+                for chunk in z.multi_generator(entries, ZIP_DEFLATED):
+                    f.write(chunk)
+
+            with ZipFile(test_zp, 'r') as f:
+                f.setpassword(password)
+                test_rp = f.extract(test_fp[1:], tmpdir)
+                self.assertEqual(f.read("stranger.txt"), b'Meursault')
+                self.assertEqual(len(f.infolist()), 2)
+
+            self.assertTrue(cmp(test_fp, test_rp))
+
+    def test_parallel_generator(self):
+        """Test the parallel archive reads as the serial one."""
+        entries = [
+            (("%d.txt" % i, 1000), [b'%d' % i * 1000]) for i in range(5)
+        ]
+
+        z = module.Ziphyr(b'laughing')
+        output = b''.join(
+            z.parallel_generator(entries, ZIP_DEFLATED, workers=2)
+        )
+
+        with ZipFile(io.BytesIO(output), 'r') as f:
+            f.setpassword(b'laughing')
+            for metadata, source in entries:
+                self.assertEqual(f.read(metadata[0]), source[0])
+
+        for compression in ('auto', AutoPolicy()):
+            with self.assertRaises(ValueError):
+                z.parallel_generator(entries, compression)
+
+    def test_generator_workers(self):
+        """Test the pigz-style deflate of a single entry."""
+        data = b'All animals are equal. ' * 10000
+
+        z = module.Ziphyr(b'laughing')
+        z.from_metadata("Animal Farm", len(data))
+        output = b''.join(z.generator([data], ZIP_DEFLATED, workers=2))
+
+        with ZipFile(io.BytesIO(output), 'r') as f:
+            f.setpassword(b'laughing')
+            self.assertEqual(f.read("Animal Farm"), data)
+            self.assertLess(f.getinfo("Animal Farm").compress_size, len(data))
+
+        # workers only parallelize deflate and zstd, others stay serial
+        for compression in (ZIP_BZIP2, ZIP_LZMA):
+            with self.subTest(compression=compression):
+                z.from_metadata("Animal Farm", len(data))
+                output = b''.join(
+                    z.generator([data], compression, workers=2)
+                )
+                with ZipFile(io.BytesIO(output), 'r') as f:
+                    f.setpassword(b'laughing')
+                    self.assertEqual(f.read("Animal Farm"), data)
+        self.assertIsNone(module.compression_stage(ZIP_LZMA, 2)[1])
+
+    def test_generator_instrument(self):
+        """Test the per-stage instrumentation of both generator paths."""
+        data = b'All animals are equal. ' * 1000
+
+        for workers in (None, 2):
+            aggregator = PrometheusAggregator()
+            z = module.Ziphyr(b'laughing')
+            z.from_metadata("Animal Farm", len(data))
+            output = b''.join(z.generator(
+                [data[:5000], data[5000:]], ZIP_DEFLATED, workers=workers,
+                instrument=aggregator,
+            ))
+
+            with ZipFile(io.BytesIO(output), 'r') as f:
+                f.setpassword(b'laughing')
+                self.assertEqual(f.read("Animal Farm"), data)
+
+            self.assertEqual(aggregator.archives, 1)
+            self.assertEqual(aggregator.bytes_in, len(data))
+            self.assertEqual(aggregator.bytes_out, len(output))
+            self.assertEqual(aggregator.bytes['source'], len(data))
+            self.assertEqual(aggregator.bytes['yield'], len(output))
+            self.assertGreater(aggregator.calls['compress'], 0)
+            self.assertGreater(aggregator.calls['cypher'], 0)
+            self.assertEqual(
+                aggregator.calls['crc32'], 0 if workers else 2
+            )
+
+        aggregator = PrometheusAggregator()
+        z = module.Ziphyr(b'laughing', native=False)
+        z.from_metadata("Animal Farm", len(data))
+        output = b''.join(z.generator([data], instrument=aggregator))
+        self.assertEqual(aggregator.bytes_out, len(output))
+        self.assertEqual(aggregator.calls['crc32'], 1)
+
+    def test_async_generator(self):
+        """Test the asyncio counterpart of the generator."""
+        class Source():
+            def __init__(self):
+                self.chunks = iter((b'So it ', b'goes.'))
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                for chunk in self.chunks:
+                    return chunk
+                raise StopAsyncIteration
+
+        async def consume(iterator):
+            output = b''
+            async for chunk in iterator:
+                output += chunk
+            return output
+
+        z = module.Ziphyr(b'laughing')
+        z.from_metadata("slaughterhouse", 11)
+
+        loop = asyncio.new_event_loop()
+        try:
+            output = loop.run_until_complete(
+                consume(z.async_generator(Source(), ZIP_DEFLATED))
+            )
+        finally:
+            loop.close()
+
+        with ZipFile(io.BytesIO(output), 'r') as f:
+            f.setpassword(b'laughing')
+            self.assertEqual(f.read("slaughterhouse"), b'So it goes.')
+
+        with self.assertRaises(RuntimeError):
+            module.Ziphyr().async_generator(Source())
+        with self.assertRaises(ValueError):
+            z.async_generator(Source(), 'auto')
+        with self.assertRaises(ValueError):
+            z.async_multi_generator([], AutoPolicy())
+
+    def test_generator_chunksize(self):
+        """Test the generator output is coalesced, never empty."""
+        z = module.Ziphyr(b'password')
+        z.from_metadata("h2g2", 42 * 100)
+        source = [b''] + [b'42' * 50] * 42
+
+        chunks = list(z.generator(source, chunksize=1000))
+
+        self.assertTrue(all(chunks))
+        self.assertTrue(all(len(chunk) >= 1000 for chunk in chunks[:-1]))
+
+        z = module.Ziphyr()
+        z.from_metadata("h2g2", 0)
+        self.assertEqual(len(list(z.generator([b'']))), 1)
+
+    def test_archive_size(self):
+        """Test the predicted size against the generated archive."""
+        for password in (None, b'password'):
+            for size in (0, 1, 1000, 65537):
+                with self.subTest(password=password, size=size):
+                    z = module.Ziphyr(password)
+                    z.from_metadata("h2g2", size)
+                    output = b''.join(z.generator([b'4' * size]))
+
+                    self.assertEqual(z.archive_size(), len(output))
+
+        with self.assertRaises(RuntimeError):
+            module.Ziphyr().archive_size()
+
+    @patch('ziphyr.writer.ZIP64_LIMIT', 1000)
+    @patch('zipfile.ZIP64_LIMIT', 1000)
+    def test_archive_size_zip64(self):
+        """Test the predicted size around the ZIP64 boundary."""
+        for password in (None, b'password'):
+            for size in (951, 952, 988, 989, 1000, 1001, 3000):
+                with self.subTest(password=password, size=size):
+                    z = module.Ziphyr(password)
+                    z.from_metadata("h2g2", size)
+                    output = b''.join(z.generator([b'4' * size]))
+
+                    self.assertEqual(z.archive_size(), len(output))
+
+                    entries = [(("h2g2", size), [b'4' * size])] * 2
+                    output = b''.join(z.multi_generator(entries))
+                    self.assertEqual(
+                        z.archive_size([("h2g2", size)] * 2), len(output)
+                    )
+
+    def test_generate_range(self):
+        """Test the ranges of an indexed archive from its filepath."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            test_fp = tmpdir+'/test.file'
+            with open(test_fp, 'wb') as f:
+                f.write(b'Ground control to Major Tom. ' * 100)
+
+            z = module.Ziphyr(b'laughing')
+            z.from_filepath(test_fp)
+            index = z.build_index(file_iterable(test_fp), interval=100)
+
+            output = b''.join(z.generate_range(index, test_fp))
+            self.assertEqual(
+                b''.join(z.generate_range(index, test_fp, 1000, 2000)),
+                output[1000:2000],
+            )
+
+        with ZipFile(io.BytesIO(output), 'r') as f:
+            f.setpassword(b'laughing')
+            self.assertEqual(
+                f.read(test_fp[1:]), b'Ground control to Major Tom. ' * 100
+            )
+
+        with self.assertRaises(RuntimeError):
+            module.Ziphyr().build_index([])
+
+    def test_resumable_generator(self):
+        """Test an archive stream resumed from a serialized checkpoint."""
+        data = b'Ground control to Major Tom. ' * 1000
+
+        z = module.Ziphyr(b'laughing')
+        z.from_metadata("oddity", len(data))
+        stream = z.resumable_generator(
+            [data[:10000], data[10000:]], every=10000
+        )
+
+        first = next(stream) + next(stream)
+        state = stream.state.dumps()
+
+        resumed = module.Ziphyr.resume(
+            StreamState.loads(state), [data[10000:]]
+        )
+        output = first + b''.join(resumed)
+
+        with ZipFile(io.BytesIO(output), 'r') as f:
+            f.setpassword(b'laughing')
+            self.assertEqual(f.read("oddity"), data)
+
+        with self.assertRaises(RuntimeError):
+            module.Ziphyr().resumable_generator([])
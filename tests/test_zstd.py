@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+"""Tests for `ziphyr.zstd` module."""
+
+import io
+import unittest
+from unittest.mock import patch
+from zipfile import ZIP_DEFLATED, crc32
+
+import ziphyr.zstd as module
+from ziphyr.reader import ZiphyrReader
+from ziphyr.writer import ZiphyrWriter, entry_info
+from ziphyr.ziphyr import Ziphyr
+
+
+def trickle(data, size=1000):
+    """Source of small chunks."""
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@unittest.skipIf(module.zstandard is None, "zstandard is not installed")
+class TestZstd(unittest.TestCase):
+    def setUp(self):
+        self.data = b'Is there life on Mars? ' * 20000
+
+    def test_zstd_compression(self):
+        """Test the stage output, crc and size, threaded or not."""
+        for threads in (0, 2):
+            stage = module.ZstdCompression(level=9, threads=threads)
+            chunks = stage(trickle(self.data))
+            output = []
+            while True:
+                try:
+                    output.append(next(chunks))
+                except StopIteration as stop:
+                    crc, file_size = stop.value
+                    break
+
+            self.assertEqual(crc, crc32(self.data))
+            self.assertEqual(file_size, len(self.data))
+            decompressor = module.zstd_decompressor()
+            self.assertEqual(
+                decompressor.decompress(b''.join(output)), self.data
+            )
+            self.assertTrue(decompressor.eof)
+
+        with self.assertRaises(ValueError):
+            next(stage([self.data], ZIP_DEFLATED))
+
+    def test_round_trip(self):
+        """Test zstd entries read back, with and without password."""
+        for password in (None, b'starman'):
+            writer = ZiphyrWriter(password)
+            upload = b''.join(
+                list(writer.entry(
+                    entry_info(("mars", len(self.data))), trickle(self.data),
+                    module.ZIP_ZSTANDARD,
+                ))
+                + list(writer.entry(
+                    entry_info(("ziggy", 7)), [b'Stardust'[:7]],
+                    module.ZIP_ZSTANDARD, module.ZstdCompression(threads=2),
+                ))
+                + list(writer.close())
+            )
+
+            entries = [
+                (entry.compress_type, entry.filename, b''.join(chunks))
+                for entry, chunks in ZiphyrReader(
+                    trickle(upload, 4096), password
+                )
+            ]
+            self.assertEqual(entries, [
+                (module.ZIP_ZSTANDARD, "mars", self.data),
+                (module.ZIP_ZSTANDARD, "ziggy", b'Stardus'),
+            ])
+
+    def test_blocks(self):
+        """Test frames split after each block, the rest passing."""
+        data = self.data + bytes(range(256)) * 2000
+        frames = [
+            module.zstandard.ZstdCompressor(write_checksum=True).compress(
+                data
+            ),
+            b''.join(module.ZstdCompression(threads=0)(trickle(data))),
+        ]
+        for frame in frames:
+            for size in (1, 3, 5000):
+                blocks = module.ZstdBlocks()
+                steps = [
+                    step for chunk in trickle(frame + b'PK', size)
+                    for step in blocks.split(chunk)
+                ]
+                self.assertEqual(b''.join(steps), frame + b'PK')
+
+                d = module.zstd_decompressor()
+                outputs = []
+                while not d.eof:
+                    outputs.append(d.decompress(steps.pop(0)))
+                self.assertLessEqual(max(map(len, outputs)), 128 << 10)
+                self.assertEqual(b''.join(outputs), data)
+                self.assertEqual(d.unused_data + b''.join(steps), b'PK')
+
+        self.assertEqual(list(module.ZstdBlocks().split(b'PK\x03\x04\x00')),
+                         [b'PK\x03\x04\x00'])
+
+    def test_bounded_output(self):
+        """Test highly compressed entries read back in bounded chunks."""
+        data = b'\x00' * (1 << 24)
+        archive = b''.join(Ziphyr().multi_generator(
+            [(("zeros", len(data)), [data])], module.ZIP_ZSTANDARD,
+        ))
+        for entry, chunks in ZiphyrReader([archive], chunksize=4096):
+            sizes = [len(chunk) for chunk in chunks]
+
+        self.assertEqual(sum(sizes), len(data))
+        self.assertLessEqual(max(sizes), 4096)
+
+    def test_generator(self):
+        """Test Ziphyr generators given zstd settings."""
+        for compression, workers in (
+            (module.ZIP_ZSTANDARD, None),
+            (module.ZIP_ZSTANDARD, 2),
+            (module.ZstdCompression(level=19, threads=0), None),
+        ):
+            z = Ziphyr(b'starman')
+            z.from_metadata("mars", len(self.data))
+            upload = io.BytesIO(b''.join(
+                z.generator(trickle(self.data), compression, workers)
+            ))
+
+            (entry, chunks), = [
+                (entry, b''.join(chunks)) for entry, chunks in z.reader(upload)
+            ]
+            self.assertEqual(entry.compress_type, module.ZIP_ZSTANDARD)
+            self.assertEqual(chunks, self.data)
+
+        z = Ziphyr()
+        upload = b''.join(z.multi_generator(
+            [(("mars", len(self.data)), [self.data])],
+            module.ZstdCompression(threads=2),
+        ))
+        self.assertLess(len(upload), len(self.data) // 100)
+        (entry, chunks), = [
+            (entry, b''.join(chunks)) for entry, chunks in z.reader([upload])
+        ]
+        self.assertEqual(chunks, self.data)
+
+        with self.assertRaises(ValueError):
+            z.parallel_generator([], module.ZstdCompression())
+
+
+class TestWithoutZstd(unittest.TestCase):
+    def test_missing(self):
+        """Test the error raised when zstandard is not installed."""
+        with patch.object(module, 'zstandard', None):
+            with self.assertRaises(RuntimeError):
+                module.ZstdCompression()
+            with self.assertRaises(RuntimeError):
+                module.get_compressor(module.ZIP_ZSTANDARD)
+            self.assertIsNotNone(module.get_compressor(ZIP_DEFLATED))
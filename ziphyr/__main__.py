@@ -0,0 +1,104 @@
+"""
+Ziphyr batch command line, one archive per input file.
+
+    $ python -m ziphyr --password-env ZIP_PASSWORD -c deflated \\
+          --output-dir /srv/exports --workers 8 /data/samples
+"""
+
+import argparse
+import os
+import sys
+import time
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+
+from ziphyr.auto import AUTO
+from ziphyr.batch import batch_jobs, run_batch, summary
+from ziphyr.zstd import ZIP_ZSTANDARD, zstandard
+
+
+COMPRESSIONS = {
+    'stored': ZIP_STORED,
+    'deflated': ZIP_DEFLATED,
+    'bzip2': ZIP_BZIP2,
+    'lzma': ZIP_LZMA,
+    'auto': AUTO,
+}
+if zstandard is not None:
+    COMPRESSIONS['zstd'] = ZIP_ZSTANDARD
+
+
+def _read_list(path):
+    """Paths listed one per line in a file, - for stdin."""
+    if path == '-':
+        return [line.rstrip('\n') for line in sys.stdin if line.strip()]
+    with open(path) as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def main(argv=None):
+    """Command line entry point, returns the exit status."""
+    parser = argparse.ArgumentParser(
+        prog='python -m ziphyr', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('inputs', nargs='*',
+                        help="files, or directories of files, to archive")
+    parser.add_argument('-l', '--file-list', metavar='PATH',
+                        help="file listing inputs one per line, - for stdin")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="walk the input directories down")
+    parser.add_argument('-o', '--output-dir',
+                        help="where to write the archives, next to the "
+                             "inputs by default")
+    password = parser.add_mutually_exclusive_group()
+    password.add_argument('-p', '--password',
+                          help="zipcrypto password, visible to ps")
+    password.add_argument('--password-env', metavar='VAR',
+                          help="environment variable holding the password")
+    parser.add_argument('-c', '--compression', choices=list(COMPRESSIONS),
+                        default='stored')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="worker processes, cpu count by default")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="no per-file line, only the summary")
+
+    args = parser.parse_args(argv)
+
+    inputs = list(args.inputs)
+    if args.file_list:
+        inputs += _read_list(args.file_list)
+    if not inputs:
+        parser.error("no input given")
+
+    secret = args.password
+    if args.password_env:
+        secret = os.environ.get(args.password_env)
+        if secret is None:
+            parser.error("%s is not set" % args.password_env)
+    secret = secret.encode() if secret else None
+
+    try:
+        jobs = batch_jobs(inputs, args.output_dir, args.recursive)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def progress(result):
+        if result.error is not None:
+            print("FAILED %s: %s" % (result.source, result.error),
+                  file=sys.stderr)
+        elif not args.quiet:
+            print("%.3fs %s -> %s" % (
+                result.seconds, result.source, result.target
+            ))
+
+    start = time.perf_counter()
+    results = list(run_batch(
+        jobs, secret, COMPRESSIONS[args.compression], args.workers, progress,
+    ))
+    print(summary(results, time.perf_counter() - start))
+
+    return 1 if any(r.error is not None for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
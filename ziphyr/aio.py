@@ -0,0 +1,113 @@
+"""asyncio-native archive streaming's module."""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from zipfile import ZIP_STORED
+
+from ziphyr.utils import owned_chunk
+from ziphyr.writer import EntryEncoder
+
+
+ASYNC_BUFFERING = 4  # chunks produced ahead of the consumer
+
+_DONE = object()
+
+
+class AsyncZiphyrIterator():
+
+    """
+    Async iterator over the chunks of an archive written from
+    (EntryInfo, async iterable source) entries.
+    Compression and zipcrypto run in the executor (the loop's default
+    if None), at most buffering chunks are produced ahead of the consumer.
+    The executor is thread-based, the encoder's state being shared.
+    Written as a plain async iterator for retro-compatibility with py35.
+    """
+
+    def __init__(
+        self, writer, entries, compression=ZIP_STORED,
+        executor=None, buffering=ASYNC_BUFFERING,
+    ):
+        """Nothing happens until the first chunk is awaited."""
+        self.writer = writer
+        self.entries = entries
+        self.compression = compression
+        self.executor = executor
+        self.buffering = buffering
+        self._queue = None
+        self._task = None
+        self._done = False
+        if isinstance(executor, ProcessPoolExecutor):
+            raise TypeError(
+                "The executor must be thread-based, not a process pool."
+            )
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._done:
+            raise StopAsyncIteration
+        if self._task is None:
+            self._queue = asyncio.Queue(self.buffering)
+            self._task = asyncio.ensure_future(self._produce())
+
+        item = await self._queue.get()
+        if item is _DONE:
+            self._done = True
+            raise StopAsyncIteration
+        if isinstance(item, Exception):
+            self._done = True
+            raise item
+        return item
+
+    async def aclose(self):
+        """Stops the production when the consumer gives up early."""
+        self._done = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def __del__(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def _produce(self):
+        try:
+            await self._write()
+        except Exception as e:
+            await self._queue.put(e)
+        else:
+            await self._queue.put(_DONE)
+
+    async def _write(self):
+        loop = asyncio.get_event_loop()
+        run = partial(loop.run_in_executor, self.executor)
+        writer = self.writer
+        put = self._queue.put
+
+        for info, source in self.entries:
+            encoder = EntryEncoder(info, self.compression, writer.engine())
+            # plain stored data only goes through crc32, kept in the loop
+            offload = encoder.compressor or encoder.engine
+            header_offset = writer.offset
+
+            await put(writer.emit(encoder.header()))
+
+            async for chunk in source:
+                if offload:
+                    data = await run(encoder.feed, chunk)
+                else:
+                    data = encoder.feed(chunk)
+                if data:
+                    # queued ahead, a recycled buffer is copied
+                    await put(writer.emit(owned_chunk(data)))
+
+            data = await run(encoder.flush) if offload else b''
+            await put(writer.emit(data + encoder.close()))
+            writer.records.append(
+                encoder.record._replace(header_offset=header_offset)
+            )
+
+        for chunk in writer.close():
+            await put(chunk)
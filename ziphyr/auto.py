@@ -0,0 +1,104 @@
+"""Automatic per-entry compression selection's module."""
+
+import math
+from collections import Counter, namedtuple
+from itertools import chain
+from zipfile import ZIP_DEFLATED, ZIP_STORED
+
+from ziphyr.utils import owned_chunk
+from ziphyr.zstd import get_compressor
+
+
+AUTO = 'auto'
+
+AUTO_SAMPLE_SIZE = 1 << 16
+AUTO_ENTROPY_THRESHOLD = 7.5  # bits per byte, packed or compressed above
+AUTO_RATIO_THRESHOLD = 0.9  # compressed over clear sample, worth it below
+
+AutoChoice = namedtuple('AutoChoice', [
+    'compression', 'entropy', 'ratio', 'sample_size',
+])
+
+
+def entropy(data):
+    """Shannon entropy of the bytes of data, in bits per byte."""
+    if not data:
+        return 0.0
+    size = len(data)
+    return -sum(
+        count / size * math.log2(count / size)
+        for count in Counter(data).values()
+    )
+
+
+def peek(source, size):
+    """
+    First size bytes (or less) of a chunk iterable, as a sample, and
+    the iterable going on from its very first chunk. The chunks held
+    meanwhile are copied when over recycled buffers.
+    """
+    chunks = iter(source)
+    head = []
+    gathered = 0
+    for chunk in chunks:
+        head.append(owned_chunk(chunk))
+        gathered += len(chunk)
+        if gathered >= size:
+            break
+    sample = b''.join(head)[:size]
+    return sample, chain(head, chunks)
+
+
+class AutoPolicy():
+
+    """
+    Compression chosen per entry after a sample of its first bytes:
+    stored when its byte entropy is too high to bother (packed,
+    compressed or encrypted data), else when a trial compression of
+    the sample does not reach the ratio threshold; compression if not.
+    """
+
+    def __init__(
+        self, compression=ZIP_DEFLATED, sample_size=AUTO_SAMPLE_SIZE,
+        entropy_threshold=AUTO_ENTROPY_THRESHOLD,
+        ratio_threshold=AUTO_RATIO_THRESHOLD,
+    ):
+        """
+        Optional compression committed to when worth it, deflate by
+        default, the sample size and both thresholds.
+        """
+        self.compression = compression
+        self.sample_size = sample_size
+        self.entropy_threshold = entropy_threshold
+        self.ratio_threshold = ratio_threshold
+
+    def choose(self, sample):
+        """AutoChoice for a sample of an entry."""
+        bits = entropy(sample)
+        if not sample or bits >= self.entropy_threshold:
+            return AutoChoice(ZIP_STORED, bits, None, len(sample))
+
+        compressor = get_compressor(self.compression)
+        trial = len(compressor.compress(sample)) + len(compressor.flush())
+        ratio = trial / len(sample)
+        compression = self.compression
+        if ratio > self.ratio_threshold:
+            compression = ZIP_STORED
+        return AutoChoice(compression, bits, ratio, len(sample))
+
+    def resolve(self, source):
+        """
+        AutoChoice for a chunk source, and the source going on from its
+        first chunk, the sampled ones included.
+        """
+        sample, source = peek(source, self.sample_size)
+        return self.choose(sample), source
+
+
+def auto_policy(compression):
+    """The AutoPolicy a compression argument stands for, None if none."""
+    if isinstance(compression, AutoPolicy):
+        return compression
+    if compression == AUTO:
+        return AutoPolicy()
+    return None
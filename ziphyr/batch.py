@@ -0,0 +1,169 @@
+"""Batch archiving's module, one archive per file."""
+
+import os
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from zipfile import ZIP_STORED
+
+from ziphyr.ziphyr import Ziphyr
+
+
+BatchJob = namedtuple('BatchJob', ['source', 'target'])
+
+BatchResult = namedtuple('BatchResult', [
+    'source', 'target', 'size', 'compress_size', 'seconds', 'error',
+])
+
+
+def batch_jobs(inputs, output_dir=None, recursive=False):
+    """
+    One BatchJob per file among the inputs, files or directories (their
+    files, walked down when recursive), each archived as <name>.zip next
+    to it, or under output_dir keeping the layout of the directories.
+    """
+    jobs = []
+    for path in inputs:
+        if not os.path.isdir(path):
+            target_dir = output_dir or os.path.dirname(path)
+            target = os.path.join(target_dir, os.path.basename(path))
+            jobs.append(BatchJob(path, target + '.zip'))
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            if not recursive:
+                dirs[:] = []
+            target_dir = root
+            if output_dir:
+                target_dir = os.path.join(
+                    output_dir, os.path.relpath(root, os.path.dirname(
+                        os.path.normpath(path)
+                    ))
+                )
+            for name in sorted(files):
+                jobs.append(BatchJob(
+                    os.path.join(root, name),
+                    os.path.join(target_dir, name + '.zip'),
+                ))
+
+    targets = set()
+    for job in jobs:
+        if job.target in targets:
+            raise ValueError("Two inputs would write %s." % job.target)
+        targets.add(job.target)
+
+    return jobs
+
+
+def archive_file(source, target, password=None, compression=ZIP_STORED):
+    """
+    Worker side: archives the file on source into target, through a
+    temporary file renamed over target once complete and synced, so
+    that target is either absent, previous or whole.
+    Returns a BatchResult, failures included.
+    """
+    start = time.perf_counter()
+    directory = os.path.dirname(target) or '.'
+    tmp = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        z = Ziphyr(password)
+        z.from_filepath(source, arcname=os.path.basename(source))
+
+        fd, tmp = tempfile.mkstemp(
+            '.tmp', '.%s.' % os.path.basename(target), directory
+        )
+        with open(fd, 'wb') as f:
+            for chunk in z.generator(compression=compression):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+
+        return BatchResult(
+            source, target, z.zinfo.file_size, os.path.getsize(target),
+            time.perf_counter() - start, None,
+        )
+    except Exception as e:
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+        return BatchResult(
+            source, target, 0, 0, time.perf_counter() - start,
+            '%s: %s' % (type(e).__name__, e),
+        )
+
+
+def run_batch(
+    jobs, password=None, compression=ZIP_STORED, workers=None,
+    progress=None,
+):
+    """
+    Generator of the BatchResult of the jobs, as they complete in a
+    pool of worker processes (cpu count by default), in process with
+    a single worker. Each result is also passed to progress, if any.
+    """
+    if workers == 1:
+        completed = (
+            archive_file(job.source, job.target, password, compression)
+            for job in jobs
+        )
+        for result in completed:
+            if progress:
+                progress(result)
+            yield result
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(
+                archive_file, job.source, job.target, password, compression
+            )
+            for job in jobs
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            if progress:
+                progress(result)
+            yield result
+
+
+def _percentile(values, ratio):
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def summary(results, seconds, slowest=5):
+    """Human-readable report of the results of a batch run in seconds."""
+    done = [r for r in results if r.error is None]
+    failed = [r for r in results if r.error is not None]
+    size = sum(r.size for r in done)
+    compress_size = sum(r.compress_size for r in done)
+
+    lines = [
+        "%d archived, %d failed in %.2fs" % (len(done), len(failed), seconds),
+        "%.1f MB in, %.1f MB out, %.1f MB/s, %.1f files/s" % (
+            size / 1e6, compress_size / 1e6,
+            size / seconds / 1e6 if seconds else 0.0,
+            len(results) / seconds if seconds else 0.0,
+        ),
+    ]
+
+    if done:
+        timings = sorted(r.seconds for r in done)
+        lines.append(
+            "per file: min %.3fs, median %.3fs, p95 %.3fs, max %.3fs" % (
+                timings[0], _percentile(timings, 0.5),
+                _percentile(timings, 0.95), timings[-1],
+            )
+        )
+        lines.append("slowest:")
+        for r in sorted(done, key=lambda r: -r.seconds)[:slowest]:
+            lines.append("  %.3fs %s" % (r.seconds, r.source))
+
+    if failed:
+        lines.append("failures:")
+        for r in failed:
+            lines.append("  %s: %s" % (r.source, r.error))
+
+    return '\n'.join(lines)
@@ -0,0 +1,162 @@
+"""Per-archive memory budget's module."""
+
+import bz2
+import lzma
+import struct
+import zlib
+from collections import namedtuple
+from zipfile import (
+    LZMACompressor, ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED,
+)
+
+from ziphyr.writer import compressed_chunks
+from ziphyr.zstd import ZIP_ZSTANDARD, ZSTD_LEVEL, zstandard
+
+
+BUDGET_CHUNK_MIN = 1 << 12
+BUDGET_CHUNK_MAX = 1 << 20
+# chunk-sized buffers alive at once at worst: the split source chunk,
+# its compressed output, the zipcrypto copies, the coalesce buffer and
+# the chunk held by the consumer
+BUDGET_COPIES = 8
+
+# compressor state, in bytes, measured under tracemalloc
+_LZMA_PRESETS = (  # (preset, state), largest first
+    (6, 96 << 20), (3, 34 << 20), (2, 19 << 20), (1, 11 << 20),
+    (0, 5 << 20),
+)
+_DEFLATE_SETTINGS = (  # (window bits, memLevel), largest first
+    (15, 8), (14, 7), (13, 6), (12, 5), (11, 4), (10, 3),
+)
+
+MemoryPlan = namedtuple('MemoryPlan', ['compressor', 'state', 'chunksize'])
+
+
+def split_chunks(source, size):
+    """Source chunks of size bytes at most, larger ones sliced as views."""
+    for chunk in source:
+        if len(chunk) <= size:
+            yield chunk
+            continue
+        view = memoryview(chunk)
+        for i in range(0, len(view), size):
+            yield view[i:i + size]
+
+
+class _FittedLZMACompressor(LZMACompressor):
+
+    """zipfile's LZMA compressor, on a given preset."""
+
+    def __init__(self, preset):
+        super().__init__()
+        self.preset = preset
+
+    def _init(self):
+        props = lzma._encode_filter_properties(
+            {'id': lzma.FILTER_LZMA1, 'preset': self.preset}
+        )
+        self._comp = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[
+            lzma._decode_filter_properties(lzma.FILTER_LZMA1, props)
+        ])
+        return struct.pack('<BBH', 9, 4, len(props)) + props
+
+
+def _deflate_state(wbits, mem_level):
+    """zlib's own estimate of a deflate stream state, plus its structs."""
+    return (1 << (wbits + 2)) + (1 << (mem_level + 9)) + (1 << 13)
+
+
+class MemoryBudget():
+
+    """
+    Compression stage keeping one archive within a memory budget, in
+    bytes: the compressor settings are the largest ones fitting half of
+    it, the rest bounding the size of the source chunks, larger ones
+    being split, and of the output chunks, flushed early.
+    Plugs into ZiphyrWriter.entry() as stage, or is given to
+    Ziphyr.generator() as memory.
+    """
+
+    def __init__(self, budget):
+        """Budget of the archive's pipeline, in bytes."""
+        self.budget = budget
+
+    def _compressor(self, compression):
+        """(compressor factory, state) pair fitting half the budget."""
+        room = self.budget // 2
+
+        if compression == ZIP_STORED:
+            return (lambda: None), 0
+
+        if compression == ZIP_DEFLATED:
+            for wbits, mem_level in _DEFLATE_SETTINGS:
+                state = _deflate_state(wbits, mem_level)
+                if state <= room:
+                    return (lambda: zlib.compressobj(
+                        zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -wbits,
+                        mem_level,
+                    )), state
+
+        elif compression == ZIP_BZIP2:
+            for level in range(9, 0, -1):
+                # 100k-blocks, and their sorting arrays
+                state = (3 << 19) + level * 800000
+                if state <= room:
+                    return (lambda: bz2.BZ2Compressor(level)), state
+
+        elif compression == ZIP_LZMA:
+            for preset, state in _LZMA_PRESETS:
+                if state <= room:
+                    return (lambda: _FittedLZMACompressor(preset)), state
+
+        elif compression == ZIP_ZSTANDARD:
+            if zstandard is None:
+                raise RuntimeError(
+                    "Zstandard compression requires the zstandard package."
+                )
+            for window_log in range(23, 9, -1):
+                params = zstandard.ZstdCompressionParameters.from_level(
+                    ZSTD_LEVEL, window_log=window_log
+                )
+                state = params.estimated_compression_context_size()
+                if state <= room:
+                    return (lambda: zstandard.ZstdCompressor(
+                        compression_params=params
+                    ).compressobj()), state
+
+        else:
+            raise NotImplementedError(
+                "Compression type %d not supported." % compression
+            )
+
+        raise ValueError(
+            "Memory budget of %d bytes too small for compression type %d."
+            % (self.budget, compression)
+        )
+
+    def plan(self, compression):
+        """
+        MemoryPlan of an entry: its compressor factory and state, and
+        the chunk size bounding the source and output chunks.
+        """
+        compressor, state = self._compressor(compression)
+        chunksize = min(
+            (self.budget - state) // BUDGET_COPIES, BUDGET_CHUNK_MAX
+        )
+        if chunksize < BUDGET_CHUNK_MIN:
+            raise ValueError(
+                "Memory budget of %d bytes too small." % self.budget
+            )
+        return MemoryPlan(compressor, state, chunksize)
+
+    def __call__(self, source, compression=ZIP_STORED):
+        """
+        Yields the compressed chunks of the source, split and flushed
+        within the budget, then returns the (crc, file_size) of its
+        clear data.
+        """
+        plan = self.plan(compression)
+        return (yield from compressed_chunks(
+            split_chunks(source, plan.chunksize), compression,
+            plan.compressor,
+        ))
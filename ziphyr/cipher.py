@@ -0,0 +1,170 @@
+"""ZipCrypto cipher engine's module."""
+
+from ziphyr.lru import CacheInfo, LRUCache  # noqa
+
+
+def _gen_crc(crc):
+
+    """
+    cpython zipfile/_gen_crc from python3.7.
+    copy-pasted for retro-compatibility.
+    """
+    for j in range(8):
+        if crc & 1:
+            crc = (crc >> 1) ^ 0xEDB88320
+        else:
+            crc >>= 1
+    return crc
+
+
+def _gen_keystream(k):
+    """
+    zipcrypto keystream byte for the lower 16 bits of the Key(2).
+    The upper bits of Key(2) never reach the produced byte.
+    """
+    k |= 2
+    return ((k * (k ^ 1)) >> 8) & 0xFF
+
+
+# built once per module, shared by every engine and stream
+CRCTABLE = list(map(_gen_crc, range(256)))
+KEYSTREAM = bytes(map(_gen_keystream, range(0x10000)))
+
+PKZIP_KEYS = (
+    305419896,  # PKZIP Key(0)
+    591751049,  # PKZIP Key(1)
+    878082192,  # PKZIP Key(2)
+)
+
+
+class ZipCryptoEngine():
+
+    """
+    A zipcrypto cipher state working on whole buffers.
+    Key state lives in locals while a buffer is processed,
+    and buffers are ciphered in place when writable.
+    """
+
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, password: bytes = b''):
+        """
+        Optional bytes-type password parameter.
+        Initialize the keys then cycles them over the password.
+        """
+        self.x, self.y, self.z = PKZIP_KEYS
+        self.feed(password)
+
+    @classmethod
+    def from_keys(cls, keys):
+        """Build an engine directly from a (x, y, z) key state."""
+        engine = cls.__new__(cls)
+        engine.x, engine.y, engine.z = keys
+        return engine
+
+    @property
+    def keys(self):
+        """Current (x, y, z) key state."""
+        return (self.x, self.y, self.z)
+
+    def copy(self):
+        """Independent engine sharing the current key state."""
+        return self.from_keys(self.keys)
+
+    def update_keys(self, c):
+        """
+        zipcrypto keys cycling on one byte.
+        Adapted from cpython zipfile _ZipDecrypter.
+        """
+        self.feed((c,))
+
+    def feed(self, data):
+        """Cycles the keys over clear data without ciphering it."""
+        table = CRCTABLE
+        x, y, z = self.x, self.y, self.z
+        for c in data:
+            x = (x >> 8) ^ table[(x ^ c) & 0xFF]
+            y = ((y + (x & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+            z = (z >> 8) ^ table[(z ^ (y >> 24)) & 0xFF]
+        self.x, self.y, self.z = x, y, z
+
+    def encrypt_into(self, buf):
+        """
+        Cyphering a writable buffer (bytearray, memoryview) in place.
+        Returns the very same buffer.
+        """
+        table = CRCTABLE
+        keystream = KEYSTREAM
+        x, y, z = self.x, self.y, self.z
+        for i, c in enumerate(buf):
+            buf[i] = c ^ keystream[z & 0xFFFF]
+            x = (x >> 8) ^ table[(x ^ c) & 0xFF]
+            y = ((y + (x & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+            z = (z >> 8) ^ table[(z ^ (y >> 24)) & 0xFF]
+        self.x, self.y, self.z = x, y, z
+        return buf
+
+    def encrypt(self, data):
+        """Cyphering any bytes-like object into a new bytes object."""
+        return bytes(self.encrypt_into(bytearray(data)))
+
+    def decrypt_into(self, buf):
+        """
+        Deciphering a writable buffer (bytearray, memoryview) in place,
+        the keys cycling over the recovered clear bytes.
+        Returns the very same buffer.
+        """
+        table = CRCTABLE
+        keystream = KEYSTREAM
+        x, y, z = self.x, self.y, self.z
+        for i, c in enumerate(buf):
+            c ^= keystream[z & 0xFFFF]
+            buf[i] = c
+            x = (x >> 8) ^ table[(x ^ c) & 0xFF]
+            y = ((y + (x & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+            z = (z >> 8) ^ table[(z ^ (y >> 24)) & 0xFF]
+        self.x, self.y, self.z = x, y, z
+        return buf
+
+    def decrypt(self, data):
+        """Deciphering any bytes-like object into a new bytes object."""
+        return bytes(self.decrypt_into(bytearray(data)))
+
+
+class CipherContextFactory():
+
+    """
+    Bounded LRU of the initial key states derived from passwords.
+    Each request gets its own engine, cloned from the cached state.
+    """
+
+    def __init__(self, maxsize=32):
+        """
+        Optional maxsize parameter, the number of passwords kept.
+        A zero maxsize disables the caching.
+        """
+        self.maxsize = maxsize
+        self._keys = LRUCache(maxsize)
+
+    def engine(self, password: bytes):
+        """Fresh cipher engine initialized for the password."""
+        password = bytes(password)
+        keys = self._keys.get(password)
+        if keys is not None:
+            return ZipCryptoEngine.from_keys(keys)
+
+        engine = ZipCryptoEngine(password)
+        self._keys.put(password, engine.keys)
+        return engine
+
+    def cache_info(self):
+        """Hits, misses, maxsize and currsize, as functools does."""
+        return self._keys.cache_info()
+
+    def cache_clear(self):
+        """Forget every cached key state and reset the counters."""
+        self._keys.cache_clear()
+
+
+# shared by default between every Ziphyr and ZiphyrStream
+default_factory = CipherContextFactory()
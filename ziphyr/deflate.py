@@ -0,0 +1,149 @@
+"""Multi-threaded deflate's module, pigz-style."""
+
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from zipfile import ZIP_DEFLATED
+
+
+DEFLATE_BLOCKSIZE = 1 << 17  # as pigz, 128 KiB
+DEFLATE_WINDOW = 1 << 15  # previous block bytes priming the next one
+
+
+def _gf2_times(mat, vec):
+    """GF(2) matrix times vector, as zlib's gf2_matrix_times."""
+    total = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            total ^= mat[i]
+        vec >>= 1
+        i += 1
+    return total
+
+
+def _gf2_multiply(a, b):
+    return tuple(_gf2_times(a, column) for column in b)
+
+
+@lru_cache(maxsize=16)
+def _zeros_operator(length):
+    """GF(2) operator feeding length zero bytes to a crc32 register."""
+    row = (0xEDB88320,) + tuple(1 << n for n in range(31))  # one zero bit
+    for _ in range(3):
+        row = _gf2_multiply(row, row)  # up to one zero byte
+
+    op = tuple(1 << n for n in range(32))
+    while length:
+        if length & 1:
+            op = _gf2_multiply(row, op)
+        length >>= 1
+        if length:
+            row = _gf2_multiply(row, row)
+    return op
+
+
+def crc32_combine(crc1, crc2, len2):
+    """
+    crc32 of the concatenation of two data from their own crc32,
+    len2 being the length of the second one. Adapted from zlib.
+    """
+    if len2 <= 0:
+        return crc1
+    return _gf2_times(_zeros_operator(len2), crc1) ^ crc2
+
+
+def _blocks(source, blocksize):
+    """Regroups the source chunks into blocks of blocksize bytes."""
+    buffer = bytearray()
+    for chunk in source:
+        buffer += chunk
+        while len(buffer) >= blocksize:
+            yield bytes(buffer[:blocksize])
+            del buffer[:blocksize]
+    if buffer:
+        yield bytes(buffer)
+
+
+def deflate_block(block, dictionary, last, level):
+    """
+    Worker side: raw deflate of one block, primed with the previous
+    block's window, sync-flushed to a byte boundary unless last.
+    Returns the deflated block, its crc32 and length.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -15, zdict=dictionary
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = compressor.compress(block)
+    data += compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return data, zlib.crc32(block), len(block)
+
+
+class ParallelDeflate():
+
+    """
+    Compression stage deflating blocks in a thread pool, zlib releasing
+    the GIL, chained into one deflate stream emitted in order.
+    Plugs into ZiphyrWriter.entry() as stage, for ZIP_DEFLATED only.
+    """
+
+    def __init__(
+        self, workers=None, blocksize=DEFLATE_BLOCKSIZE,
+        level=zlib.Z_DEFAULT_COMPRESSION,
+    ):
+        """
+        Optional workers (cpu count by default), blocksize and
+        deflate level parameters.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.blocksize = blocksize
+        self.level = level
+
+    def __call__(self, source, compression=ZIP_DEFLATED):
+        """
+        Yields the deflated chunks of the source,
+        then returns the (crc, file_size) of its clear data.
+        """
+        if compression != ZIP_DEFLATED:
+            raise ValueError("Parallel deflate requires ZIP_DEFLATED.")
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            # at most a couple of blocks per worker in flight
+            depth = 2 * self.workers
+            pending = deque()
+            clear_crc = 0
+            file_size = 0
+            dictionary = b''
+            previous = None
+
+            for block in _blocks(source, self.blocksize):
+                if previous is not None:
+                    pending.append(executor.submit(
+                        deflate_block, previous, dictionary, False,
+                        self.level,
+                    ))
+                    dictionary = previous[-DEFLATE_WINDOW:]
+                previous = block
+
+                while len(pending) >= depth:
+                    data, crc, length = pending.popleft().result()
+                    clear_crc = crc32_combine(clear_crc, crc, length)
+                    file_size += length
+                    yield data
+
+            pending.append(executor.submit(
+                deflate_block, previous or b'', dictionary, True, self.level,
+            ))
+
+            while pending:
+                data, crc, length = pending.popleft().result()
+                clear_crc = crc32_combine(clear_crc, crc, length)
+                file_size += length
+                yield data
+
+        return clear_crc, file_size
@@ -0,0 +1,224 @@
+"""Compress once, zipcrypt for many passwords' module."""
+
+import threading
+from collections import deque
+from zipfile import ZIP_STORED
+
+from ziphyr.stream import OUTPUT_CHUNKSIZE, coalesce
+from ziphyr.utils import owned_chunk
+from ziphyr.writer import (
+    EntryEncoder, ZiphyrWriter, compressed_chunks, entry_info, entry_source,
+)
+
+
+# compressed chunks queued per stream ahead of the slowest one
+FANOUT_BUFFER = 16
+
+_ENTRY, _DATA, _END = range(3)
+_STOP = object()
+
+
+def compressed_events(entries, compression=ZIP_STORED, stage=None):
+    """
+    Generator of the (kind, value) events of the entries compressed
+    once: the EntryInfo of an entry, its compressed chunks, then its
+    clear (crc, file_size). Chunks over recycled buffers are copied
+    once, being queued for every recipient.
+    """
+    for metadata, source in entries:
+        yield _ENTRY, entry_info(metadata)
+        chunks = (stage or compressed_chunks)(
+            entry_source(source), compression
+        )
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as stop:
+                yield _END, stop.value
+                break
+            yield _DATA, owned_chunk(chunk)
+
+
+class Recipient():
+
+    """
+    Push-style writer of one recipient's archive out of the shared
+    compressed events, zipcrypted with its own password and engines.
+    """
+
+    def __init__(self, password, compression=ZIP_STORED, factory=None):
+        """Optional bytes-type password, None for a plain archive."""
+        self.writer = ZiphyrWriter(password, factory)
+        self.compression = compression
+        self.encoder = None
+        self.header_offset = 0
+
+    def push(self, kind, value):
+        """Archive bytes of one compressed event."""
+        writer = self.writer
+        if kind == _ENTRY:
+            self.encoder = EntryEncoder(
+                value, self.compression, writer.engine()
+            )
+            self.header_offset = writer.offset
+            return writer.emit(self.encoder.header())
+        if kind == _DATA:
+            return writer.emit(self.encoder.seal(value))
+
+        data = writer.emit(self.encoder.close(*value))
+        writer.records.append(
+            self.encoder.record._replace(header_offset=self.header_offset)
+        )
+        return data
+
+    def close(self):
+        """Generator of the central directory and end records."""
+        return self.writer.close()
+
+
+class ArchiveFanout():
+
+    """
+    One set of entries compressed and crc-checked once, then zipcrypted
+    for as many passwords: a cipher pass per recipient only.
+    Either written to as many files in a single pass, or streamed
+    through as many iterables, consumed concurrently (a thread or a
+    response each): a stream ahead of the slowest open one by maxsize
+    compressed chunks waits for it, a closed one no longer counts.
+    A stream not started yet is not waited for, its events queued
+    meanwhile without bound.
+    """
+
+    def __init__(
+        self, passwords, entries, compression=ZIP_STORED, stage=None,
+        factory=None, chunksize=OUTPUT_CHUNKSIZE, maxsize=FANOUT_BUFFER,
+    ):
+        """
+        Passwords, bytes or None, one per recipient, and entries as for
+        Ziphyr.multi_generator(), compressed through the optional stage.
+        Optional output chunksize, as for coalesce(), and maxsize, None
+        not bounding the streams, to be consumed one after the other.
+        """
+        self.passwords = list(passwords)
+        self.compression = compression
+        self.factory = factory
+        self.chunksize = chunksize
+        self.maxsize = maxsize
+        self._events = compressed_events(entries, compression, stage)
+        self._queues = [deque() for _ in self.passwords]
+        self._open = [True] * len(self.passwords)
+        # only the started streams are waited for
+        self._running = [False] * len(self.passwords)
+        self._cond = threading.Condition()
+        self._producing = False
+        self._done = False
+        self._error = None
+        self._started = False
+
+    def _recipients(self):
+        if self._started:
+            raise RuntimeError("An ArchiveFanout is generated only once.")
+        self._started = True
+        return [
+            Recipient(password, self.compression, self.factory)
+            for password in self.passwords
+        ]
+
+    def write(self, targets):
+        """
+        Writes every archive into its target, binary file objects or
+        paths, in a single pass. Returns the byte count of each.
+        """
+        recipients = self._recipients()
+        files = []
+        for target in targets:
+            if isinstance(target, (str, bytes)):
+                target = open(target, 'wb')
+            files.append(target)
+        try:
+            for kind, value in self._events:
+                for recipient, f in zip(recipients, files):
+                    f.write(recipient.push(kind, value))
+            for recipient, f in zip(recipients, files):
+                for chunk in recipient.close():
+                    f.write(chunk)
+        finally:
+            for target, f in zip(targets, files):
+                if f is not target:
+                    f.close()
+        return [recipient.writer.offset for recipient in recipients]
+
+    def streams(self):
+        """
+        One iterable of archive chunks per password, in order, sharing
+        the compression with the others.
+        """
+        recipients = self._recipients()
+        return [
+            coalesce(self._stream(i, recipient), self.chunksize)
+            for i, recipient in enumerate(recipients)
+        ]
+
+    def _full(self):
+        """Whether a started open stream has maxsize events queued."""
+        return self.maxsize is not None and any(
+            running and is_open and len(queue) >= self.maxsize
+            for running, is_open, queue in zip(
+                self._running, self._open, self._queues
+            )
+        )
+
+    def _next_event(self, i):
+        """Next event of stream i, produced for all if none is queued."""
+        queue = self._queues[i]
+        with self._cond:
+            while not queue and not self._done and (
+                self._producing or self._full()
+            ):
+                self._cond.wait()
+            if queue:
+                event = queue.popleft()
+                self._cond.notify_all()
+                return event
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return _STOP
+            self._producing = True
+
+        # compressing out of the lock, the others drain meanwhile
+        error = None
+        try:
+            event = next(self._events, _STOP)
+        except BaseException as e:
+            event, error = _STOP, e
+
+        with self._cond:
+            self._producing = False
+            if event is _STOP:
+                self._done = True
+                self._error = error
+            else:
+                for is_open, other in zip(self._open, self._queues):
+                    if is_open:
+                        other.append(event)
+            self._cond.notify_all()
+        return self._next_event(i)
+
+    def _stream(self, i, recipient):
+        with self._cond:
+            self._running[i] = True
+        try:
+            while True:
+                event = self._next_event(i)
+                if event is _STOP:
+                    break
+                data = recipient.push(*event)
+                if data:
+                    yield data
+            yield from recipient.close()
+        finally:
+            with self._cond:
+                self._open[i] = False
+                self._queues[i].clear()
+                self._cond.notify_all()
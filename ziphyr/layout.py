@@ -0,0 +1,218 @@
+"""Zero-copy archive layout's module."""
+
+import os
+from collections import namedtuple
+from zipfile import ZIP_STORED, crc32
+
+from ziphyr.lru import LRUCache
+from ziphyr.stream import OUTPUT_CHUNKSIZE
+from ziphyr.utils import readinto_iterable
+from ziphyr.writer import EntryEncoder, central_directory, entry_info
+
+
+# file bytes sent by each os.sendfile() call
+SENDFILE_CHUNKSIZE = 1 << 30
+
+FileRegion = namedtuple('FileRegion', ['path', 'offset', 'length'])
+
+
+class CRCCache():
+
+    """
+    Bounded LRU of the crc32 of files, keyed by their path, device,
+    inode, size and modification time: a file changing gets a new crc.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        Optional maxsize parameter, the number of files kept.
+        A zero maxsize disables the caching.
+        """
+        self.maxsize = maxsize
+        self._crcs = LRUCache(maxsize)
+
+    @staticmethod
+    def key(path, st=None):
+        """Cache key of the file on path, from its stat if known."""
+        st = st or os.stat(path)
+        return (
+            os.path.abspath(path), st.st_dev, st.st_ino, st.st_size,
+            st.st_mtime_ns,
+        )
+
+    def crc(self, path, st=None):
+        """crc32 of the file on path, read once then cached."""
+        crc = self._crcs.get(self.key(path, st))
+        if crc is not None:
+            return crc
+
+        crc = 0
+        for chunk in readinto_iterable(path):
+            crc = crc32(chunk, crc)
+
+        self.put(path, crc, st)
+        return crc
+
+    def put(self, path, crc, st=None):
+        """Records a crc32 precomputed elsewhere for the file on path."""
+        self._crcs.put(self.key(path, st), crc)
+
+    def cache_info(self):
+        """Hits, misses, maxsize and currsize, as functools does."""
+        return self._crcs.cache_info()
+
+    def cache_clear(self):
+        """Forget every cached crc and reset the counters."""
+        self._crcs.cache_clear()
+
+
+# shared by default between every archive layout
+default_crc_cache = CRCCache()
+
+
+class ArchiveLayout():
+
+    """
+    ZIP_STORED unencrypted archive described as header blobs (bytes)
+    and FileRegion of the entries' files, their bytes sent as is:
+    kernel-side through sendfile(), or read by chunks().
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    def __iter__(self):
+        return iter(self.parts)
+
+    @property
+    def size(self):
+        """Total byte count of the archive."""
+        return sum(
+            part.length if isinstance(part, FileRegion) else len(part)
+            for part in self.parts
+        )
+
+    def chunks(self, chunksize=OUTPUT_CHUNKSIZE):
+        """Generator of the archive bytes, the regions read in Python."""
+        for part in self.parts:
+            if not isinstance(part, FileRegion):
+                yield part
+                continue
+            with open(part.path, 'rb') as fileobj:
+                fileobj.seek(part.offset)
+                remaining = part.length
+                while remaining:
+                    chunk = fileobj.read(min(chunksize, remaining))
+                    if not chunk:
+                        raise ValueError(
+                            "File shorter than its region: %s" % part.path
+                        )
+                    remaining -= len(chunk)
+                    yield chunk
+
+    def sendfile(self, out):
+        """
+        Writes the archive to out, a blocking socket (socket.sendfile)
+        or file descriptor (os.sendfile), the regions never going
+        through Python where the platform allows. Returns the bytes sent.
+        """
+        if hasattr(out, 'sendfile'):
+            return self._send_socket(out)
+        fd = out if isinstance(out, int) else out.fileno()
+        if not hasattr(os, 'sendfile'):
+            for chunk in self.chunks():
+                _write_all(fd, chunk)
+            return self.size
+        return self._send_fd(fd)
+
+    def _send_socket(self, sock):
+        sent = 0
+        for part in self.parts:
+            if isinstance(part, FileRegion):
+                with open(part.path, 'rb') as fileobj:
+                    count = sock.sendfile(fileobj, part.offset, part.length)
+                if count != part.length:
+                    raise ValueError(
+                        "File shorter than its region: %s" % part.path
+                    )
+                sent += count
+            else:
+                sock.sendall(part)
+                sent += len(part)
+        return sent
+
+    def _send_fd(self, fd):
+        sent = 0
+        for part in self.parts:
+            if not isinstance(part, FileRegion):
+                _write_all(fd, part)
+                sent += len(part)
+                continue
+            with open(part.path, 'rb') as fileobj:
+                offset, remaining = part.offset, part.length
+                while remaining:
+                    count = os.sendfile(
+                        fd, fileobj.fileno(), offset,
+                        min(remaining, SENDFILE_CHUNKSIZE),
+                    )
+                    if not count:
+                        raise ValueError(
+                            "File shorter than its region: %s" % part.path
+                        )
+                    offset += count
+                    remaining -= count
+            sent += part.length
+        return sent
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def archive_layout(entries, crc_cache=None):
+    """
+    Layout of the ZIP_STORED unencrypted archive of the entries, each a
+    filepath or a (metadata, filepath[, crc]) sequence, the metadata as
+    for multi_generator(). Without crc, it comes from the crc cache,
+    the shared one by default, the file being read on a miss only.
+    Same bytes as multi_generator() for the same entries.
+    """
+    crc_cache = crc_cache or default_crc_cache
+    parts = []
+    records = []
+    blob = b''
+    offset = 0
+
+    for entry in entries:
+        if isinstance(entry, str):
+            metadata, path, crc = entry, entry, None
+        else:
+            metadata, path, crc = (tuple(entry) + (None,))[:3]
+        info = entry_info(metadata)
+
+        st = os.stat(path)
+        if st.st_size != info.file_size:
+            raise ValueError(
+                "Announced file size %d differs from the file's %d: %s"
+                % (info.file_size, st.st_size, path)
+            )
+        if crc is None:
+            crc = crc_cache.crc(path, st)
+
+        encoder = EntryEncoder(info, ZIP_STORED)
+        header = encoder.header()
+        # stored data, accounted for without being read
+        encoder.compress_size += info.file_size
+        descriptor = encoder.close(crc, info.file_size)
+        records.append(encoder.record._replace(header_offset=offset))
+
+        parts.append(blob + header)
+        if info.file_size:
+            parts.append(FileRegion(path, 0, info.file_size))
+        blob = descriptor
+        offset += len(header) + info.file_size + len(descriptor)
+
+    parts.append(blob + central_directory(records, offset))
+    return ArchiveLayout(parts)
@@ -0,0 +1,114 @@
+"""Bounded LRU caches' module, shared by the ziphyr caches."""
+
+from collections import OrderedDict, namedtuple
+from threading import Lock
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LRUCache():
+
+    """
+    Thread-safe LRU mapping of at most maxsize units, one per item or
+    the size given with it, counting hits and misses as functools does.
+    """
+
+    def __init__(self, maxsize):
+        """
+        Maxsize, in items or in the sizes given to put().
+        A zero maxsize disables the caching.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key: (value, size), oldest first
+        self._currsize = 0
+        self._lock = Lock()
+
+    def get(self, key):
+        """Value cached under key, now the most recent, or None."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return item[0]
+
+    def count(self, hit):
+        """Counts a lookup done elsewhere, as a hit or a miss."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, value, size=1):
+        """
+        Caches value under key as the most recent, size units large.
+        Returns the (key, value) pairs evicted beyond maxsize.
+        """
+        with self._lock:
+            self._pop(key)
+            self._items[key] = (value, size)
+            self._currsize += size
+            return self._evict()
+
+    def pop(self, key):
+        """Value removed from under key, or None."""
+        with self._lock:
+            return self._pop(key)
+
+    def reload(self, items):
+        """
+        Replaces every cached item by (key, value, size) ones, oldest
+        first. Returns the (key, value) pairs evicted beyond maxsize.
+        """
+        with self._lock:
+            self._items = OrderedDict(
+                (key, (value, size)) for key, value, size in items
+            )
+            self._currsize = sum(size for _, size in self._items.values())
+            return self._evict()
+
+    def keys(self):
+        """Cached keys, oldest first."""
+        with self._lock:
+            return list(self._items)
+
+    def _pop(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            return None
+        self._currsize -= item[1]
+        return item[0]
+
+    def _evict(self):
+        evicted = []
+        while self._items and self._currsize > self.maxsize:
+            key, (value, size) = self._items.popitem(last=False)
+            self._currsize -= size
+            evicted.append((key, value))
+        return evicted
+
+    def cache_info(self):
+        """Hits, misses, maxsize and currsize, as functools does."""
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.maxsize, self._currsize
+            )
+
+    def cache_clear(self):
+        """
+        Forgets every cached item and resets the counters.
+        Returns the (key, value) pairs forgotten.
+        """
+        with self._lock:
+            cleared = [(key, value) for key, (value, _) in self._items.items()]
+            self._items.clear()
+            self._currsize = 0
+            self.hits = 0
+            self.misses = 0
+            return cleared
@@ -0,0 +1,262 @@
+"""Archive generation instrumentation's module."""
+
+import time
+from collections import namedtuple
+from threading import Lock
+from zipfile import crc32
+
+from ziphyr.writer import compressed_chunks
+from ziphyr.zstd import get_compressor
+
+
+# pipeline stages, as reported to the instruments
+STAGES = ('source', 'crc32', 'compress', 'cypher', 'yield')
+
+ArchiveStats = namedtuple('ArchiveStats', [
+    'bytes_in', 'bytes_out', 'ratio', 'first_byte', 'duration',
+])
+
+_clock = time.perf_counter
+
+
+class Instrument():
+
+    """
+    Instrumentation hook of the archive generators, ignoring everything.
+    Override stage() to get the (seconds, bytes) of every stage call,
+    and archive() to get the ArchiveStats of every finished archive.
+    Called from the generating thread, possibly many at once.
+    """
+
+    def stage(self, name, seconds, nbytes):
+        """One call of a pipeline stage, among STAGES."""
+
+    def archive(self, stats):
+        """Totals of an archive, once its last chunk is consumed."""
+
+
+class ArchiveProbe():
+
+    """
+    Per-archive timing of the generator pipeline, reporting to an
+    instrument. Stages get wrapped only when a probe is installed.
+    """
+
+    def __init__(self, instrument):
+        self.instrument = instrument
+        self.bytes_in = 0
+
+    def timed(self, name, func):
+        """func(data, ...) reported as a call of the named stage."""
+        stage = self.instrument.stage
+
+        def timed_func(data, *args):
+            start = _clock()
+            result = func(data, *args)
+            stage(name, _clock() - start, len(data))
+            return result
+
+        return timed_func
+
+    def source(self, source):
+        """Source chunks, the time spent producing each being reported."""
+        stage = self.instrument.stage
+        chunks = iter(source)
+        while True:
+            start = _clock()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            stage('source', _clock() - start, len(chunk))
+            self.bytes_in += len(chunk)
+            yield chunk
+
+    def stage(self, stage):
+        """
+        Compression stage reported as compress, its crc32 included,
+        except for the time spent in the source it pulls from.
+        """
+        def timed_stage(source, compression):
+            report = self.instrument.stage
+            pulled = _Pulled(source)
+            chunks = stage(pulled, compression)
+            while True:
+                start = _clock()
+                pulled.seconds = 0.0
+                try:
+                    chunk = next(chunks)
+                except StopIteration as stop:
+                    report(
+                        'compress', _clock() - start - pulled.seconds, 0
+                    )
+                    return stop.value
+                report('compress', _clock() - start - pulled.seconds,
+                       len(chunk))
+                yield chunk
+
+        return timed_stage
+
+    def compressed_chunks(self, source, compression):
+        """
+        Serial compression stage, writer.compressed_chunks with its crc32
+        and compressor calls reported apart.
+        """
+        def compressor():
+            compressor = get_compressor(compression)
+            return compressor and _Proxy(
+                compressor,
+                compress=self.timed('compress', compressor.compress),
+            )
+
+        return compressed_chunks(
+            source, compression, compressor, self.timed('crc32', crc32)
+        )
+
+    def engine(self, engine):
+        """Cipher engine whose encryptions are reported as cypher."""
+        if engine is None:
+            return None
+        return _Proxy(engine, encrypt=self.timed('cypher', engine.encrypt))
+
+    def output(self, chunks):
+        """
+        Archive chunks, the time spent by the consumer on each reported
+        as yield, then the archive totals once exhausted.
+        """
+        stage = self.instrument.stage
+        bytes_out = 0
+        first_byte = None
+        start = _clock()
+        for chunk in chunks:
+            if first_byte is None:
+                first_byte = _clock() - start
+            bytes_out += len(chunk)
+            consumer = _clock()
+            yield chunk
+            stage('yield', _clock() - consumer, len(chunk))
+
+        duration = _clock() - start
+        self.instrument.archive(ArchiveStats(
+            self.bytes_in, bytes_out,
+            self.bytes_in / bytes_out if bytes_out else 0.0,
+            duration if first_byte is None else first_byte, duration,
+        ))
+
+
+class _Pulled():
+
+    """Source iterator adding up the time spent pulling from it."""
+
+    def __init__(self, source):
+        self.chunks = iter(source)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = _clock()
+        try:
+            return next(self.chunks)
+        finally:
+            self.seconds += _clock() - start
+
+
+class _Proxy():
+
+    """Proxy of an object, some of its methods replaced by timed ones."""
+
+    def __init__(self, wrapped, **attributes):
+        self.__dict__.update(attributes, _wrapped=wrapped)
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+
+class PrometheusAggregator(Instrument):
+
+    """
+    Thread-safe instrument adding up every stage and archive, exported
+    in the Prometheus text exposition format by exposition().
+    """
+
+    def __init__(self, namespace='ziphyr'):
+        self.namespace = namespace
+        self._lock = Lock()
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.bytes = dict.fromkeys(STAGES, 0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.archives = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.first_byte = 0.0
+        self.duration = 0.0
+
+    def stage(self, name, seconds, nbytes):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.bytes[name] = self.bytes.get(name, 0) + nbytes
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def archive(self, stats):
+        with self._lock:
+            self.archives += 1
+            self.bytes_in += stats.bytes_in
+            self.bytes_out += stats.bytes_out
+            self.first_byte += stats.first_byte
+            self.duration += stats.duration
+
+    def exposition(self):
+        """Every counter so far, in the Prometheus text format."""
+        ns = self.namespace
+        lines = []
+
+        def metric(name, kind, doc, samples):
+            lines.append('# HELP %s_%s %s' % (ns, name, doc))
+            lines.append('# TYPE %s_%s %s' % (ns, name, kind))
+            for suffix, labels, value in samples:
+                lines.append('%s_%s%s%s %r' % (
+                    ns, name, suffix, labels, value
+                ))
+
+        with self._lock:
+            for name, counter, doc in (
+                ('stage_seconds_total', self.seconds,
+                 "Time spent per pipeline stage."),
+                ('stage_bytes_total', self.bytes,
+                 "Bytes going through each pipeline stage."),
+                ('stage_calls_total', self.calls,
+                 "Calls of each pipeline stage."),
+            ):
+                metric(name, 'counter', doc, [
+                    ('', '{stage="%s"}' % stage, value)
+                    for stage, value in sorted(counter.items())
+                ])
+            metric('archives_total', 'counter', "Archives generated.", [
+                ('', '', self.archives),
+            ])
+            metric('archive_bytes_in_total', 'counter',
+                   "Clear bytes read from the sources.", [
+                       ('', '', self.bytes_in),
+                   ])
+            metric('archive_bytes_out_total', 'counter',
+                   "Archive bytes yielded.", [
+                       ('', '', self.bytes_out),
+                   ])
+            metric('archive_compression_ratio', 'gauge',
+                   "Clear bytes over archive bytes, overall.", [
+                       ('', '', self.bytes_in / self.bytes_out
+                        if self.bytes_out else 0.0),
+                   ])
+            for name, total, doc in (
+                ('archive_first_byte_seconds', self.first_byte,
+                 "Time to the first archive byte."),
+                ('archive_duration_seconds', self.duration,
+                 "Time to the last archive byte."),
+            ):
+                metric(name, 'summary', doc, [
+                    ('_sum', '', total), ('_count', '', self.archives),
+                ])
+
+        return '\n'.join(lines) + '\n'
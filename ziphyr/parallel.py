@@ -0,0 +1,75 @@
+"""Process-pool parallel compression's module."""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from zipfile import ZIP_STORED
+
+from ziphyr.cipher import default_factory
+from ziphyr.utils import owned_chunk
+from ziphyr.writer import drain, entry_chunks, entry_info, entry_source
+
+
+# uncompressed bytes allowed in flight, look-ahead entries and results
+PARALLEL_MEMORY = 1 << 26
+
+
+def compress_entry(info, source, compression=ZIP_STORED, password=None):
+    """
+    Worker side: a whole entry compressed then zipcrypted.
+    A filepath source is read by the worker itself.
+    Returns the entry bytes and its record.
+    """
+    engine = default_factory.engine(password) if password else None
+    output = []
+    record = drain(
+        entry_chunks(info, entry_source(source), compression, engine),
+        output.append,
+    )
+    return b''.join(output), record
+
+
+def parallel_entries(
+    writer, entries, compression=ZIP_STORED,
+    workers=None, lookahead=None, max_memory=PARALLEL_MEMORY,
+):
+    """
+    Generator writing (metadata, source) entries through the writer,
+    the next ones compressed and zipcrypted ahead in a process pool.
+    Entries are emitted in order, at most lookahead in flight and
+    max_memory of their uncompressed bytes held at once.
+    Entries larger than max_memory are streamed in-process instead.
+    """
+    workers = workers or os.cpu_count() or 1
+    lookahead = lookahead or 2 * workers
+    pending = deque()
+    in_flight = 0
+
+    with ProcessPoolExecutor(workers) as executor:
+        for metadata, source in entries:
+            info = entry_info(metadata)
+
+            while pending and (
+                len(pending) >= lookahead
+                or in_flight + info.file_size > max_memory
+            ):
+                size, future = pending.popleft()
+                in_flight -= size
+                yield writer.written(*future.result())
+
+            if info.file_size > max_memory:
+                yield from writer.entry(info, source, compression)
+                continue
+
+            if not isinstance(source, str):
+                # only filepaths are read by the workers
+                source = [b''.join(map(owned_chunk, source))]
+
+            pending.append((info.file_size, executor.submit(
+                compress_entry, info, source, compression, writer.password
+            )))
+            in_flight += info.file_size
+
+        while pending:
+            _, future = pending.popleft()
+            yield writer.written(*future.result())
@@ -0,0 +1,216 @@
+"""Content-addressed cache of compressed payloads' module."""
+
+import hashlib
+import os
+import struct
+import tempfile
+from collections import namedtuple
+
+from ziphyr.lru import LRUCache
+from ziphyr.utils import READ_CHUNKSIZE, readinto_iterable
+from ziphyr.writer import compressed_chunks
+
+
+PAYLOAD_MAXSIZE = 1 << 30
+
+_PAYLOAD_MAGIC = b'ZIPHYRP1'
+_PAYLOAD_HEADER = struct.Struct('<8sLQQ')
+_PAYLOAD_SUFFIX = '.payload'
+
+Payload = namedtuple('Payload', ['crc', 'file_size', 'compress_size'])
+
+
+def file_digest(path):
+    """sha256 hex digest of the file on path, its content key."""
+    digest = hashlib.sha256()
+    for chunk in readinto_iterable(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _payload_chunks(f, chunksize):
+    """Compressed bytes of an opened payload file, closing it at the end."""
+    with f:
+        for chunk in iter(lambda: f.read(chunksize), b''):
+            yield chunk
+
+
+class PayloadCache():
+
+    """
+    Size-bounded LRU directory of compressed payloads, keyed by the
+    digest of their clear content and the compression settings, each
+    file holding the clear crc and sizes ahead of the compressed bytes.
+    Recency outlives the process through the files' modification time,
+    and payloads are written to a temporary file then renamed: several
+    processes may share the directory, each store rescanning it before
+    evicting, so maxsize bounds the directory as a whole.
+    """
+
+    def __init__(self, directory, maxsize=PAYLOAD_MAXSIZE):
+        """
+        Directory of the payloads, created if missing.
+        Optional maxsize parameter, the bytes kept on disk.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.maxsize = maxsize
+        # name: size, least recently used first
+        self._payloads = LRUCache(maxsize)
+        self._evict()
+
+    def _scan(self):
+        """
+        Reads the payloads back from the directory, every process's,
+        least recently modified first, this process's own recency
+        breaking the ties of coarse timestamps.
+        Returns the (name, size) of the payloads beyond maxsize.
+        """
+        ranks = dict(
+            (name, i) for i, name in enumerate(self._payloads.keys())
+        )
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_PAYLOAD_SUFFIX) and entry.is_file():
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted meanwhile by another process
+                found.append((
+                    st.st_mtime_ns, ranks.get(entry.name, -1), entry.name,
+                    st.st_size,
+                ))
+
+        return self._payloads.reload(
+            (name, size, size) for _, _, name, size in sorted(found)
+        )
+
+    @staticmethod
+    def key(digest, compression, level=None):
+        """Cache key of a content digest under compression settings."""
+        settings = '%s:%s:%s' % (digest, compression, level)
+        return hashlib.sha256(settings.encode()).hexdigest()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _touch(self, name, size):
+        """Records name as the most recently used, size bytes large."""
+        self._remove(self._payloads.put(name, size, size))
+
+    def _remove(self, payloads):
+        """Removes the files of (name, size) payloads."""
+        for name, _ in payloads:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, name):
+        self._payloads.pop(name)
+        self._remove([(name, None)])
+
+    def get(self, key, chunksize=READ_CHUNKSIZE):
+        """
+        The (Payload, chunks) cached under key, chunks generating the
+        compressed bytes, or None on a miss.
+        """
+        name = key + _PAYLOAD_SUFFIX
+        try:
+            f = open(self._path(name), 'rb')
+        except FileNotFoundError:
+            self._payloads.count(False)
+            return None
+
+        size = os.fstat(f.fileno()).st_size
+        header = f.read(_PAYLOAD_HEADER.size)
+        magic = header[:len(_PAYLOAD_MAGIC)]
+        payload = None
+        if magic == _PAYLOAD_MAGIC and len(header) == _PAYLOAD_HEADER.size:
+            payload = Payload(*_PAYLOAD_HEADER.unpack(header)[1:])
+        if payload is None or (
+            size != _PAYLOAD_HEADER.size + payload.compress_size
+        ):
+            f.close()
+            self._forget(name)
+            self._payloads.count(False)
+            return None
+
+        self._payloads.count(True)
+        self._touch(name, size)
+        try:
+            os.utime(self._path(name))
+        except OSError:
+            pass  # evicted meanwhile, still readable through f
+        return payload, _payload_chunks(f, chunksize)
+
+    def store(self, key, chunks):
+        """
+        Generator passing through the compressed chunks of a compression
+        stage while writing them down, returns the stage's clear
+        (crc, file_size). The payload is only kept once complete.
+        """
+        fd, tmp_path = tempfile.mkstemp(
+            prefix='.', suffix='.tmp', dir=self.directory
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.seek(_PAYLOAD_HEADER.size)
+                compress_size = 0
+                while True:
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration as stop:
+                        crc, file_size = stop.value
+                        break
+                    f.write(chunk)
+                    compress_size += len(chunk)
+                    yield chunk
+
+                f.seek(0)
+                f.write(_PAYLOAD_HEADER.pack(
+                    _PAYLOAD_MAGIC, crc, file_size, compress_size
+                ))
+
+            name = key + _PAYLOAD_SUFFIX
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        self._touch(name, _PAYLOAD_HEADER.size + compress_size)
+        self._evict()
+        return crc, file_size
+
+    def _evict(self):
+        """
+        Removes the least recently used payloads beyond maxsize, the
+        directory scanned first for the other processes' payloads.
+        """
+        self._remove(self._scan())
+
+    def stage(self, digest, stage=None):
+        """
+        Compression stage serving the payload of the content digest from
+        the cache, without reading the source, or compressing the source
+        through stage (compressed_chunks by default) into the cache.
+        """
+        def cached(source, compression):
+            key = self.key(digest, compression, getattr(stage, 'level', None))
+            hit = self.get(key)
+            if hit:
+                payload, chunks = hit
+                yield from chunks
+                return payload.crc, payload.file_size
+            chunks = (stage or compressed_chunks)(source, compression)
+            return (yield from self.store(key, chunks))
+
+        return cached
+
+    def cache_info(self):
+        """Hits, misses, maxsize and currsize in bytes, as functools does."""
+        return self._payloads.cache_info()
+
+    def cache_clear(self):
+        """Removes every payload and resets the counters."""
+        self._remove(self._payloads.cache_clear())
@@ -0,0 +1,107 @@
+"""Pipelined archive stages' module, on background threads."""
+
+import queue
+import threading
+
+from ziphyr.utils import owned_chunk
+from ziphyr.writer import compressed_chunks
+
+
+PIPELINE_DEPTH = 4
+
+
+class _Done():
+
+    """End of the produced items, with the generator's return value."""
+
+    def __init__(self, value=None):
+        self.value = value
+
+
+class _Failure():
+
+    """Exception raised by the producer, raised again by the consumer."""
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def background(iterable, depth=PIPELINE_DEPTH, name='ziphyr-pipeline'):
+    """
+    Generator of the items of iterable, produced ahead in a background
+    thread, at most depth of them queued: a slow producer overlaps with
+    whatever the consumer does, zlib, bz2 and lzma releasing the GIL.
+    Returns what iterable returns, as a compression stage does, and
+    raises what it raises. Closing it stops the producer at its next
+    item, without waiting for it.
+    """
+    items = queue.Queue(max(depth, 1))
+    stop = threading.Event()
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            while not stop.is_set():
+                try:
+                    item = next(iterator)
+                except StopIteration as end:
+                    item = _Done(end.value)
+                # blocks while full, until the consumer gets or drains
+                items.put(item)
+                if isinstance(item, _Done):
+                    return
+        except BaseException as e:
+            items.put(_Failure(e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if isinstance(item, _Done):
+                thread.join()
+                return item.value
+            if isinstance(item, _Failure):
+                raise item.exception
+            yield item
+    finally:
+        stop.set()
+        # room for the one item the producer may still be putting
+        while True:
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                break
+
+
+class PipelinedStage():
+
+    """
+    Compression stage running another one (the writer's serial
+    compression by default) in a background thread, its source read
+    ahead in another one: chunks over recycled buffers, as
+    readinto_iterable() yields, are copied before being queued.
+    Plugs into ZiphyrWriter.entry() as stage.
+    """
+
+    def __init__(self, stage=None, depth=PIPELINE_DEPTH):
+        """Optional stage, and depth of the queues between the threads."""
+        self.stage = stage
+        self.depth = depth
+
+    def __call__(self, source, compression):
+        """
+        Yields the compressed chunks of the source,
+        then returns the (crc, file_size) of its clear data.
+        """
+        source = background(
+            map(owned_chunk, source), self.depth, 'ziphyr-read'
+        )
+        stage = self.stage or compressed_chunks
+        return (yield from background(
+            stage(source, compression), self.depth, 'ziphyr-compress'
+        ))
@@ -0,0 +1,152 @@
+"""Random-access archive generation's module."""
+
+import struct
+from zipfile import ZIP_STORED, crc32
+
+from ziphyr.cipher import ZipCryptoEngine
+from ziphyr.stream import OUTPUT_CHUNKSIZE
+from ziphyr.writer import EntryEncoder, central_directory
+
+
+RANGE_INTERVAL = 1 << 18  # source bytes between two cipher checkpoints
+
+_INDEX_MAGIC = b'ZPHYRIDX'
+_INDEX_HEADER = struct.Struct('<8sBQQLL')
+_INDEX_VERSION = 2
+_CHECKPOINT = struct.Struct('<LLL')
+
+
+class ArchiveIndex():
+
+    """
+    Sidecar index of a ZIP_STORED single-entry archive: its exact prefix
+    (local and zipcrypto headers) and suffix (descriptor and central
+    directory), and the cipher keys every interval bytes of the source.
+    Disclaimer: the keys decrypt the archive, keep it as the password.
+    """
+
+    def __init__(self, prefix, suffix, file_size, interval, checkpoints):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.file_size = file_size
+        self.interval = interval
+        self.checkpoints = checkpoints
+
+    @property
+    def size(self):
+        """Total byte count of the archive."""
+        return len(self.prefix) + self.file_size + len(self.suffix)
+
+    def dump(self, fileobj):
+        """Writes the index to a binary file object."""
+        fileobj.write(_INDEX_HEADER.pack(
+            _INDEX_MAGIC, _INDEX_VERSION, self.file_size, self.interval,
+            len(self.prefix), len(self.suffix),
+        ))
+        fileobj.write(self.prefix)
+        fileobj.write(self.suffix)
+        fileobj.write(struct.pack('<Q', len(self.checkpoints)))
+        for keys in self.checkpoints:
+            fileobj.write(_CHECKPOINT.pack(*keys))
+
+    @classmethod
+    def load(cls, fileobj):
+        """Reads back an index written by dump()."""
+        magic, version, file_size, interval, prefix_len, suffix_len = (
+            _INDEX_HEADER.unpack(fileobj.read(_INDEX_HEADER.size))
+        )
+        if magic != _INDEX_MAGIC or version != _INDEX_VERSION:
+            raise ValueError("Not a ziphyr archive index.")
+        prefix = fileobj.read(prefix_len)
+        suffix = fileobj.read(suffix_len)
+        count, = struct.unpack('<Q', fileobj.read(8))
+        checkpoints = list(
+            _CHECKPOINT.iter_unpack(fileobj.read(count * _CHECKPOINT.size))
+        )
+        return cls(prefix, suffix, file_size, interval, checkpoints)
+
+
+def build_index(info, source, engine=None, interval=RANGE_INTERVAL):
+    """
+    First pass over the source of a ZIP_STORED entry, zipcrypted through
+    the cipher engine if any, saving the cipher keys every interval bytes.
+    """
+    encoder = EntryEncoder(info, ZIP_STORED, engine)
+    prefix = encoder.header()
+
+    checkpoints = []
+    clear_crc = 0
+    file_size = 0
+    for chunk in source:
+        view = memoryview(chunk)
+        while view:
+            offset = file_size % interval
+            if engine and not offset:
+                checkpoints.append(engine.keys)
+            piece = view[:interval - offset]
+            view = view[len(piece):]
+            clear_crc = crc32(piece, clear_crc)
+            if engine:
+                engine.feed(piece)
+            file_size += len(piece)
+
+    # stored data, accounted for without being emitted
+    encoder.compress_size += file_size
+    descriptor = encoder.close(clear_crc, file_size)
+    cd_offset = len(prefix) + file_size + len(descriptor)
+    suffix = descriptor + central_directory([encoder.record], cd_offset)
+
+    return ArchiveIndex(prefix, suffix, file_size, interval, checkpoints)
+
+
+def _data_range(index, fileobj, start, end, chunksize):
+    """Source bytes [start, end), zipcrypted from the closest checkpoint."""
+    engine = None
+    position = start
+    if index.checkpoints:
+        checkpoint = start // index.interval
+        engine = ZipCryptoEngine.from_keys(index.checkpoints[checkpoint])
+        position = checkpoint * index.interval
+
+    fileobj.seek(position)
+    while position < end:
+        chunk = fileobj.read(min(chunksize, end - position))
+        if not chunk:
+            raise ValueError("Source shorter than its archive index.")
+        skip = start - position
+        position += len(chunk)
+        if engine is None:
+            yield chunk
+        elif skip >= len(chunk):
+            engine.feed(chunk)
+        else:
+            if skip > 0:
+                engine.feed(chunk[:skip])
+                chunk = chunk[skip:]
+            yield engine.encrypt(chunk)
+
+
+def generate_range(
+    index, fileobj, start=0, end=None, chunksize=OUTPUT_CHUNKSIZE,
+):
+    """
+    Generator of the archive bytes [start, end), as a slice, from its
+    index and its seekable source, in O(range) rather than O(start).
+    """
+    end = index.size if end is None else min(end, index.size)
+    if not 0 <= start <= end:
+        raise ValueError("Invalid range %d-%d." % (start, end))
+
+    data_start = len(index.prefix)
+    data_end = data_start + index.file_size
+
+    if start < data_start:
+        yield index.prefix[start:min(end, data_start)]
+
+    lo = max(start, data_start) - data_start
+    hi = min(end, data_end) - data_start
+    if lo < hi:
+        yield from _data_range(index, fileobj, lo, hi, chunksize)
+
+    if end > data_end:
+        yield index.suffix[max(start, data_end) - data_end:end - data_end]
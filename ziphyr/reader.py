@@ -0,0 +1,376 @@
+"""Streaming zip archive reader's module."""
+
+import bz2
+import lzma
+import struct
+import zlib
+from collections import namedtuple
+from zipfile import (
+    BadZipFile, ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED, crc32,
+)
+
+from ziphyr.cipher import default_factory
+from ziphyr.writer import (
+    FLAG_DATA_DESCRIPTOR, FLAG_ENCRYPTED, FLAG_UTF8, drain,
+)
+from ziphyr.zstd import ZIP_ZSTANDARD, ZstdBlocks, zstd_decompressor
+
+
+READ_CHUNKSIZE = 1 << 16
+
+_LOCAL_HEADER = struct.Struct('<4sHHHHHLLLHH')
+_DESCRIPTOR = struct.Struct('<4sLLL')
+_DESCRIPTOR64 = struct.Struct('<4sLQQ')
+_LOCAL_SIGNATURE = b'PK\x03\x04'
+_DD_SIGNATURE = b'PK\x07\x08'
+# what may follow the last entry: central directory, end records, ...
+_TRAILING_SIGNATURES = (
+    b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06', b'PK\x06\x07',
+    b'PK\x06\x08', b'PK\x05\x05',
+)
+
+LocalEntry = namedtuple('LocalEntry', [
+    'filename', 'flag_bits', 'compress_type', 'date_time', 'crc',
+    'compress_size', 'file_size',
+])
+
+
+class _Input():
+
+    """Chunked input, with a push-back of the bytes read ahead."""
+
+    def __init__(self, source, chunksize):
+        if hasattr(source, 'read'):
+            self._chunks = iter(lambda: source.read(chunksize), b'')
+        else:
+            self._chunks = iter(source)
+        self._pending = b''
+
+    def chunk(self):
+        """Next available bytes, empty at the end of the input."""
+        if self._pending:
+            chunk, self._pending = self._pending, b''
+            return chunk
+        for chunk in self._chunks:
+            if chunk:
+                return bytes(chunk)
+        return b''
+
+    def read(self, size):
+        """Exactly size bytes, or less at the end of the input."""
+        data = self._pending
+        while len(data) < size:
+            self._pending = b''
+            chunk = self.chunk()
+            if not chunk:
+                break
+            data += chunk
+        self._pending = data[size:]
+        return data[:size]
+
+    def unread(self, data):
+        """Pushes bytes read ahead back in front of the input."""
+        self._pending = bytes(data) + self._pending
+
+
+class _Inflater():
+
+    """
+    Bounded-output decompression of one entry, knowing where its
+    compressed stream ends: eof, then unused input bytes.
+    Zstandard input is fed a block at a time, its output split.
+    """
+
+    def __init__(self, compress_type):
+        self.compress_type = compress_type
+        self.eof = False
+        self.unused = 0
+        self._header = b''
+        if compress_type == ZIP_DEFLATED:
+            self._decompressor = zlib.decompressobj(-15)
+        elif compress_type == ZIP_BZIP2:
+            self._decompressor = bz2.BZ2Decompressor()
+        elif compress_type == ZIP_LZMA:
+            self._decompressor = None  # after the properties header
+        elif compress_type == ZIP_ZSTANDARD:
+            self._decompressor = zstd_decompressor()
+            self._blocks = ZstdBlocks()
+        else:
+            raise NotImplementedError(
+                "Compression type %d not supported." % compress_type
+            )
+
+    def _lzma(self, data):
+        """Raw LZMA1 decompressor once its zip properties header is in."""
+        self._header += data
+        if len(self._header) < 4:
+            return None
+        psize, = struct.unpack('<H', self._header[2:4])
+        if len(self._header) < 4 + psize:
+            return None
+        self._decompressor = lzma.LZMADecompressor(
+            lzma.FORMAT_RAW, filters=[lzma._decode_filter_properties(
+                lzma.FILTER_LZMA1, self._header[4:4 + psize]
+            )],
+        )
+        data, self._header = self._header[4 + psize:], None
+        return data
+
+    def inflate(self, data, limit):
+        """Generator of the output of data, limit bytes at most at once."""
+        if self._decompressor is None:
+            data = self._lzma(data)
+            if data is None:
+                return
+
+        d = self._decompressor
+        if self.compress_type == ZIP_DEFLATED:
+            out = d.decompress(data, limit)
+            while True:
+                if out:
+                    yield out
+                if d.eof or not d.unconsumed_tail:
+                    break
+                out = d.decompress(d.unconsumed_tail, limit)
+        elif self.compress_type == ZIP_ZSTANDARD:
+            for step in self._blocks.split(data):  # no max_length
+                out = d.decompress(step)
+                for i in range(0, len(out), limit):
+                    yield out[i:i + limit]
+        else:
+            out = d.decompress(data, limit)
+            while True:
+                if out:
+                    yield out
+                if d.eof or d.needs_input:
+                    break
+                out = d.decompress(b'', limit)
+
+        self.eof = d.eof
+        self.unused = len(d.unused_data)
+
+
+class ZiphyrReader():
+
+    """
+    Streaming reader of a zip archive from a non-seekable source, a
+    binary file object or an iterable of chunks, in constant memory.
+    Local headers and data descriptors are parsed on the fly, entries
+    are decrypted (zipcrypto), decompressed and crc-checked as they go.
+    Iterating yields (LocalEntry, chunks) pairs, chunks generating the
+    clear data then returning the LocalEntry completed by its data
+    descriptor. Entries left unread are skipped, still checked.
+    Reading stops at the central directory.
+    """
+
+    def __init__(
+        self, source, password: bytes = None, factory=None,
+        chunksize=READ_CHUNKSIZE,
+    ):
+        """
+        Optional bytes-type password parameter, for every entry.
+        Optional cipher context factory, shared cache by default.
+        """
+        self.input = _Input(source, chunksize)
+        self.password = password
+        self.factory = factory or default_factory
+        self.chunksize = chunksize
+
+    def __iter__(self):
+        while True:
+            signature = self.input.read(4)
+            if signature in _TRAILING_SIGNATURES:
+                return
+            if signature != _LOCAL_SIGNATURE:
+                raise BadZipFile(
+                    "Bad local header signature %r, truncated archive?"
+                    % signature
+                )
+
+            entry, zip64 = self._local_header(signature)
+            chunks = self._entry_chunks(entry, zip64)
+            yield entry, chunks
+            drain(chunks, lambda chunk: None)
+
+    def _local_header(self, signature):
+        header = signature + self.input.read(_LOCAL_HEADER.size - 4)
+        if len(header) < _LOCAL_HEADER.size:
+            raise BadZipFile("Truncated local header.")
+        (
+            _, _, flag_bits, compress_type, dostime, dosdate,
+            crc, compress_size, file_size, name_len, extra_len,
+        ) = _LOCAL_HEADER.unpack(header)
+        filename = self.input.read(name_len)
+        extra = self.input.read(extra_len)
+
+        zip64 = False
+        while len(extra) >= 4:
+            tag, size = struct.unpack('<HH', extra[:4])
+            if tag == 0x0001:
+                zip64 = True
+                body = extra[4:4 + size]
+                values = list(struct.unpack(
+                    '<%dQ' % (len(body) // 8), body[:len(body) // 8 * 8]
+                ))
+                if file_size == 0xFFFFFFFF and values:
+                    file_size = values.pop(0)
+                if compress_size == 0xFFFFFFFF and values:
+                    compress_size = values.pop(0)
+            extra = extra[4 + size:]
+
+        encoding = 'utf-8' if flag_bits & FLAG_UTF8 else 'cp437'
+        date_time = (
+            (dosdate >> 9) + 1980, (dosdate >> 5) & 0xF, dosdate & 0x1F,
+            dostime >> 11, (dostime >> 5) & 0x3F, (dostime & 0x1F) * 2,
+        )
+        if flag_bits & FLAG_DATA_DESCRIPTOR:
+            crc = compress_size = file_size = None
+
+        entry = LocalEntry(
+            filename.decode(encoding), flag_bits, compress_type, date_time,
+            crc, compress_size, file_size,
+        )
+        return entry, zip64
+
+    def _engine(self, entry):
+        """Cipher engine past the entry's checked zipcrypto header."""
+        if not entry.flag_bits & FLAG_ENCRYPTED:
+            return None
+        if not self.password:
+            raise RuntimeError(
+                "File %r is encrypted, password required." % entry.filename
+            )
+
+        header = self.input.read(12)
+        if len(header) < 12:
+            raise BadZipFile("Truncated zipcrypto header.")
+        engine = self.factory.engine(self.password)
+        check_byte = engine.decrypt(header)[11]
+
+        if entry.flag_bits & FLAG_DATA_DESCRIPTOR:
+            dostime = (
+                entry.date_time[3] << 11 | entry.date_time[4] << 5
+                | entry.date_time[5] // 2
+            )
+            expected = (dostime >> 8) & 0xFF
+        else:
+            expected = (entry.crc >> 24) & 0xFF
+        if check_byte != expected:
+            raise RuntimeError("Bad password for file %r." % entry.filename)
+        return engine
+
+    def _raw_sized(self, size):
+        """Raw data of a known compressed size."""
+        while size:
+            chunk = self.input.read(min(size, self.chunksize))
+            if not chunk:
+                raise BadZipFile("Truncated entry data.")
+            size -= len(chunk)
+            yield chunk
+
+    def _raw_stored(self, descriptor, consumed, encrypted):
+        """
+        Raw stored data of unknown size, up to the data descriptor whose
+        signature is followed by the very size of what came before.
+        Returns the descriptor's (crc, compress_size, file_size).
+        """
+        header = 12 if encrypted else 0
+        buffer = b''
+        while True:
+            chunk = self.input.chunk()
+            if not chunk:
+                raise BadZipFile("Truncated entry, no data descriptor.")
+            buffer += chunk
+
+            start = 0
+            while True:
+                i = buffer.find(_DD_SIGNATURE, start)
+                if i < 0 or len(buffer) < i + descriptor.size:
+                    break
+                _, crc, compress_size, file_size = descriptor.unpack_from(
+                    buffer, i
+                )
+                if compress_size == consumed + i == file_size + header:
+                    yield buffer[:i]
+                    self.input.unread(buffer[i + descriptor.size:])
+                    return crc, compress_size, file_size
+                start = i + 1
+
+            # what may still be the beginning of the descriptor is kept
+            keep = i if i >= 0 else max(len(buffer) - 3, 0)
+            if keep:
+                yield buffer[:keep]
+                consumed += keep
+                buffer = buffer[keep:]
+
+    def _descriptor(self, descriptor):
+        """Data descriptor following compressed data, signature optional."""
+        data = self.input.read(4)
+        if data != _DD_SIGNATURE:
+            data = _DD_SIGNATURE + data
+        else:
+            data = _DD_SIGNATURE
+        data += self.input.read(descriptor.size - len(data))
+        if len(data) < descriptor.size:
+            raise BadZipFile("Truncated data descriptor.")
+        return descriptor.unpack(data)[1:]
+
+    def _entry_chunks(self, entry, zip64):
+        engine = self._engine(entry)
+        consumed = 12 if engine else 0
+        descriptor = _DESCRIPTOR64 if zip64 else _DESCRIPTOR
+        streamed = entry.flag_bits & FLAG_DATA_DESCRIPTOR
+        stored = entry.compress_type == ZIP_STORED
+        inflater = None if stored else _Inflater(entry.compress_type)
+
+        if not streamed:
+            raw = self._raw_sized(entry.compress_size - consumed)
+        elif stored:
+            raw = self._raw_stored(descriptor, consumed, engine)
+        else:
+            raw = iter(self.input.chunk, b'')
+
+        clear_crc = 0
+        file_size = 0
+        trailer = None
+        while True:
+            try:
+                chunk = next(raw)
+            except StopIteration as stop:
+                trailer = stop.value
+                break
+
+            consumed += len(chunk)
+            data = engine.decrypt(chunk) if engine else chunk
+            outputs = inflater.inflate(data, self.chunksize) if (
+                inflater
+            ) else (data,)
+            for data in outputs:
+                clear_crc = crc32(data, clear_crc)
+                file_size += len(data)
+                yield data
+
+            if streamed and inflater and inflater.eof:
+                if inflater.unused:
+                    # read ahead, the descriptor and what follows
+                    self.input.unread(chunk[-inflater.unused:])
+                    consumed -= inflater.unused
+                trailer = self._descriptor(descriptor)
+                break
+
+        if streamed and trailer is None:
+            raise BadZipFile("Truncated entry %r." % entry.filename)
+        if inflater and not inflater.eof and entry.compress_type != ZIP_LZMA:
+            raise BadZipFile("Truncated entry %r." % entry.filename)
+
+        crc, compress_size, expected_size = trailer if streamed else (
+            entry.crc, entry.compress_size, entry.file_size
+        )
+        if crc != clear_crc:
+            raise BadZipFile("Bad CRC-32 for file %r." % entry.filename)
+        if expected_size != file_size or compress_size != consumed:
+            raise BadZipFile("Bad sizes for file %r." % entry.filename)
+
+        return entry._replace(
+            crc=crc, compress_size=compress_size, file_size=file_size
+        )
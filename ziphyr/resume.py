@@ -0,0 +1,138 @@
+"""Resumable archive streaming's module."""
+
+import json
+from collections import namedtuple
+from zipfile import ZIP_DEFLATED, ZIP_STORED
+
+from ziphyr.cipher import ZipCryptoEngine
+from ziphyr.writer import EntryEncoder, EntryInfo, central_directory
+
+
+CHECKPOINT_INTERVAL = 1 << 22  # clear bytes between two checkpoints
+
+
+class StreamState(namedtuple('StreamState', [
+    'info', 'compression', 'every', 'emitted', 'crc', 'file_size',
+    'compress_size', 'keys',
+])):
+
+    """
+    Snapshot of a single-entry archive stream at a chunk boundary:
+    the checkpoint interval, the archive bytes emitted so far, the crc
+    and sizes of the entry and the cipher keys, None without zipcrypto.
+    Disclaimer: the keys decrypt the archive, keep it as the password.
+    """
+
+    __slots__ = ()
+
+    def dumps(self):
+        """Compact serialization, as bytes."""
+        return json.dumps(list(self), separators=(',', ':')).encode()
+
+    @classmethod
+    def loads(cls, data):
+        """Reads back a state serialized by dumps()."""
+        fields = json.loads(data.decode())
+        info = EntryInfo(*fields[0])
+        info = info._replace(date_time=tuple(info.date_time))
+        keys = tuple(fields[7]) if fields[7] else None
+        return cls(info, *fields[1:7], keys)
+
+
+class ResumableStream():
+
+    """
+    Iterator over a single-entry archive stream, taking a StreamState
+    checkpoint at every multiple of the interval in clear bytes, source
+    chunks split there. A deflate compressor is fully flushed and
+    renewed at each checkpoint, so a stream resumed elsewhere, however
+    its source is chunked, goes on with the very same bytes.
+    """
+
+    def __init__(
+        self, info, source, compression=ZIP_STORED, engine=None,
+        every=CHECKPOINT_INTERVAL, state=None,
+    ):
+        """
+        Starts a fresh stream, or goes on from the state, the engine then
+        restored from its keys and the source yielding the clear bytes
+        from state.file_size on, with the state's checkpoint interval.
+        Every checkpoint costs a snapshot, and a full flush resetting
+        the deflate window: intervals much smaller than the deflate
+        window (32K) degrade the compression.
+        """
+        if compression not in (ZIP_STORED, ZIP_DEFLATED):
+            raise ValueError("Only stored and deflated streams can resume.")
+        every = state.every if state is not None else every
+        if every < 1:
+            raise ValueError("The checkpoint interval is at least 1 byte.")
+
+        self.encoder = EntryEncoder(info, compression, engine)
+        self.source = source
+        self.every = every
+        self.emitted = 0
+        self.state = state
+
+        if state is not None:
+            self.emitted = state.emitted
+            self.encoder.crc = state.crc
+            self.encoder.file_size = state.file_size
+            self.encoder.compress_size = state.compress_size
+
+        self._chunks = self._generate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def snapshot(self):
+        """State of the stream once the chunks so far are emitted."""
+        encoder = self.encoder
+        return StreamState(
+            encoder.info, encoder.compression, self.every, self.emitted,
+            encoder.crc, encoder.file_size, encoder.compress_size,
+            encoder.engine.keys if encoder.engine else None,
+        )
+
+    def _checkpoint(self, data):
+        """Accounts for data, a state being taken right after it."""
+        self.emitted += len(data)
+        self.state = self.snapshot()
+        return data
+
+    def _generate(self):
+        encoder = self.encoder
+
+        if self.state is None:
+            yield self._checkpoint(encoder.header())
+
+        for chunk in self.source:
+            while chunk:
+                # split at the interval multiples, whatever the chunking
+                room = self.every - encoder.file_size % self.every
+                head, chunk = chunk[:room], chunk[room:]
+                data = encoder.feed(head)
+                if encoder.file_size % self.every == 0:
+                    yield self._checkpoint(data + encoder.sync())
+                elif data:
+                    self.emitted += len(data)
+                    yield data
+
+        data = encoder.flush()
+        data += encoder.close()
+        data += central_directory([encoder.record], self.emitted + len(data))
+        self.emitted += len(data)
+        yield data
+
+
+def resume(state, source):
+    """
+    Stream going on from a StreamState, the source yielding the clear
+    bytes from state.file_size on, the output from state.emitted on.
+    """
+    engine = ZipCryptoEngine.from_keys(state.keys) if state.keys else None
+    return ResumableStream(
+        state.info, source, state.compression, engine, state=state
+    )
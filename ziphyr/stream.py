@@ -2,19 +2,33 @@
 
 from io import RawIOBase
 
+from ziphyr.cipher import CRCTABLE, _gen_crc, default_factory  # noqa
 
-def _gen_crc(crc):
 
+OUTPUT_CHUNKSIZE = 1 << 16
+
+
+def coalesce(chunks, chunksize=OUTPUT_CHUNKSIZE):
     """
-    cpython zipfile/_gen_crc from python3.7.
-    copy-pasted for retro-compatibility.
+    Regroups chunks into chunks of at least chunksize bytes, but the last,
+    and never yields empty ones. Large enough chunks are passed as is,
+    as bytes: views over recycled buffers or mappings never get out.
+    A falsy chunksize only drops the empty chunks.
     """
-    for j in range(8):
-        if crc & 1:
-            crc = (crc >> 1) ^ 0xEDB88320
-        else:
-            crc >>= 1
-    return crc
+    chunksize = chunksize or 0
+    buffer = bytearray()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if not buffer and len(chunk) >= chunksize:
+            yield chunk if type(chunk) is bytes else bytes(chunk)
+            continue
+        buffer += chunk
+        if len(buffer) >= chunksize:
+            yield bytes(buffer)
+            buffer = bytearray()
+    if buffer:
+        yield bytes(buffer)
 
 
 class ZiphyrStream(RawIOBase):
@@ -24,22 +38,42 @@ class ZiphyrStream(RawIOBase):
     Disclaimer: zipcrypto is known to be flawed.
     Adapted from Ivan Ergunov zipfile_generator.
     """
-    def __init__(self, password: bytes = None):
+    def __init__(self, password: bytes = None, factory=None):
         """
         Optional bytes-type password parameter.
-        If provided, initialize the crctable and keys for zipcrypto.
+        If provided, get a cipher engine for zipcrypto from the factory,
+        the shared cipher context cache by default.
         """
-        self._buffer = b''
+        self._chunks = []
+        self.factory = factory or default_factory
 
         if password:
-            self.crctable = list(map(_gen_crc, range(256)))
+            self.crctable = CRCTABLE
+            self.engine = self.factory.engine(password)
+
+    @property
+    def x(self):
+        return self.engine.x
+
+    @x.setter
+    def x(self, value):
+        self.engine.x = value
+
+    @property
+    def y(self):
+        return self.engine.y
 
-            self.x = 305419896  # PKZIP Key(0)
-            self.y = 591751049  # PKZIP Key(1)
-            self.z = 878082192  # PKZIP Key(2)
+    @y.setter
+    def y(self, value):
+        self.engine.y = value
 
-            for p in password:
-                self.update_keys(p)
+    @property
+    def z(self):
+        return self.engine.z
+
+    @z.setter
+    def z(self, value):
+        self.engine.z = value
 
     def crc32(self, ch, crc):
         """
@@ -53,10 +87,7 @@ class ZiphyrStream(RawIOBase):
         zipcrypto keys cycling.
         Adapted from cpython zipfile _ZipDecrypter.
         """
-        self.x = self.crc32(c, self.x)
-        self.y = (self.y + (self.x & 0xFF)) & 0xFFFFFFFF
-        self.y = (self.y * 134775813 + 1) & 0xFFFFFFFF
-        self.z = self.crc32((self.y >> 24) & 0xFF, self.z)
+        self.engine.update_keys(c)
 
     def cypher(self, c):
         """
@@ -74,18 +105,33 @@ class ZiphyrStream(RawIOBase):
     def write(self, b):
         if self.closed:
             raise ValueError('Stream was closed!')
-        self._buffer += b
+        if not isinstance(b, bytes):
+            # the writer may reuse its mutable buffer
+            b = bytes(b)
+        if b:
+            self._chunks.append(b)
         return len(b)
 
     def get(self):
-        chunk = self._buffer
-        self._buffer = b''
-        return chunk
+        """Everything written since the last call, joined once."""
+        chunks = self._chunks
+        if not chunks:
+            return b''
+        self._chunks = []
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
 
     def cypher_chunk(self, chunk):
         """
-        Cyphering a whole chunk.
-        Adapted from devthat/zipencrypt _ZipWriteFile.
+        Cyphering a whole chunk into a new bytes object, delegated to
+        the cipher engine. The chunk is left untouched.
+        """
+        return self.engine.encrypt(chunk)
+
+    def cypher_into(self, buf):
+        """
+        Cyphering a writable buffer (bytearray, memoryview) in place.
+        Returns the very same buffer.
         """
-        tfx = lambda x: bytes(map(self.cypher, x))  # noqa
-        return tfx(chunk)
+        return self.engine.encrypt_into(buf)
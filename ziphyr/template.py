@@ -0,0 +1,98 @@
+"""Reusable Ziphyr templates' module."""
+
+import os
+from collections import namedtuple
+from zipfile import ZIP_STORED
+
+from ziphyr.cipher import default_factory
+from ziphyr.stream import OUTPUT_CHUNKSIZE
+from ziphyr.writer import DEFAULT_EXT_ATTR
+from ziphyr.ziphyr import Ziphyr
+
+
+class ArchiveContext():
+
+    """
+    One archive out of a ZiphyrTemplate, owning every bit of its state
+    through a private Ziphyr: iterating it generates the archive, once.
+    """
+
+    def __init__(self, template, metadata, source=None, digest=None):
+        """
+        Metadata is either a filepath, read when no source is given, or
+        a (filename, filesize[, ext_attr]) sequence, as for
+        Ziphyr.multi_generator().
+        Optional source, and content digest for the template's cache.
+        """
+        self.template = template
+        self.source = source
+        self.digest = digest
+        self.ziphyr = Ziphyr(template.password, template.factory)
+        if isinstance(metadata, (str, bytes)):
+            self.ziphyr.from_filepath(
+                os.fsdecode(metadata), template.ext_attr
+            )
+        else:
+            self.ziphyr.from_metadata(
+                metadata[0], metadata[1],
+                metadata[2] if len(metadata) > 2 else template.ext_attr,
+            )
+        self._started = False
+
+    @property
+    def filename(self):
+        """Name of the archive's entry."""
+        return self.ziphyr.zinfo.filename
+
+    @property
+    def choices(self):
+        """(filename, AutoChoice) of an automatic compression."""
+        return self.ziphyr.choices
+
+    def archive_size(self):
+        """Exact byte count of a ZIP_STORED archive, before streaming it."""
+        return self.ziphyr.archive_size()
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError("An ArchiveContext is generated only once.")
+        self._started = True
+        t = self.template
+        return self.ziphyr.generator(
+            self.source, t.compression, t.workers, t.chunksize,
+            t.instrument, t.cache, self.digest, t.memory,
+        )
+
+
+class ZiphyrTemplate(namedtuple('ZiphyrTemplate', [
+    'password', 'compression', 'ext_attr', 'factory', 'workers',
+    'chunksize', 'memory', 'instrument', 'cache',
+])):
+
+    """
+    Immutable archive settings, shared between threads: calling it
+    returns an independent ArchiveContext per archive.
+    The factory, instrument and cache given are shared by the archives,
+    the built-in ones are thread-safe.
+    """
+
+    __slots__ = ()
+
+    def __new__(
+        cls, password: bytes = None, compression=ZIP_STORED,
+        ext_attr=DEFAULT_EXT_ATTR, factory=None, workers=None,
+        chunksize=OUTPUT_CHUNKSIZE, memory=None, instrument=None, cache=None,
+    ):
+        """
+        Optional bytes-type password parameter, then the defaults of
+        Ziphyr.generator(); the cipher context factory is the shared
+        cache by default.
+        """
+        return super().__new__(
+            cls, password, compression, ext_attr, factory or default_factory,
+            workers, chunksize, memory, instrument, cache,
+        )
+
+    def __call__(self, metadata, source=None, digest=None):
+        """ArchiveContext of one archive, as ArchiveContext takes it."""
+        return ArchiveContext(self, metadata, source, digest)
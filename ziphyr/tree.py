@@ -0,0 +1,180 @@
+"""Directory tree sources' module, stat and reads prefetched."""
+
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+
+from ziphyr.pipeline import background
+from ziphyr.reader import READ_CHUNKSIZE
+
+
+SYMLINK_SKIP = 'skip'
+SYMLINK_FOLLOW = 'follow'
+SYMLINK_STORE = 'store'
+SYMLINK_POLICIES = (SYMLINK_SKIP, SYMLINK_FOLLOW, SYMLINK_STORE)
+
+TREE_WORKERS = 4
+# files opened ahead, their stat and first chunk read
+TREE_PREFETCH = 16
+
+TreeEntry = namedtuple('TreeEntry', ['path', 'arcname', 'is_symlink'])
+
+
+def _matches(arcname, name, patterns):
+    """Whether the relative path, or its last part, matches a pattern."""
+    return any(
+        fnmatchcase(arcname, pattern) or fnmatchcase(name, pattern)
+        for pattern in patterns
+    )
+
+
+def walk_tree(
+    root, include=None, exclude=None, symlinks=SYMLINK_SKIP, onerror=None,
+):
+    """
+    Generator of the TreeEntry of the files under the root directory,
+    with os.scandir(), in a deterministic order: every directory sorted
+    by name, depth first. Arcnames are relative '/'-separated paths.
+    Optional include and exclude glob patterns, matched against the
+    arcname or the last part of it: excluded directories are pruned,
+    included files are the only ones kept when given.
+    Symlinks are skipped, followed (every directory once, against loops),
+    or stored as links. Neither files nor directories, others are
+    skipped. An OSError scanning a subdirectory is raised, or passed to
+    the optional onerror(path, exception) callable and it skipped.
+    """
+    if symlinks not in SYMLINK_POLICIES:
+        raise ValueError("Unknown symlink policy %r." % (symlinks,))
+    st = os.stat(root)
+    visited = {(st.st_dev, st.st_ino)}
+
+    def walk(directory, prefix):
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError as e:
+            if onerror is None or directory == root:
+                raise
+            onerror(directory, e)
+            return
+        for entry in entries:
+            arcname = prefix + entry.name
+            if exclude and _matches(arcname, entry.name, exclude):
+                continue
+            is_symlink = entry.is_symlink()
+            if is_symlink and symlinks == SYMLINK_SKIP:
+                continue
+            if is_symlink and symlinks == SYMLINK_STORE:
+                if not include or _matches(arcname, entry.name, include):
+                    yield TreeEntry(entry.path, arcname, True)
+                continue
+
+            if entry.is_dir():
+                if symlinks == SYMLINK_FOLLOW:
+                    st = entry.stat()
+                    if (st.st_dev, st.st_ino) in visited:
+                        continue
+                    visited.add((st.st_dev, st.st_ino))
+                yield from walk(entry.path, arcname + '/')
+            elif entry.is_file():
+                if not include or _matches(arcname, entry.name, include):
+                    yield TreeEntry(entry.path, arcname, False)
+
+    return walk(root, '')
+
+
+def _open_entry(entry, chunksize):
+    """
+    Stat, open file and first chunk of a TreeEntry, or a symlink's
+    lstat, None and target.
+    """
+    if entry.is_symlink:
+        return os.lstat(entry.path), None, os.fsencode(
+            os.readlink(entry.path)
+        )
+    f = open(entry.path, 'rb')
+    try:
+        return os.fstat(f.fileno()), f, f.read(chunksize)
+    except BaseException:
+        f.close()
+        raise
+
+
+def _close_opened(future):
+    """Closes the file a prefetch left open, unless it failed."""
+    if not future.cancelled() and future.exception() is None:
+        f = future.result()[1]
+        if f:
+            f.close()
+
+
+def _file_chunks(f, first, chunksize):
+    """Generator of the first chunk, then the rest of the file."""
+    try:
+        if first:
+            yield first
+        if f:
+            for chunk in iter(lambda: f.read(chunksize), b''):
+                yield chunk
+    finally:
+        if f:
+            f.close()
+
+
+def tree_entries(
+    root, include=None, exclude=None, symlinks=SYMLINK_SKIP,
+    workers=TREE_WORKERS, prefetch=TREE_PREFETCH, chunksize=READ_CHUNKSIZE,
+    onerror=None,
+):
+    """
+    Generator of the (metadata, source) pairs of walk_tree(), as
+    Ziphyr.multi_generator() takes them: the tree is scanned in a
+    background thread, and the next prefetch files are stat-ed, opened
+    and their first chunk read by a pool of workers, while the current
+    one is archived: per-file latency overlaps, the order stays.
+    Metadata keeps the mode bits and mtime of every file, a stored
+    symlink's data being its target.
+    An OSError on a file or subdirectory is raised, or passed to the
+    optional onerror(path, exception) callable and it skipped, from the
+    scanning thread for directories.
+    """
+    walk = background(
+        walk_tree(root, include, exclude, symlinks, onerror),
+        prefetch, 'ziphyr-scan',
+    )
+    pending = deque()
+    with ThreadPoolExecutor(workers) as executor:
+        def fill():
+            while len(pending) < max(prefetch, 1):
+                entry = next(walk, None)
+                if entry is None:
+                    return
+                pending.append((
+                    entry, executor.submit(_open_entry, entry, chunksize)
+                ))
+
+        try:
+            fill()
+            while pending:
+                entry, future = pending.popleft()
+                fill()
+                try:
+                    st, f, first = future.result()
+                except OSError as e:
+                    if onerror is None:
+                        raise
+                    onerror(entry.path, e)
+                    continue
+
+                size = len(first) if entry.is_symlink else st.st_size
+                metadata = (
+                    entry.arcname, size, (st.st_mode & 0xFFFF) << 16,
+                    time.localtime(st.st_mtime)[0:6],
+                )
+                yield metadata, _file_chunks(f, first, chunksize)
+        finally:
+            walk.close()
+            for entry, future in pending:
+                if not future.cancel():
+                    future.add_done_callback(_close_opened)
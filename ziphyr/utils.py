@@ -1,5 +1,19 @@
 """Module for comfort utilities. Non-essential to Ziphyr."""
 
+import mmap
+import os
+import stat
+import time
+from itertools import cycle
+
+
+READ_CHUNKSIZE = 1 << 18
+MMAP_CHUNKSIZE = 1 << 20
+MMAP_THRESHOLD = 1 << 24  # smaller files are not worth a mapping
+ADAPTIVE_MIN_CHUNKSIZE = 1 << 16
+ADAPTIVE_MAX_CHUNKSIZE = 1 << 22
+ADAPTIVE_TARGET = 0.01  # seconds a chunk should take downstream
+
 
 def file_iterable(filepath, chunksize=1024):
     """
@@ -12,3 +26,90 @@ def file_iterable(filepath, chunksize=1024):
                 yield chunk
             else:
                 return
+
+
+def owned_chunk(chunk):
+    """
+    A chunk safe to hold on to after the next one is read: bytes and
+    read-only views as they are, writable buffers copied to bytes.
+    """
+    if isinstance(chunk, bytes) or (
+        isinstance(chunk, memoryview) and chunk.readonly
+    ):
+        return chunk
+    return bytes(chunk)
+
+
+def readinto_iterable(filepath, chunksize=READ_CHUNKSIZE, buffers=2):
+    """
+    Turn a file on a filepath into a generator of memoryviews over a
+    pool of recycled buffers, read into without any allocation.
+    A chunk is overwritten buffers reads later: the Ziphyr generators
+    copy the chunks they hold on to through owned_chunk(), any other
+    consumer buffering them should do as much.
+    """
+    views = [memoryview(bytearray(chunksize)) for _ in range(buffers)]
+    with open(filepath, 'rb', buffering=0) as fileobj:
+        for view in cycle(views):
+            size = fileobj.readinto(view)
+            if not size:
+                return
+            yield view[:size]
+
+
+def mmap_iterable(filepath, chunksize=MMAP_CHUNKSIZE):
+    """
+    Turn a file on a filepath into a generator of read-only memoryview
+    slices of its memory mapping, without any copy.
+    The mapping lives as long as its last slice. The file should not
+    be truncated meanwhile.
+    """
+    with open(filepath, 'rb') as fileobj:
+        if not os.fstat(fileobj.fileno()).st_size:
+            return
+        mapped = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if hasattr(mapped, 'madvise'):  # py38+
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+    view = memoryview(mapped)
+    for offset in range(0, len(view), chunksize):
+        yield view[offset:offset + chunksize]
+
+
+def adaptive_iterable(
+    filepath, min_chunksize=ADAPTIVE_MIN_CHUNKSIZE,
+    max_chunksize=ADAPTIVE_MAX_CHUNKSIZE, target=ADAPTIVE_TARGET,
+):
+    """
+    Turn a file on a filepath into a generator of chunks first sized
+    after the file (a 64th of it, within bounds), then after the speed
+    downstream: doubled while a chunk takes less than half the target
+    seconds to be consumed, halved when it takes more than twice it.
+    """
+    with open(filepath, 'rb') as fileobj:
+        chunksize = os.fstat(fileobj.fileno()).st_size // 64
+        chunksize = min(max(chunksize, min_chunksize), max_chunksize)
+        while True:
+            chunk = fileobj.read(chunksize)
+            if not chunk:
+                return
+            start = time.perf_counter()
+            yield chunk
+            elapsed = time.perf_counter() - start
+            if elapsed < target / 2:
+                chunksize = min(chunksize * 2, max_chunksize)
+            elif elapsed > target * 2:
+                chunksize = max(chunksize // 2, min_chunksize)
+
+
+def best_reader(filepath):
+    """
+    Generator over the file on a filepath through the best suited
+    reader: its memory mapping for large regular files, adaptive
+    chunks otherwise.
+    """
+    st = os.stat(filepath)
+    if stat.S_ISREG(st.st_mode) and st.st_size >= MMAP_THRESHOLD:
+        return mmap_iterable(filepath)
+    return adaptive_iterable(filepath)
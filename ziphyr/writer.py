@@ -0,0 +1,484 @@
+"""Streaming multi-entry zip writer's module."""
+
+import os
+import struct
+import time
+import zlib
+from collections import namedtuple
+from zipfile import (
+    ZIP64_LIMIT, ZIP_BZIP2, ZIP_DEFLATED, ZIP_FILECOUNT_LIMIT, ZIP_LZMA,
+    ZIP_STORED, crc32,
+)
+
+from ziphyr.cipher import default_factory
+from ziphyr.retro import retro_from_file
+from ziphyr.utils import file_iterable
+from ziphyr.zstd import ZIP_ZSTANDARD, ZSTD_VERSION, get_compressor
+
+
+DEFAULT_VERSION = 20
+ZIP64_VERSION = 45
+BZIP2_VERSION = 46
+LZMA_VERSION = 63
+CREATE_SYSTEM = 0 if os.sep == '\\' else 3
+DEFAULT_EXT_ATTR = 25165824  # 0o600 << 16
+
+_LOCAL_SIGNATURE = b'PK\x03\x04'
+_CENTRAL_SIGNATURE = b'PK\x01\x02'
+_END_SIGNATURE = b'PK\x05\x06'
+_END64_SIGNATURE = b'PK\x06\x06'
+_END64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+_DD_SIGNATURE = 0x08074b50
+
+_LOCAL_HEADER = struct.Struct('<4sBBHHHHLLLHH')
+_CENTRAL_HEADER = struct.Struct('<4sBBBBHHHHLLLHHHHHLL')
+_END_RECORD = struct.Struct('<4sHHHHLLH')
+_END64_RECORD = struct.Struct('<4sQ2H2L4Q')
+_END64_LOCATOR = struct.Struct('<4sLQL')
+
+FLAG_ENCRYPTED = 0x01
+FLAG_LZMA_EOS = 0x02
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+# central directory bytes gathered before being yielded
+CENTRAL_CHUNKSIZE = 1 << 16
+
+
+EntryInfo = namedtuple(
+    'EntryInfo', ['filename', 'file_size', 'external_attr', 'date_time']
+)
+
+# compact per-entry record, all the central directory needs
+EntryRecord = namedtuple('EntryRecord', [
+    'filename', 'flag_bits', 'compress_type', 'dostime', 'dosdate',
+    'crc', 'compress_size', 'file_size', 'external_attr', 'header_offset',
+])
+
+
+def dos_datetime(date_time):
+    """Packs a (Y, M, D, h, m, s) tuple into the (dostime, dosdate) pair."""
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    dosdate = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+    dostime = date_time[3] << 11 | date_time[4] << 5 | (date_time[5] // 2)
+    return dostime, dosdate
+
+
+def entry_info(metadata):
+    """
+    Normalizes an entry metadata into an EntryInfo.
+    Either a filepath, or a (filename, filesize[, ext_attr[, date_time]])
+    sequence as for Ziphyr.from_metadata().
+    """
+    if isinstance(metadata, EntryInfo):
+        return metadata
+    if isinstance(metadata, (str, bytes)):
+        filepath = os.fsdecode(metadata)
+        arcname, st_size = retro_from_file(filepath)
+        mtime = time.localtime(os.path.getmtime(filepath))
+        return EntryInfo(arcname, st_size, DEFAULT_EXT_ATTR, mtime[0:6])
+
+    filename, file_size = metadata[0], metadata[1]
+    ext_attr = metadata[2] if len(metadata) > 2 else DEFAULT_EXT_ATTR
+    date_time = metadata[3] if len(metadata) > 3 else time.localtime()[0:6]
+    return EntryInfo(filename, file_size, ext_attr, tuple(date_time))
+
+
+def _encode_filename(filename, flag_bits):
+    """Encodes the filename as zipfile does, flagging utf-8 names."""
+    try:
+        return filename.encode('ascii'), flag_bits
+    except UnicodeEncodeError:
+        return filename.encode('utf-8'), flag_bits | FLAG_UTF8
+
+
+def _min_version(compress_type, zip64):
+    version = ZIP64_VERSION if zip64 else DEFAULT_VERSION
+    if compress_type == ZIP_BZIP2:
+        version = max(BZIP2_VERSION, version)
+    elif compress_type == ZIP_LZMA:
+        version = max(LZMA_VERSION, version)
+    elif compress_type == ZIP_ZSTANDARD:
+        version = max(ZSTD_VERSION, version)
+    return version
+
+
+def local_header(filename, flag_bits, compress_type, dostime, dosdate, zip64):
+    """
+    Local file header of a streamed entry, as zipfile writes it:
+    CRC and sizes are deferred to the data descriptor.
+    """
+    extra = b''
+    size = 0
+    if zip64:
+        extra = struct.pack('<HHQQ', 1, 16, 0, 0)
+        size = 0xFFFFFFFF
+    return _LOCAL_HEADER.pack(
+        _LOCAL_SIGNATURE, _min_version(compress_type, zip64), 0, flag_bits,
+        compress_type, dostime, dosdate, 0, size, size,
+        len(filename), len(extra),
+    ) + filename + extra
+
+
+def data_descriptor(crc, compress_size, file_size, zip64):
+    """Data descriptor closing a streamed entry."""
+    fmt = '<LLQQ' if zip64 else '<LLLL'
+    return struct.pack(fmt, _DD_SIGNATURE, crc, compress_size, file_size)
+
+
+def central_header(record):
+    """Central directory header of an entry, from its compact record."""
+    extra = []
+    file_size = record.file_size
+    compress_size = record.compress_size
+    header_offset = record.header_offset
+    if file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT:
+        extra.append(file_size)
+        extra.append(compress_size)
+        file_size = compress_size = 0xFFFFFFFF
+    if header_offset > ZIP64_LIMIT:
+        extra.append(header_offset)
+        header_offset = 0xFFFFFFFF
+
+    extra_data = b''
+    if extra:
+        extra_data = struct.pack(
+            '<HH' + 'Q' * len(extra), 1, 8 * len(extra), *extra
+        )
+
+    version = _min_version(record.compress_type, bool(extra))
+    return _CENTRAL_HEADER.pack(
+        _CENTRAL_SIGNATURE, version, CREATE_SYSTEM, version, 0,
+        record.flag_bits, record.compress_type,
+        record.dostime, record.dosdate, record.crc,
+        compress_size, file_size, len(record.filename), len(extra_data),
+        0, 0, 0, record.external_attr, header_offset,
+    ) + record.filename + extra_data
+
+
+def end_records(count, cd_size, cd_offset):
+    """End of central directory records, ZIP64 ones when required."""
+    records = b''
+    if (count >= ZIP_FILECOUNT_LIMIT or cd_offset > ZIP64_LIMIT
+            or cd_size > ZIP64_LIMIT):
+        records += _END64_RECORD.pack(
+            _END64_SIGNATURE, 44, 45, 45, 0, 0, count, count,
+            cd_size, cd_offset,
+        )
+        records += _END64_LOCATOR.pack(
+            _END64_LOCATOR_SIGNATURE, 0, cd_offset + cd_size, 1
+        )
+        count = min(count, 0xFFFF)
+        cd_size = min(cd_size, 0xFFFFFFFF)
+        cd_offset = min(cd_offset, 0xFFFFFFFF)
+    return records + _END_RECORD.pack(
+        _END_SIGNATURE, 0, 0, count, count, cd_size, cd_offset, 0
+    )
+
+
+def compressed_chunks(
+    source, compression=ZIP_STORED, compressor=None, checksum=crc32,
+):
+    """
+    Serial compression stage, yields the compressed chunks of the source
+    then returns the (crc, file_size) of its clear data.
+    An optional compressor factory replaces zipfile's compressors.
+    """
+    compressor = compressor() if compressor else get_compressor(compression)
+    clear_crc = 0
+    file_size = 0
+    for chunk in source:
+        clear_crc = checksum(chunk, clear_crc)
+        file_size += len(chunk)
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+
+    if compressor:
+        chunk = compressor.flush()
+        if chunk:
+            yield chunk
+
+    return clear_crc, file_size
+
+
+def central_directory(records, cd_offset):
+    """Whole central directory and end records of a few entries."""
+    central = b''.join(map(central_header, records))
+    return central + end_records(len(records), len(central), cd_offset)
+
+
+def stored_archive_size(infos, encrypted=False):
+    """
+    Exact size of the ZIP_STORED archive of the EntryInfo, as streamed,
+    provided their file_size are exact.
+    Headers are measured from the very functions writing them.
+    """
+    offset = 0
+    cd_size = 0
+    count = 0
+    for info in infos:
+        filename, flag_bits = _encode_filename(info.filename, 0)
+        zip64 = info.file_size * 1.05 > ZIP64_LIMIT
+        compress_size = info.file_size + (12 if encrypted else 0)
+        record = EntryRecord(
+            filename, flag_bits, ZIP_STORED, 0, 0, 0,
+            compress_size, info.file_size, 0, offset,
+        )
+        offset += len(local_header(filename, 0, ZIP_STORED, 0, 0, zip64))
+        offset += compress_size
+        offset += len(data_descriptor(0, 0, 0, zip64))
+        cd_size += len(central_header(record))
+        count += 1
+
+    return offset + cd_size + len(end_records(count, cd_size, offset))
+
+
+class EntryEncoder():
+
+    """
+    Push-style encoding of one entry: the caller feeds the clear chunks
+    and emits the returned bytes, compressed then zipcrypted through the
+    cipher engine if any.
+    """
+
+    def __init__(self, info, compression=ZIP_STORED, engine=None):
+        """Prepares the entry from its EntryInfo."""
+        self.dostime, self.dosdate = dos_datetime(info.date_time)
+        flag_bits = FLAG_DATA_DESCRIPTOR
+        if compression == ZIP_LZMA:
+            flag_bits |= FLAG_LZMA_EOS
+        if engine:
+            flag_bits |= FLAG_ENCRYPTED
+        self.filename, self.flag_bits = _encode_filename(
+            info.filename, flag_bits
+        )
+        self.info = info
+        self.compression = compression
+        self.engine = engine
+        self._compressor = False  # built when first needed
+        # compressed size can be larger than uncompressed size
+        self.zip64 = info.file_size * 1.05 > ZIP64_LIMIT
+        self.crc = 0
+        self.file_size = 0
+        self.compress_size = 0
+        self.record = None
+
+    @property
+    def compressor(self):
+        """
+        Compressor of the fed data, None for stored entries, never built
+        when the compression happens elsewhere.
+        """
+        if self._compressor is False:
+            self._compressor = get_compressor(self.compression)
+        return self._compressor
+
+    @compressor.setter
+    def compressor(self, compressor):
+        self._compressor = compressor
+
+    def header(self):
+        """Local header, followed by the zipcrypto header if any."""
+        header = local_header(
+            self.filename, self.flag_bits, self.compression,
+            self.dostime, self.dosdate, self.zip64,
+        )
+        if self.engine:
+            # the zipcrypto asks for twelve almost-random bytes
+            check_byte = (self.dostime >> 8) & 0xFF
+            twelve_angry = bytearray(os.urandom(11))
+            twelve_angry.append(check_byte)
+            header += self.seal(twelve_angry)
+        return header
+
+    def seal(self, data):
+        """Zipcrypts already compressed data, accounted for."""
+        if self.engine:
+            data = self.engine.encrypt(data)
+        self.compress_size += len(data)
+        return data
+
+    def feed(self, chunk):
+        """Compresses and zipcrypts a clear chunk."""
+        self.crc = crc32(chunk, self.crc)
+        self.file_size += len(chunk)
+        if self.compressor:
+            chunk = self.compressor.compress(chunk)
+        return self.seal(chunk) if chunk else b''
+
+    def sync(self):
+        """
+        Flushes the deflate compressor to a byte boundary, without any
+        back-reference to come, and swaps in a fresh one: what follows
+        only depends on the data fed next. Stored entries need nothing.
+        """
+        if self.compression == ZIP_STORED:
+            return b''
+        if self.compression != ZIP_DEFLATED:
+            raise ValueError("Only stored and deflated entries can sync.")
+        data = self.compressor.flush(zlib.Z_FULL_FLUSH)
+        self.compressor = get_compressor(self.compression)
+        return self.seal(data)
+
+    def flush(self):
+        """Compressor leftovers, zipcrypted."""
+        if self.compressor:
+            return self.seal(self.compressor.flush())
+        return b''
+
+    def close(self, crc=None, file_size=None):
+        """
+        Data descriptor ending the entry, from the fed data or the given
+        clear (crc, file_size) when the compression happened elsewhere.
+        Sets the entry record, its header_offset left to the caller.
+        """
+        if crc is not None:
+            self.crc, self.file_size = crc, file_size
+
+        if not self.zip64 and (
+            max(self.file_size, self.compress_size) > ZIP64_LIMIT
+        ):
+            raise RuntimeError(
+                "File size too large for the announced file size, "
+                "the ZIP64 extensions were not provisioned."
+            )
+
+        self.record = EntryRecord(
+            self.filename, self.flag_bits, self.compression,
+            self.dostime, self.dosdate, self.crc, self.compress_size,
+            self.file_size, self.info.external_attr, 0,
+        )
+        return data_descriptor(
+            self.crc, self.compress_size, self.file_size, self.zip64
+        )
+
+
+def entry_chunks(
+    info, source, compression=ZIP_STORED, engine=None, stage=None,
+):
+    """
+    Generator writing one entry from its EntryInfo and chunk source,
+    compressed through the stage (compressed_chunks by default) then
+    zipcrypted through the cipher engine if any.
+    Yields the local header, the data and its descriptor, then returns
+    the entry record, its header_offset left to the caller.
+    """
+    encoder = EntryEncoder(info, compression, engine)
+    yield encoder.header()
+
+    chunks = (stage or compressed_chunks)(source, compression)
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration as stop:
+            clear_crc, file_size = stop.value
+            break
+        yield encoder.seal(chunk)
+
+    yield encoder.close(clear_crc, file_size)
+    return encoder.record
+
+
+def drain(chunks, sink):
+    """Pushes every chunk of entry_chunks() into sink, returns the record."""
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration as stop:
+            return stop.value
+        sink(chunk)
+
+
+def entry_source(source, chunksize=1 << 16):
+    """A source given as a filepath is read from the disk."""
+    if isinstance(source, str):
+        return file_iterable(source, chunksize)
+    return source
+
+
+class ZiphyrWriter():
+
+    """
+    Streaming zip writer, entries after entries then the central directory.
+    Only a compact record is kept per written entry.
+    Compression happens before the optional zipcrypto.
+    """
+
+    def __init__(self, password: bytes = None, factory=None):
+        """
+        Optional bytes-type password parameter, applied to every entry.
+        Optional cipher context factory, shared cache by default.
+        """
+        self.password = password
+        self.factory = factory or default_factory
+        self.offset = 0
+        self.records = []
+        self.probe = None  # optional metrics.ArchiveProbe
+
+    def emit(self, data):
+        """Accounts for bytes emitted into the archive, returns them."""
+        self.offset += len(data)
+        return data
+
+    def engine(self):
+        """Fresh cipher engine for an entry, None without password."""
+        engine = None
+        if self.password:
+            engine = self.factory.engine(self.password)
+        if self.probe:
+            engine = self.probe.engine(engine)
+        return engine
+
+    def entry(self, info, source, compression=ZIP_STORED, stage=None):
+        """
+        Generator writing one entry from its EntryInfo and chunk source,
+        through an optional compression stage.
+        Yields the local header, the (encrypted) data and its descriptor.
+        """
+        header_offset = self.offset
+        source = entry_source(source)
+        if self.probe:
+            source = self.probe.source(source)
+            if stage:
+                stage = self.probe.stage(stage)
+            else:
+                stage = self.probe.compressed_chunks
+        chunks = entry_chunks(
+            info, source, compression, self.engine(), stage
+        )
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as stop:
+                record = stop.value
+                break
+            yield self.emit(chunk)
+
+        self.records.append(record._replace(header_offset=header_offset))
+
+    def written(self, data, record):
+        """
+        Accounts for an entry written elsewhere as a whole,
+        returns its data to be emitted as is.
+        """
+        self.records.append(record._replace(header_offset=self.offset))
+        return self.emit(data)
+
+    def close(self):
+        """Generator writing the central directory and end records."""
+        cd_offset = self.offset
+        buffer = bytearray()
+        for record in self.records:
+            buffer += central_header(record)
+            if len(buffer) >= CENTRAL_CHUNKSIZE:
+                yield self.emit(bytes(buffer))
+                buffer = bytearray()
+
+        cd_size = self.offset + len(buffer) - cd_offset
+        buffer += end_records(len(self.records), cd_size, cd_offset)
+        yield self.emit(bytes(buffer))
+
+        self.records = []
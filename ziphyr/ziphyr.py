@@ -2,11 +2,63 @@
 
 import platform
 import struct
+import time
+from itertools import chain
 from os import urandom
-from zipfile import ZIP_STORED, ZipFile, crc32
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, crc32
 
+from ziphyr.aio import ASYNC_BUFFERING, AsyncZiphyrIterator
+from ziphyr.auto import auto_policy
+from ziphyr.budget import MemoryBudget
+from ziphyr.cipher import default_factory
+from ziphyr.deflate import ParallelDeflate
+from ziphyr.fanout import ArchiveFanout, FANOUT_BUFFER
+from ziphyr.layout import archive_layout
+from ziphyr.metrics import ArchiveProbe
+from ziphyr.parallel import PARALLEL_MEMORY, parallel_entries
+from ziphyr.payload import file_digest
+from ziphyr.pipeline import PipelinedStage, background
+from ziphyr.ranges import RANGE_INTERVAL, build_index, generate_range
+from ziphyr.reader import READ_CHUNKSIZE, ZiphyrReader
+from ziphyr.resume import CHECKPOINT_INTERVAL, ResumableStream, resume
 from ziphyr.retro import RetroZipFile, RetroZipInfo
-from ziphyr.stream import ZiphyrStream
+from ziphyr.stream import OUTPUT_CHUNKSIZE, ZiphyrStream, coalesce
+from ziphyr.tree import (
+    SYMLINK_SKIP, TREE_PREFETCH, TREE_WORKERS, tree_entries,
+)
+from ziphyr.utils import best_reader
+from ziphyr.writer import (
+    EntryInfo, ZiphyrWriter, entry_info, entry_source, stored_archive_size,
+)
+from ziphyr.zstd import ZIP_ZSTANDARD, ZstdCompression
+
+
+def compression_stage(compression, workers=None):
+    """
+    The (compression, stage) pair a compression argument and workers
+    stand for, stage being None for the writer's serial compression:
+    only deflate and zstd compress in workers, others stay serial.
+    """
+    if isinstance(compression, ZstdCompression):
+        return ZIP_ZSTANDARD, compression
+    if workers and compression == ZIP_ZSTANDARD:
+        return compression, ZstdCompression(threads=workers)
+    if workers and compression == ZIP_DEFLATED:
+        return compression, ParallelDeflate(workers)
+    return compression, None
+
+
+def _plain_compression(compression, generator):
+    """
+    The zip compression type given to a generator compressing without
+    policies nor stages, ValueError for 'auto' or a stage instance.
+    """
+    if auto_policy(compression) or isinstance(compression, ZstdCompression):
+        raise ValueError(
+            "%s takes a zip compression type, not %r."
+            % (generator, compression)
+        )
+    return compression
 
 
 class PKCryptoZipInfo(RetroZipInfo):
@@ -28,14 +80,23 @@ class Ziphyr():
     Provides then a generator to be consumed for zipcrypted archive.
     """
 
-    def __init__(self, password: bytes = None):
+    def __init__(self, password: bytes = None, factory=None, native=True):
         """
         Optional bytes-type password parameter.
+        Optional cipher context factory, shared cache by default.
+        Generators write through the native ZiphyrWriter, or through
+        ZipFile (RetroZipFile on py35), ZIP_STORED only, when native is
+        False.
         Initializes internals at None.
         """
         self.password = password
+        self.factory = factory or default_factory
+        self.native = native
         self.stream = None
+        self.writer = None
         self.zinfo = None
+        self.filepath = None
+        self.choices = []
 
         if self.password:
             self.ZipInfo = PKCryptoZipInfo
@@ -47,44 +108,289 @@ class Ziphyr():
         else:
             self.ZipFile = ZipFile
 
+    def cache_info(self):
+        """Hit/miss counters of the cipher context factory."""
+        return self.factory.cache_info()
+
     def from_metadata(self, filename, filesize, ext_attr=25165824):
         """
         Primes Ziphyr for a target using provided filename and filesize.
         Default external_attr produced by python is 0o600.
         """
-        self.zinfo = self.ZipInfo.from_file('/dev/null')
-        self.zinfo.orig_filename = filename
-        self.zinfo.filename = filename
+        self.zinfo = self.ZipInfo(filename, time.localtime()[:6])
+        self.filepath = None
         self.zinfo.file_size = filesize
         self.zinfo.external_attr = ext_attr
 
-    def from_filepath(self, filepath, ext_attr=25165824):
+    def from_filepath(self, filepath, ext_attr=25165824, arcname=None):
         """
-        Primes Ziphyr for a target using its filepath.
+        Primes Ziphyr for a target using its filepath, the generator
+        then reading it through the best suited reader when no source
+        is given.
         Default external_attr produced by python is 0o600.
+        Optional arcname, the entry's name instead of the filepath.
         """
         self.zinfo = self.ZipInfo.from_file(filepath)
         self.zinfo.external_attr = ext_attr
+        if arcname is not None:
+            self.zinfo.filename = self.zinfo.orig_filename = arcname
+        self.filepath = filepath
 
-    def generator(self, source, compression=ZIP_STORED):
-        """
-        Turn a streamed file source into a stream zipcrypted archive file.
-        Some lines are based upon Ivan Ergunov's work.
-        Some lines are based upon devthat's work on zipencrypt.
-        """
+    def _check_primed(self):
+        """Raises unless primed by from_filepath() or from_metadata()."""
         if not self.zinfo:
             raise RuntimeError(
                 "Ziphyr object not primed. "
                 "Please use either from_filepath() or from_metadata()."
             )
 
-        self.stream = ZiphyrStream(self.password)
+    def _engine(self):
+        """Cipher engine of the password, None without one."""
+        return self.factory.engine(self.password) if self.password else None
+
+    def _primed_source(self):
+        """The file primed by from_filepath(), through its best reader."""
+        if not self.filepath:
+            raise ValueError(
+                "No source, nor filepath primed by from_filepath()."
+            )
+        return best_reader(self.filepath)
+
+    def entry_info(self):
+        """The primed target as a writer EntryInfo."""
+        return EntryInfo(
+            self.zinfo.filename, self.zinfo.file_size,
+            self.zinfo.external_attr, self.zinfo.date_time,
+        )
+
+    def archive_size(self, entries=None):
+        """
+        Exact byte count of the ZIP_STORED archive, before streaming it,
+        as for a Content-Length. Either of the primed target, or of the
+        entries metadata as for multi_generator().
+        Announced file sizes have to be exact.
+        """
+        if entries is not None:
+            infos = map(entry_info, entries)
+        else:
+            self._check_primed()
+            infos = [self.entry_info()]
+
+        return stored_archive_size(infos, bool(self.password))
+
+    def layout(self, entries=None, crc_cache=None):
+        """
+        Zero-copy ArchiveLayout of the ZIP_STORED unencrypted archive,
+        header blobs and file regions to be sent kernel-side, either of
+        the filepath primed by from_filepath(), or of the entries, each
+        a filepath or a (metadata, filepath[, crc]) sequence.
+        The crc32 of the files come from the crc cache when not given.
+        """
+        if self.password:
+            raise ValueError("Zero-copy archives can not be zipcrypted.")
+        if entries is None:
+            if not self.filepath:
+                raise RuntimeError(
+                    "Ziphyr object not primed with a file. "
+                    "Please use from_filepath()."
+                )
+            entries = [(self.entry_info(), self.filepath)]
+
+        return archive_layout(entries, crc_cache)
+
+    def fanout(
+        self, passwords, source=None, compression=ZIP_STORED, workers=None,
+        chunksize=OUTPUT_CHUNKSIZE, maxsize=FANOUT_BUFFER,
+    ):
+        """
+        ArchiveFanout of the primed target for many passwords, its source
+        (the primed file if none) read and compressed once, then only
+        zipcrypted per password, into files or concurrent streams.
+        """
+        self._check_primed()
+        if source is None:
+            source = self._primed_source()
+
+        compression, stage = compression_stage(compression, workers)
+        return ArchiveFanout(
+            passwords, [(self.entry_info(), source)], compression, stage,
+            self.factory, chunksize, maxsize,
+        )
+
+    def reader(self, source, chunksize=READ_CHUNKSIZE):
+        """
+        Streaming reader of an uploaded archive, a binary file object or
+        an iterable of chunks, zipcrypted with this object's password.
+        Yields (LocalEntry, clear chunks) pairs, as ZiphyrReader does.
+        """
+        return ZiphyrReader(source, self.password, self.factory, chunksize)
+
+    def build_index(self, source, interval=RANGE_INTERVAL):
+        """
+        First pass over the source of the primed target, indexing its
+        ZIP_STORED archive for generate_range(), cipher keys being saved
+        every interval bytes when zipcrypted.
+        """
+        self._check_primed()
+        engine = self._engine()
+        return build_index(self.entry_info(), source, engine, interval)
+
+    def generate_range(
+        self, index, fileobj, start=0, end=None, chunksize=OUTPUT_CHUNKSIZE,
+    ):
+        """
+        Generator of the indexed archive bytes [start, end), as a slice,
+        seeking into the source file object (or filepath) instead of
+        replaying the archive from its first byte.
+        """
+        if isinstance(fileobj, str):
+            with open(fileobj, 'rb') as f:
+                yield from generate_range(index, f, start, end, chunksize)
+        else:
+            yield from generate_range(index, fileobj, start, end, chunksize)
+
+    def resumable_generator(
+        self, source, compression=ZIP_STORED, every=CHECKPOINT_INTERVAL,
+    ):
+        """
+        Stored or deflated archive stream of the primed target, whose
+        .state is a serializable StreamState checkpoint taken every
+        interval clear bytes, to go on elsewhere through resume().
+        The interval is at least 1 byte, each checkpoint flushing the
+        deflate compressor: small ones cost compression.
+        """
+        self._check_primed()
+        engine = self._engine()
+        return ResumableStream(
+            self.entry_info(), source, compression, engine, every
+        )
+
+    @staticmethod
+    def resume(state, source):
+        """
+        Stream going on from a StreamState, the source yielding the clear
+        bytes from state.file_size on, the output from state.emitted on.
+        """
+        return resume(state, source)
+
+    def generator(
+        self, source=None, compression=ZIP_STORED, workers=None,
+        chunksize=OUTPUT_CHUNKSIZE, instrument=None, cache=None, digest=None,
+        memory=None, pipeline=0,
+    ):
+        """
+        Turn a streamed file source into a stream zipcrypted archive file,
+        compressed before being zipcrypted.
+        Without source, the file primed by from_filepath() is read through
+        utils.best_reader().
+        With workers, ZIP_DEFLATED data is deflated by blocks in as many
+        threads, pigz-style, through the ZiphyrWriter, and ZIP_ZSTANDARD
+        data compressed in as many zstd threads; a zstd.ZstdCompression
+        given as compression sets its level and threads; other methods
+        ignore workers, compressed serially.
+        Output is coalesced into chunks of at least chunksize bytes,
+        never empty ones.
+        Optional metrics.Instrument getting the timing and byte count of
+        every stage, then the archive totals.
+        With compression 'auto' or an auto.AutoPolicy, the first bytes of
+        the source decide between ZIP_STORED and the policy's compression,
+        the (filename, AutoChoice) decision listed in choices.
+        With a payload.PayloadCache, the compressed bytes are served from
+        the cache under the source's sha256 digest (of the primed file if
+        not given), only zipcrypted, or compressed into it on a miss.
+        With a memory budget, in bytes, the compressor settings, source
+        and output chunk sizes are fitted to it through a
+        budget.MemoryBudget, exclusive of workers and compression stages.
+        With pipeline, a queue depth in chunks, the source is read ahead,
+        compressed, then zipcrypted in as many background threads, only
+        the output being coalesced and yielded in the caller's thread.
+        """
+        self._check_primed()
+
+        if source is None:
+            source = self._primed_source()
+
+        self.choices = []
+        policy = auto_policy(compression)
+        if policy:
+            choice, source = policy.resolve(source)
+            self.choices.append((self.zinfo.filename, choice))
+            compression = choice.compression
+
+        compression, stage = compression_stage(compression, workers)
+        if memory is not None:
+            if stage:
+                raise ValueError(
+                    "A memory budget excludes workers and stages."
+                )
+            stage = MemoryBudget(memory)
+            chunksize = min(chunksize, stage.plan(compression).chunksize)
+        if cache is not None:
+            if digest is None:
+                if not self.filepath:
+                    raise ValueError(
+                        "No digest, nor filepath primed by from_filepath()."
+                    )
+                digest = file_digest(self.filepath)
+            stage = cache.stage(digest, stage)
+        if pipeline:
+            stage = PipelinedStage(stage, pipeline)
+
+        probe = ArchiveProbe(instrument) if instrument is not None else None
+        chunks = self._generator(source, compression, stage, probe)
+        if pipeline:
+            chunks = background(chunks, pipeline, 'ziphyr-cypher')
+
+        if probe is None:
+            yield from coalesce(chunks, chunksize)
+            return
+
+        yield from probe.output(coalesce(chunks, chunksize))
+
+    def _generator(self, source, compression, stage=None, probe=None):
+        """
+        Archive chunks as they come out of the native writer, one crc32
+        per clear byte and no zipfile machinery, or of the fallback.
+        """
+        if self.native or stage:
+            self.writer = ZiphyrWriter(self.password, self.factory)
+            self.writer.probe = probe
+            yield from self.writer.entry(
+                self.entry_info(), source, compression, stage
+            )
+            yield from self.writer.close()
+            return
+
+        yield from self._zipfile_generator(source, compression, probe)
+
+    def _zipfile_generator(self, source, compression, probe=None):
+        """
+        Fallback archive chunks written through ZipFile, ZIP_STORED only.
+        Some lines are based upon Ivan Ergunov's work.
+        Some lines are based upon devthat's work on zipencrypt.
+        """
+        if compression != ZIP_STORED:
+            raise ValueError(
+                "The ZipFile fallback (native=False) writes ZIP_STORED only."
+            )
+
+        self.stream = ZiphyrStream(self.password, self.factory)
+        checksum, cypher = crc32, self.stream.cypher_chunk
+
+        if probe:
+            source = probe.source(source)
+            checksum = probe.timed('crc32', checksum)
+            cypher = probe.timed('cypher', cypher)
 
         with self.ZipFile(
             self.stream, mode='w', compression=compression
         ) as zfile:
             clear_crc = 0
             with zfile.open(self.zinfo, mode='w') as dest:
+                # compressor writes, with the zipfile's own crc
+                write = probe.timed('compress', dest.write) if probe else (
+                    dest.write
+                )
                 if self.password:
                     # the zipcrypto asks for twelve almost-random bytes
                     self.zinfo._raw_time = (
@@ -93,16 +399,16 @@ class Ziphyr():
                         | (self.zinfo.date_time[5] // 2))
                     check_byte = (self.zinfo._raw_time >> 8) & 0xff
                     twelve_angry = urandom(11) + struct.pack("B", check_byte)
-                    dest.write(self.stream.cypher_chunk(twelve_angry))
+                    dest.write(cypher(twelve_angry))
 
                 for chunk in source:
                     # the internal crc is updated when dest.write()
                     # but we want it to be of the clear data
                     # hence doing our own in parallel
-                    clear_crc = crc32(chunk, clear_crc)
+                    clear_crc = checksum(chunk, clear_crc)
                     if self.password:
-                        chunk = self.stream.cypher_chunk(chunk)
-                    dest.write(chunk)
+                        chunk = cypher(chunk)
+                    write(chunk)
                     yield self.stream.get()
 
             if self.password:
@@ -110,3 +416,116 @@ class Ziphyr():
             self.zinfo.CRC = clear_crc  # overwriting with the clearbytes crc
 
         yield self.stream.get()
+
+    def multi_generator(
+        self, entries, compression=ZIP_STORED, chunksize=OUTPUT_CHUNKSIZE,
+    ):
+        """
+        Turn an iterable of (metadata, source) pairs into one streamed
+        archive, every entry zipcrypted when a password is set.
+        Metadata is either a filepath or a (filename, filesize[, ext_attr])
+        sequence, as for from_filepath() and from_metadata().
+        Source is either a chunk iterable or a filepath to read.
+        Requires no priming, memory does not grow with the entries' data.
+        Output is coalesced as for generator(), compression chosen per
+        entry as well when automatic.
+        """
+        self.writer = ZiphyrWriter(self.password, self.factory)
+        self.choices = []
+        policy = auto_policy(compression)
+
+        def entry(metadata, source):
+            info = entry_info(metadata)
+            if not policy:
+                return self.writer.entry(
+                    info, source, *compression_stage(compression)
+                )
+            choice, source = policy.resolve(entry_source(source))
+            self.choices.append((info.filename, choice))
+            return self.writer.entry(info, source, choice.compression)
+
+        chunks = chain.from_iterable(
+            entry(metadata, source) for metadata, source in entries
+        )
+
+        return coalesce(chain(chunks, self.writer.close()), chunksize)
+
+    def tree_generator(
+        self, root, compression=ZIP_STORED, chunksize=OUTPUT_CHUNKSIZE,
+        include=None, exclude=None, symlinks=SYMLINK_SKIP,
+        workers=TREE_WORKERS, prefetch=TREE_PREFETCH, onerror=None,
+    ):
+        """
+        multi_generator() of the files under the root directory, as
+        tree_entries() walks and prefetches them: one streamed archive
+        in a deterministic order, relative paths as names.
+        """
+        entries = tree_entries(
+            root, include, exclude, symlinks, workers, prefetch,
+            onerror=onerror,
+        )
+        return self.multi_generator(entries, compression, chunksize)
+
+    def parallel_generator(
+        self, entries, compression=ZIP_STORED,
+        workers=None, lookahead=None, max_memory=PARALLEL_MEMORY,
+        chunksize=OUTPUT_CHUNKSIZE,
+    ):
+        """
+        Same archive as multi_generator(), the next entries compressed
+        and zipcrypted ahead in a pool of worker processes (cpu count by
+        default), lookahead entries (twice the workers by default) and
+        max_memory uncompressed bytes at most in flight.
+        Filepath sources are read by the workers themselves.
+        Compression is a zip compression type, neither 'auto' nor a stage.
+        """
+        compression = _plain_compression(compression, 'parallel_generator')
+        self.writer = ZiphyrWriter(self.password, self.factory)
+
+        chunks = parallel_entries(
+            self.writer, entries, compression,
+            workers=workers, lookahead=lookahead, max_memory=max_memory,
+        )
+
+        return coalesce(chain(chunks, self.writer.close()), chunksize)
+
+    def async_generator(
+        self, source, compression=ZIP_STORED,
+        executor=None, buffering=ASYNC_BUFFERING,
+    ):
+        """
+        asyncio counterpart of generator(), for a primed Ziphyr.
+        Consumes an async iterable source and returns an async iterator
+        of the archive chunks, compression and zipcrypto being sent to
+        the executor (the loop's default if None, a thread pool) with at
+        most buffering chunks produced ahead of the consumer.
+        Compression is a zip compression type, neither 'auto' nor a stage.
+        """
+        self._check_primed()
+        compression = _plain_compression(compression, 'async_generator')
+
+        self.writer = ZiphyrWriter(self.password, self.factory)
+
+        return AsyncZiphyrIterator(
+            self.writer, [(self.entry_info(), source)], compression,
+            executor=executor, buffering=buffering,
+        )
+
+    def async_multi_generator(
+        self, entries, compression=ZIP_STORED,
+        executor=None, buffering=ASYNC_BUFFERING,
+    ):
+        """
+        asyncio counterpart of multi_generator(), from an iterable of
+        (metadata, async iterable source) pairs.
+        """
+        compression = _plain_compression(
+            compression, 'async_multi_generator'
+        )
+        self.writer = ZiphyrWriter(self.password, self.factory)
+
+        return AsyncZiphyrIterator(
+            self.writer,
+            ((entry_info(metadata), source) for metadata, source in entries),
+            compression, executor=executor, buffering=buffering,
+        )
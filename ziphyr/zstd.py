@@ -0,0 +1,141 @@
+"""Optional Zstandard (zip method 93) compression's module."""
+
+import os
+from functools import partial
+from zipfile import _get_compressor
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+ZIP_ZSTANDARD = 93
+ZSTD_VERSION = 63
+ZSTD_LEVEL = 3
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError(
+            "Zstandard compression requires the zstandard package."
+        )
+
+
+def zstd_compressor(level=ZSTD_LEVEL, threads=0):
+    """
+    Zstandard compressor with zlib's compress()/flush() interface,
+    compressing in as many zstd threads when threads is positive.
+    """
+    _require_zstandard()
+    return zstandard.ZstdCompressor(
+        level=level, threads=threads
+    ).compressobj()
+
+
+def zstd_decompressor():
+    """Zstandard decompressor of one frame, with eof and unused_data."""
+    _require_zstandard()
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+class ZstdBlocks():
+
+    """
+    Splitter of one zstd frame's input after each of its blocks, every
+    block inflating to 128 KiB at most, its headers parsed on the fly.
+    Anything but a zstd frame, and what follows it, passes through.
+    """
+
+    def __init__(self):
+        self._header = b''
+        self._need = 5  # magic and frame header descriptor first
+        self._parse = self._frame
+        self._skip = 0  # bytes to pass before the next header
+        self._block = False  # passing a block's content
+        self._last = False
+
+    def _frame(self, header):
+        if header[:4] != b'\x28\xb5\x2f\xfd':
+            return None
+        descriptor = header[4]
+        single = descriptor >> 5 & 1
+        self._skip = (
+            (0 if single else 1) + (0, 1, 2, 4)[descriptor & 3]
+            + (single, 2, 4, 8)[descriptor >> 6]
+        )
+        self._need = 3
+        return self._block_header
+
+    def _block_header(self, header):
+        value = int.from_bytes(header, 'little')
+        self._skip = 1 if value >> 1 & 3 == 1 else value >> 3  # rle: 1
+        self._block = True
+        self._last = bool(value & 1)
+        return self._block_header
+
+    def split(self, data):
+        """Generator of consecutive slices of data, one block at most."""
+        start = pos = 0
+        end = len(data)
+        while pos < end and self._parse is not None:
+            if self._skip:
+                step = min(self._skip, end - pos)
+                pos += step
+                self._skip -= step
+            elif self._last:  # with the checksum and the rest
+                self._parse = None
+            elif self._block:
+                self._block = False
+                if pos > start:
+                    yield data[start:pos]
+                    start = pos
+            else:
+                step = min(self._need - len(self._header), end - pos)
+                self._header += data[pos:pos + step]
+                pos += step
+                if len(self._header) == self._need:
+                    header, self._header = self._header, b''
+                    self._parse = self._parse(header)
+        if start < end:
+            yield data[start:]
+
+
+def get_compressor(compression):
+    """zipfile's compressor, or a Zstandard one for ZIP_ZSTANDARD."""
+    if compression == ZIP_ZSTANDARD:
+        return zstd_compressor()
+    return _get_compressor(compression)
+
+
+class ZstdCompression():
+
+    """
+    Compression stage for ZIP_ZSTANDARD entries, the zstd library
+    compressing in its own threads, out of the GIL.
+    Plugs into ZiphyrWriter.entry() as stage, or is given to
+    Ziphyr.generator() as compression.
+    """
+
+    def __init__(self, level=ZSTD_LEVEL, threads=None):
+        """
+        Optional level and threads (cpu count by default) parameters,
+        threads=0 compressing on the caller's thread.
+        """
+        _require_zstandard()
+        self.level = level
+        self.threads = (os.cpu_count() or 1) if threads is None else threads
+
+    def __call__(self, source, compression=ZIP_ZSTANDARD):
+        """
+        Yields the compressed chunks of the source,
+        then returns the (crc, file_size) of its clear data.
+        """
+        if compression != ZIP_ZSTANDARD:
+            raise ValueError("Zstandard stage requires ZIP_ZSTANDARD.")
+
+        from ziphyr.writer import compressed_chunks  # circular
+        return (yield from compressed_chunks(
+            source, compression,
+            partial(zstd_compressor, self.level, self.threads),
+        ))